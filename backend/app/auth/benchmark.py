@@ -0,0 +1,94 @@
+"""
+Login throughput benchmark of the password hashing pool
+
+Usage: python -m app.auth.benchmark [--logins 200] [--concurrency 32] [--workers 4] [--rounds 12] [--inline]
+
+Runs a burst of password verifications (the CPU cost of a login) through
+`PasswordHasher` while a ticker measures how late the event loop wakes up - the
+latency every other request of the worker would see. `--inline` runs bcrypt on
+the event loop instead, as the login route used to.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import bcrypt
+
+from app.auth.constants import AUTH_BCRYPT_ROUNDS, AUTH_HASH_WORKERS
+from app.auth.services import PasswordHasher
+
+
+async def _measure_loop_lag(lags: list, interval: float = 0.01) -> None:
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+
+
+async def benchmark(logins: int, concurrency: int, workers: int, rounds: int, inline: bool = False) -> dict:
+    """
+    Verify `logins` passwords, `concurrency` at a time
+
+    Parameters
+    ----------
+    - **logins**: (int) Number of verifications
+    - **concurrency**: (int) Number of concurrent verifications
+    - **workers**: (int) Number of hashing threads
+    - **rounds**: (int) bcrypt work factor
+    - **inline**: (bool) Verify on the event loop
+
+    Returns
+    -------
+    - **dict**: Logins per second and event loop lag (median, p99, max - in milliseconds)
+    """
+    password = "correct horse battery staple"
+    hashed = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=rounds)).decode("utf-8")
+    hasher = PasswordHasher(workers=workers, max_queue=logins, rounds=rounds)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def login():
+        async with semaphore:
+            if inline:
+                bcrypt.checkpw(password.encode("utf-8"), hashed.encode("utf-8"))
+                await asyncio.sleep(0)
+            else:
+                await hasher.verify(password, hashed)
+
+    lags = []
+    ticker = asyncio.create_task(_measure_loop_lag(lags))
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(login() for _ in range(logins)))
+    finally:
+        elapsed = time.perf_counter() - started
+        ticker.cancel()
+        hasher.shutdown()
+
+    lags = sorted(lags) or [0.0]
+    return {
+        "logins_per_second": round(logins / elapsed, 1),
+        "loop_lag_median_ms": round(statistics.median(lags) * 1000, 1),
+        "loop_lag_p99_ms": round(lags[min(len(lags) - 1, int(len(lags) * 0.99))] * 1000, 1),
+        "loop_lag_max_ms": round(lags[-1] * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the login throughput of the password hashing pool")
+    parser.add_argument("--logins", type=int, default=200, help="number of verifications")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent verifications")
+    parser.add_argument("--workers", type=int, default=AUTH_HASH_WORKERS, help="hashing threads")
+    parser.add_argument("--rounds", type=int, default=AUTH_BCRYPT_ROUNDS, help="bcrypt work factor")
+    parser.add_argument("--inline", action="store_true", help="verify on the event loop (no pool)")
+    args = parser.parse_args()
+
+    result = asyncio.run(benchmark(args.logins, args.concurrency, args.workers, args.rounds, inline=args.inline))
+    mode = "inline" if args.inline else f"{args.workers} workers"
+    print(f"{args.logins} logins, rounds={args.rounds}, {mode}: {result['logins_per_second']} logins/s, "
+          f"event loop lag median {result['loop_lag_median_ms']} ms, p99 {result['loop_lag_p99_ms']} ms, "
+          f"max {result['loop_lag_max_ms']} ms")
+
+
+if __name__ == "__main__":
+    main()
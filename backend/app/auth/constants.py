@@ -0,0 +1,22 @@
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24
+
+# cache of the users resolved from access tokens - spares a database round-trip per authenticated request
+AUTH_USER_CACHE_ENABLED = os.environ.get("AUTH_USER_CACHE_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+AUTH_USER_CACHE_MAX_ENTRIES = int(os.environ.get("AUTH_USER_CACHE_MAX_ENTRIES", 4096))
+AUTH_USER_CACHE_TTL = float(os.environ.get("AUTH_USER_CACHE_TTL", 60))
+# resolve users from the signed `id` / `user_type` claims of tokens issued less than AUTH_USER_CACHE_TTL ago,
+# without the database
+AUTH_TRUST_TOKEN_CLAIMS = os.environ.get("AUTH_TRUST_TOKEN_CLAIMS", "false").strip().lower() in ("1", "true", "yes")
+
+# password hashing - bcrypt work factor (each +1 doubles the cost of a hash / verification)
+AUTH_BCRYPT_ROUNDS = int(os.environ.get("AUTH_BCRYPT_ROUNDS", 12))
+# threads hashing / verifying passwords (bcrypt releases the GIL) - off the event loop
+AUTH_HASH_WORKERS = int(os.environ.get("AUTH_HASH_WORKERS", os.cpu_count() or 2))
+# hashes / verifications waiting for a thread before new ones are rejected with 503
+AUTH_HASH_MAX_QUEUE = int(os.environ.get("AUTH_HASH_MAX_QUEUE", 64))
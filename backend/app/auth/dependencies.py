@@ -1,17 +1,23 @@
 # Standard Imports
 import os
+import time
+from typing import Optional
 
 # Third Party Imports
 import jwt
 from dotenv import load_dotenv
 # Fastapi imports
-from fastapi import Cookie, Depends, status
+from fastapi import Cookie, Depends, Request, status
 from fastapi.exceptions import HTTPException
 from jwt.exceptions import DecodeError, ExpiredSignatureError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 # Ayush-Connect imports
+from app.auth.constants import AUTH_TRUST_TOKEN_CLAIMS, AUTH_USER_CACHE_TTL
 from app.auth.models import User
-from app.auth.schemas import UserResponse, UserType
+from app.auth.schemas import UserPrincipal, UserType
+from app.auth.services import PasswordHasher, UserCache
 from app.index.dependencies import get_db
 
 load_dotenv()
@@ -20,7 +26,65 @@ SECRET_KEY = os.environ["SECRET_KEY"]
 ALGORITHM = os.environ["ALGORITHM"]
 
 
-def get_current_user(access_token: str = Cookie(None), db=Depends(get_db)):
+def get_user_cache(request: Request) -> Optional[UserCache]:
+    """
+    Get the cache of resolved users of the application
+
+    Parameters
+    ----------
+    - **request**: (Request) Incoming request
+
+    Returns
+    -------
+    - **Optional[UserCache]**: User cache, None if disabled
+    """
+    return request.app.state.user_cache
+
+
+def get_password_hasher(request: Request) -> PasswordHasher:
+    """
+    Get the password hashing pool of the application
+
+    Parameters
+    ----------
+    - **request**: (Request) Incoming request
+
+    Returns
+    -------
+    - **PasswordHasher**: Password hasher
+    """
+    return request.app.state.password_hasher
+
+
+async def get_current_user(
+    access_token: str = Cookie(None),
+    db: AsyncSession = Depends(get_db),
+    user_cache: Optional[UserCache] = Depends(get_user_cache),
+) -> Optional[UserPrincipal]:
+    """
+    Resolve the user of the access token cookie
+
+    The user is read from the cache of the worker, or from the database. With
+    `AUTH_TRUST_TOKEN_CLAIMS`, the signed `id` / `user_type` claims of a token
+    issued less than `AUTH_USER_CACHE_TTL` seconds ago are trusted instead, and
+    only until that age: the database is checked at least once per TTL, so a
+    user updated or deleted through any worker loses its rights within the TTL.
+
+    Parameters
+    ----------
+    - **access_token**: (str) Access token cookie
+    - **db**: (AsyncSession) Database session
+    - **user_cache**: (UserCache) Cache of resolved users
+
+    Returns
+    -------
+    - **Optional[UserPrincipal]**: Id, username and type of the user - None without access token
+
+    Raises
+    ------
+    - **HTTPException**
+        - **401** - If the token is invalid or expired, or the user does not exist
+    """
     if access_token is None:
         return None
     try:
@@ -42,28 +106,51 @@ def get_current_user(access_token: str = Cookie(None), db=Depends(get_db)):
             detail="Invalid token",
         )
 
-    user = db.query(User).filter(User.username == username).first()
-    if user is None:
+    if user_cache is not None:
+        user = user_cache.get(username, access_token)
+        if user is not None:
+            return user
+
+    # the claims were read from the database when the token was issued - trusted for one TTL at most
+    claims_ttl = payload.get("iat", 0) + AUTH_USER_CACHE_TTL - time.time()
+    if (
+        AUTH_TRUST_TOKEN_CLAIMS
+        and claims_ttl > 0
+        and "id" in payload
+        and "user_type" in payload
+        and (user_cache is None or user_cache.claims_valid(username, payload["iat"]))
+    ):
+        # signed claims - the user is known without a database round-trip
+        user = UserPrincipal(id=payload["id"], username=username, user_type=UserType(payload["user_type"]))
+        if user_cache is not None:
+            user_cache.set(username, access_token, user, ttl=claims_ttl)
+        return user
+
+    db_user = (await db.execute(select(User).where(User.username == username))).scalar_one_or_none()
+    if db_user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found",
         )
+    user = UserPrincipal.from_orm(db_user)
+    if user_cache is not None:
+        user_cache.set(username, access_token, user)
     return user
 
 
-def is_admin(user: UserResponse = Depends(get_current_user)):
+def is_admin(user: UserPrincipal = Depends(get_current_user)):
     if user and user.user_type.value == UserType.ADMIN.value:
         return True
     return False
 
 
-def is_professional(user: UserResponse = Depends(get_current_user)):
+def is_professional(user: UserPrincipal = Depends(get_current_user)):
     if user and user.user_type.value == UserType.PROFESSIONAL.value:
         return True
     return False
 
 
-def is_consumer(user: UserResponse = Depends(get_current_user)):
+def is_consumer(user: UserPrincipal = Depends(get_current_user)):
     if user and user.user_type.value == UserType.CONSUMER.value:
         return True
     return False
@@ -3,7 +3,6 @@ import os
 from datetime import datetime, timedelta
 
 # Third Party Imports
-import bcrypt
 import jwt
 from dotenv import load_dotenv
 # Fastapi imports
@@ -11,40 +10,50 @@ from fastapi import APIRouter, Depends, status
 from fastapi.exceptions import HTTPException
 from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 # Ayush-Connect imports
-from app.auth.dependencies import get_current_user, is_admin
+from app.auth.constants import ACCESS_TOKEN_EXPIRE_MINUTES
+from app.auth.dependencies import get_current_user, get_password_hasher, get_user_cache, is_admin
 from app.auth.models import User
-from app.auth.schemas import UserCreate, UserLogin, UserResponse, UserType, UserUpdate
+from app.auth.schemas import UserCreate, UserLogin, UserPrincipal, UserResponse, UserType, UserUpdate
+from app.auth.services import PasswordHasher, UserCache
 from app.index.dependencies import get_db
 
 load_dotenv()
 
 SECRET_KEY = os.environ["SECRET_KEY"]
 ALGORITHM = os.environ["ALGORITHM"]
-ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
-password_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
+def token_claims(user: User) -> dict:
+    # id and user_type are signed with the username - they let `get_current_user` skip the database
+    return {"username": user.username, "id": user.id, "user_type": user.user_type.value}
+
+
 def create_jwt_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
+    issued_at = datetime.utcnow()
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = issued_at + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+        expire = issued_at + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    to_encode.update({"exp": expire, "iat": issued_at})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
 @router.post("/signup")
 async def signup(
-    user: UserCreate, is_admin: bool = Depends(is_admin), db=Depends(get_db)
+    user: UserCreate,
+    is_admin: bool = Depends(is_admin),
+    db: AsyncSession = Depends(get_db),
+    password_hasher: PasswordHasher = Depends(get_password_hasher),
 ) -> JSONResponse:
     """
     Create a new user in the database.
@@ -57,7 +66,8 @@ async def signup(
         - **email**: Email of the user
         - **password**: Password of the user
         - **user_type**: Type of user (ADMIN, PROFESSIONAL, CONSUMER)
-    **db**: (Session) Database session
+    **db**: (AsyncSession) Database session
+    **password_hasher**: (PasswordHasher) Password hashing pool
 
     Returns
     -------
@@ -67,6 +77,7 @@ async def signup(
     ------
     - **HTTPException**
         - **500** - If user creation fails
+        - **503** - If the password hashing pool is saturated
     """
     if user.user_type == UserType.ADMIN and not is_admin:
         raise HTTPException(
@@ -74,8 +85,8 @@ async def signup(
             detail="Access not provided for creating ADMIN account",
         )
 
+    hashed_password = await password_hasher.hash(user.password)
     try:
-        hashed_password = password_context.hash(user.password)
         db_user = User(
             username=user.username,
             name=user.name,
@@ -85,8 +96,8 @@ async def signup(
         )
 
         db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
+        await db.refresh(db_user)
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Failed insering into db. Error:{e}"
@@ -94,7 +105,7 @@ async def signup(
 
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_jwt_token(
-        {"username": db_user.username}, expires_delta=access_token_expires
+        token_claims(db_user), expires_delta=access_token_expires
     )
 
     response = JSONResponse(
@@ -113,7 +124,11 @@ async def signup(
 
 
 @router.post("/login")
-async def login(user_login: UserLogin, db=Depends(get_db)) -> JSONResponse:
+async def login(
+    user_login: UserLogin,
+    db: AsyncSession = Depends(get_db),
+    password_hasher: PasswordHasher = Depends(get_password_hasher),
+) -> JSONResponse:
     """
     Log in a user by verifying their credentials and providing an access token.
 
@@ -122,7 +137,8 @@ async def login(user_login: UserLogin, db=Depends(get_db)) -> JSONResponse:
     - **user_login**: (UserLogin) User login details
         - **username**: Username of the user
         - **password**: Password of the user
-    **db**: (Session) Database session
+    **db**: (AsyncSession) Database session
+    **password_hasher**: (PasswordHasher) Password hashing pool
 
     Returns
     -------
@@ -132,15 +148,14 @@ async def login(user_login: UserLogin, db=Depends(get_db)) -> JSONResponse:
     ------
     - **HTTPException**
         - **401 Unauthorized** - If the provided username or password is incorrect
+        - **503** - If the password hashing pool is saturated
     """
     username = user_login.username
     password = user_login.password
 
-    user = db.query(User).filter(User.username == username).first()
+    user = (await db.execute(select(User).where(User.username == username))).scalar_one_or_none()
 
-    if user is None or not bcrypt.checkpw(
-        password.encode("utf-8"), user.password.encode("utf-8")
-    ):
+    if user is None or not await password_hasher.verify(password, user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -148,7 +163,7 @@ async def login(user_login: UserLogin, db=Depends(get_db)) -> JSONResponse:
 
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_jwt_token(
-        {"username": user.username}, expires_delta=access_token_expires
+        token_claims(user), expires_delta=access_token_expires
     )
 
     response = JSONResponse(
@@ -167,13 +182,13 @@ async def login(user_login: UserLogin, db=Depends(get_db)) -> JSONResponse:
 
 
 @router.post("/logout")
-async def logout(user: UserResponse = Depends(get_current_user)):
+async def logout(user: UserPrincipal = Depends(get_current_user)):
     """
     Log out a user by clearing the access token cookie.
 
     Parameters
     ----------
-    - **user**: (UserResponse) User information obtained from the access token, obtained through `get_current_user`.
+    - **user**: (UserPrincipal) User information obtained from the access token, obtained through `get_current_user`.
 
     Returns
     -------
@@ -195,15 +210,34 @@ async def logout(user: UserResponse = Depends(get_current_user)):
     )
 
 
+@router.get("/_hashing/stats")
+async def get_hashing_stats(
+    password_hasher: PasswordHasher = Depends(get_password_hasher),
+) -> JSONResponse:
+    """
+    Get the counters of the password hashing pool
+
+    Parameters
+    ----------
+    - **password_hasher**: (PasswordHasher) Password hashing pool
+
+    Returns
+    -------
+    - **JSONResponse**: JSON response with the pool size, queue limit, work factor, running / queued /
+      completed / rejected calls and average duration of a call
+    """
+    return JSONResponse(status_code=200, content=password_hasher.stats())
+
+
 @router.get("/{username}", response_model=UserResponse)
-async def get_user(username: str, db=Depends(get_db)):
+async def get_user(username: str, db: AsyncSession = Depends(get_db)):
     """
     Retrieve user information by user ID.
 
     Parameters
     ----------
     - **username**: (int) The username of the user to retrieve.
-    **db**: (Session) Database session
+    **db**: (AsyncSession) Database session
 
     Returns
     -------
@@ -216,7 +250,7 @@ async def get_user(username: str, db=Depends(get_db)):
         - **500** - If there is an error while fetching user information
     """
     try:
-        db_user = db.query(User).filter(User.username == username).first()
+        db_user = (await db.execute(select(User).where(User.username == username))).scalar_one_or_none()
         if db_user is None:
             raise HTTPException(status_code=404, detail="User not found")
     except Exception:
@@ -226,7 +260,11 @@ async def get_user(username: str, db=Depends(get_db)):
 
 @router.put("/{username}")
 async def update_user(
-    username: str, user: UserUpdate, db=Depends(get_db)
+    username: str,
+    user: UserUpdate,
+    db: AsyncSession = Depends(get_db),
+    user_cache: UserCache = Depends(get_user_cache),
+    password_hasher: PasswordHasher = Depends(get_password_hasher),
 ) -> JSONResponse:
     """
     Update user information by user ID.
@@ -235,7 +273,9 @@ async def update_user(
     ----------
     - **user_id**: (int) The ID of the user to update.
     - **user**: (UserUpdate) User update details
-    **db**: (Session) Database session
+    **db**: (AsyncSession) Database session
+    **user_cache**: (UserCache) Cache of resolved users - entries of the user are dropped
+    **password_hasher**: (PasswordHasher) Password hashing pool
 
     Returns
     -------
@@ -246,17 +286,23 @@ async def update_user(
     - **HTTPException**
         - **404** - If the user with the specified ID is not found
         - **500** - If there is an error while updating user information
+        - **503** - If the password hashing pool is saturated
     """
+    hashed_password = await password_hasher.hash(user.password)
     try:
-        db_user = db.query(User).filter(User.username == username).first()
+        db_user = (await db.execute(select(User).where(User.username == username))).scalar_one_or_none()
         if db_user is None:
             raise HTTPException(status_code=404, detail="User not found")
         for key, value in user.dict().items():
             setattr(db_user, key, value)
-        db.commit()
-        db.refresh(db_user)
+        db_user.password = hashed_password
+        await db.commit()
+        await db.refresh(db_user)
     except Exception:
         raise HTTPException(status_code=500, detail="Failed to update user details.")
+    if user_cache is not None:
+        user_cache.invalidate(username)
+        user_cache.invalidate(db_user.username)
     return JSONResponse(
         status_code=201,
         content={"message": f"User - '{db_user.username}' updated successfully."},
@@ -264,14 +310,19 @@ async def update_user(
 
 
 @router.delete("/{username}")
-async def delete_user(username: str, db=Depends(get_db)) -> JSONResponse:
+async def delete_user(
+    username: str,
+    db: AsyncSession = Depends(get_db),
+    user_cache: UserCache = Depends(get_user_cache),
+) -> JSONResponse:
     """
     Delete a user by user ID.
 
     Parameters
     ----------
     - **user_id**: (int) The ID of the user to delete.
-    **db**: (Session) Database session
+    **db**: (AsyncSession) Database session
+    **user_cache**: (UserCache) Cache of resolved users - entries of the user are dropped
 
     Returns
     -------
@@ -284,13 +335,15 @@ async def delete_user(username: str, db=Depends(get_db)) -> JSONResponse:
         - **500** - If there is an error while deleting user information
     """
     try:
-        db_user = db.query(User).filter(User.username == username).first()
+        db_user = (await db.execute(select(User).where(User.username == username))).scalar_one_or_none()
         if db_user is None:
             raise HTTPException(status_code=404, detail="User not found")
-        db.delete(db_user)
-        db.commit()
+        await db.delete(db_user)
+        await db.commit()
     except Exception:
         raise HTTPException(status_code=500, detail="Failed to delete user details.")
+    if user_cache is not None:
+        user_cache.invalidate(username)
     return JSONResponse(
         status_code=201,
         content={"message": f"User - '{db_user.username}' deleted successfully."},
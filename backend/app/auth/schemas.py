@@ -31,6 +31,19 @@ class UserUpdate(BaseModel):
     user_type: UserType
 
 
+class UserPrincipal(BaseModel):
+    """
+    Authenticated user, as resolved from an access token
+    """
+    id: int
+    username: str
+    user_type: UserType
+
+    @classmethod
+    def from_orm(cls, user):
+        return cls(id=user.id, username=user.username, user_type=user.user_type)
+
+
 class UserResponse(BaseModel):
     id: int
     username: str
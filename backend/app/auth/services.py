@@ -0,0 +1,205 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional
+
+import bcrypt
+from fastapi import status
+from fastapi.exceptions import HTTPException
+
+from app.auth.constants import (ACCESS_TOKEN_EXPIRE_MINUTES, AUTH_BCRYPT_ROUNDS, AUTH_HASH_MAX_QUEUE,
+                                AUTH_HASH_WORKERS)
+from app.auth.schemas import UserPrincipal
+from app.index.utils.cache import TTLCache
+
+
+class UserCache:
+    """
+    In-process cache of the users resolved from access tokens
+
+    Entries are keyed by username and token (a new token never hits an entry
+    cached for another one) and tagged with the username, so that updating or
+    deleting a user drops all its entries. The time of the last change of every
+    user is kept for the lifetime of a token: token claims issued before a change
+    are not trusted anymore.
+
+    Parameters
+    ----------
+    - **maxsize**: (int) Maximum number of cached users
+    - **ttl**: (float) Time to live of a cached user, in seconds
+    """
+
+    def __init__(self, maxsize: int = 4096, ttl: float = 60):
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._changed_at: Dict[str, float] = {}
+
+    def get(self, username: str, token: str) -> Optional[UserPrincipal]:
+        return self.cache.get((username, token))
+
+    def set(self, username: str, token: str, user: UserPrincipal, ttl: Optional[float] = None) -> None:
+        self.cache.set((username, token), user, tags=(username,), ttl=ttl)
+
+    def invalidate(self, username: str) -> None:
+        """
+        Drop the cached entries of a user - to be called when the user is updated or deleted
+
+        Parameters
+        ----------
+        - **username**: (str) Username of the user
+        """
+        self.cache.invalidate(username)
+        now = time.time()
+        self._changed_at[username] = now
+        expired = now - ACCESS_TOKEN_EXPIRE_MINUTES * 60
+        for changed_username, changed_at in list(self._changed_at.items()):
+            if changed_at < expired:
+                del self._changed_at[changed_username]
+
+    def claims_valid(self, username: str, issued_at: float) -> bool:
+        """
+        Check whether the claims of a token are still up to date
+
+        Parameters
+        ----------
+        - **username**: (str) Username of the token
+        - **issued_at**: (float) Issue time (`iat`) of the token
+
+        Returns
+        -------
+        - **bool**: Whether the user did not change since the token was issued
+        """
+        changed_at = self._changed_at.get(username)
+        return changed_at is None or issued_at > changed_at
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+
+class PasswordHasher:
+    """
+    Hash and verify passwords with bcrypt on a dedicated, bounded thread pool
+
+    bcrypt costs 100-300 ms of CPU per call - run on the event loop it would stall
+    every other request of the worker. Calls are queued to `workers` threads; once
+    `max_queue` calls are waiting, new ones are rejected with a 503 instead of
+    piling up.
+
+    Parameters
+    ----------
+    - **workers**: (int) Number of hashing threads
+    - **max_queue**: (int) Maximum number of calls waiting for a thread
+    - **rounds**: (int) bcrypt work factor of the new hashes
+    """
+
+    def __init__(self, workers: int = AUTH_HASH_WORKERS, max_queue: int = AUTH_HASH_MAX_QUEUE,
+                 rounds: int = AUTH_BCRYPT_ROUNDS):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.rounds = rounds
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hasher")
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.busy_seconds = 0.0
+        # the counters are updated by the hashing threads
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _timed(function, *args):
+        started = time.perf_counter()
+        result = function(*args)
+        return result, time.perf_counter() - started
+
+    def _release(self, future: Future) -> None:
+        # done-callback of the executor future - a call keeps its slot until its thread is done, even when
+        # the caller stopped waiting (cancelled request, timeout)
+        with self._lock:
+            self.pending -= 1
+            if not future.cancelled() and future.exception() is None:
+                self.completed += 1
+                self.busy_seconds += future.result()[1]
+
+    async def _run(self, function, *args):
+        with self._lock:
+            if self.pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many concurrent authentications - retry later",
+                    headers={"Retry-After": "1"},
+                )
+            self.pending += 1
+        try:
+            future = self._executor.submit(self._timed, function, *args)
+        except RuntimeError:
+            with self._lock:
+                self.pending -= 1
+            raise
+        future.add_done_callback(self._release)
+        result, _ = await asyncio.wrap_future(future)
+        return result
+
+    async def hash(self, password: str) -> str:
+        """
+        Hash a password
+
+        Parameters
+        ----------
+        - **password**: (str) Password
+
+        Returns
+        -------
+        - **str**: bcrypt hash of the password
+
+        Raises
+        ------
+        - **HTTPException**
+            - **503** - If the hashing queue is full
+        """
+        salt = bcrypt.gensalt(rounds=self.rounds)
+        hashed = await self._run(bcrypt.hashpw, password.encode("utf-8"), salt)
+        return hashed.decode("utf-8")
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        """
+        Check a password against its hash
+
+        Parameters
+        ----------
+        - **password**: (str) Password
+        - **hashed**: (str) bcrypt hash
+
+        Returns
+        -------
+        - **bool**: Whether the password matches
+
+        Raises
+        ------
+        - **HTTPException**
+            - **503** - If the hashing queue is full
+        """
+        return await self._run(bcrypt.checkpw, password.encode("utf-8"), hashed.encode("utf-8"))
+
+    def stats(self) -> dict:
+        """
+        Get the pool counters
+
+        Returns
+        -------
+        - **dict**: Pool size and limits, work factor, calls running or waiting, completed and rejected
+          calls, and average duration of a call
+        """
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "rounds": self.rounds,
+            "running": min(self.pending, self.workers),
+            "queued": max(self.pending - self.workers, 0),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "average_seconds": self.busy_seconds / self.completed if self.completed else 0.0,
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
@@ -1,6 +1,5 @@
-from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
 import os
 
@@ -12,12 +11,30 @@ db_password = os.environ['DB_PASS']
 db_host = os.environ['DB_HOST']
 db_port = os.environ['DB_PORT']
 
-# postgresql pspcopg url
+# connection pool of every worker - keep (pool_size + max_overflow) * workers below postgres max_connections
+db_pool_size = int(os.environ.get('DB_POOL_SIZE', 10))
+db_max_overflow = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+# seconds to wait for a free connection before failing the request
+db_pool_timeout = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+# seconds after which a connection is replaced - avoids using connections closed by the server
+db_pool_recycle = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+db_pool_pre_ping = os.environ.get('DB_POOL_PRE_PING', 'true').strip().lower() in ('1', 'true', 'yes')
+# server side timeout of a statement (milliseconds) - 0 disables it
+db_statement_timeout = int(os.environ.get('DB_STATEMENT_TIMEOUT', 30000))
+
+# postgresql pspcopg url (the async engine uses the asyncio api of psycopg)
 db_url = f"postgresql+psycopg://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
 
-sync_engine = create_engine(db_url)
-SessionLocal = sessionmaker(autocommit=False,
-                            autoflush=False,
-                            bind=sync_engine)
+async_engine = create_async_engine(db_url,
+                                   pool_size=db_pool_size,
+                                   max_overflow=db_max_overflow,
+                                   pool_timeout=db_pool_timeout,
+                                   pool_recycle=db_pool_recycle,
+                                   pool_pre_ping=db_pool_pre_ping,
+                                   connect_args={"options": f"-c statement_timeout={db_statement_timeout}"})
+# objects stay usable after commit - no implicit (blocking) refresh on attribute access
+AsyncSessionLocal = async_sessionmaker(bind=async_engine,
+                                       autoflush=False,
+                                       expire_on_commit=False)
 
 Base = declarative_base()
@@ -0,0 +1,105 @@
+"""
+Identification throughput benchmark of the micro-batching queue
+
+Usage: python -m app.identify.benchmark [--requests 256] [--concurrency 32] [--max-batch-size 16] [--max-wait-ms 5]
+                                         [--threads 4] [--backend torch-int8]
+
+Runs a burst of identifications of synthetic images through `MicroBatcher` and
+reports the throughput and latency percentiles. `--max-batch-size 1` runs one
+forward pass per image, as `predict_top_k` does; `--threads` pins the number of
+torch threads to compare the throughput per core and `--backend` selects the
+inference backend.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from PIL import Image
+
+from app.identify.constants import (IDENTIFY_BACKEND, IDENTIFY_BATCH_MAX_SIZE, IDENTIFY_BATCH_MAX_WAIT_MS,
+                                    IDENTIFY_MODEL_PATH)
+from app.identify.services import MicroBatcher, load_classifier
+
+
+def _percentile(values: list, percentile: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * percentile))]
+
+
+async def benchmark(classifier, requests: int, concurrency: int, max_batch_size: int, max_wait_ms: float,
+                    k: int = 5) -> dict:
+    """
+    Identify `requests` images, `concurrency` at a time
+
+    Parameters
+    ----------
+    - **classifier**: (VisionTransformer) Plant image classifier
+    - **requests**: (int) Number of identifications
+    - **concurrency**: (int) Number of concurrent identifications
+    - **max_batch_size**: (int) Maximum number of images per forward pass
+    - **max_wait_ms**: (float) Time the first request of a batch waits for others, in milliseconds
+    - **k**: (int) Number of predictions per image
+
+    Returns
+    -------
+    - **dict**: Identifications per second, latency (median, p99, max - in milliseconds) and average batch size
+    """
+    image = Image.effect_noise((640, 480), 64).convert("RGB")
+    batcher = MicroBatcher(classifier, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms, max_queue=requests)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def identify():
+        async with semaphore:
+            started = time.perf_counter()
+            await batcher.predict(image, k)
+            latencies.append(time.perf_counter() - started)
+
+    runner = asyncio.create_task(batcher.run())
+    # warm up - the first forward passes allocate the buffers of torch
+    await batcher.predict(image, k)
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(identify() for _ in range(requests)))
+    finally:
+        elapsed = time.perf_counter() - started
+        runner.cancel()
+        batcher.shutdown()
+
+    latencies.sort()
+    stats = batcher.stats()
+    return {
+        "identifications_per_second": round(requests / elapsed, 1),
+        "latency_median_ms": round(statistics.median(latencies) * 1000, 1),
+        "latency_p99_ms": round(_percentile(latencies, 0.99) * 1000, 1),
+        "latency_max_ms": round(latencies[-1] * 1000, 1),
+        "average_batch_size": round(stats["average_batch_size"], 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the identification throughput of the micro-batching queue")
+    parser.add_argument("--requests", type=int, default=256, help="number of identifications")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent identifications")
+    parser.add_argument("--max-batch-size", type=int, default=IDENTIFY_BATCH_MAX_SIZE, help="images per forward pass")
+    parser.add_argument("--max-wait-ms", type=float, default=IDENTIFY_BATCH_MAX_WAIT_MS, help="batch gathering time")
+    parser.add_argument("--threads", type=int, default=None, help="torch threads (default: torch default)")
+    parser.add_argument("--backend", default=IDENTIFY_BACKEND, help="inference backend (default: %(default)s)")
+    parser.add_argument("--model-path", default=IDENTIFY_MODEL_PATH, help="checkpoint directory of the model")
+    args = parser.parse_args()
+
+    if args.threads:
+        import torch
+
+        torch.set_num_threads(args.threads)
+    classifier = load_classifier(args.model_path, backend=args.backend)
+    result = asyncio.run(benchmark(classifier, args.requests, args.concurrency, args.max_batch_size, args.max_wait_ms))
+    threads = f", {args.threads} threads" if args.threads else ""
+    print(f"{args.requests} identifications, {args.backend}, max batch {args.max_batch_size}{threads}: "
+          f"{result['identifications_per_second']} identifications/s (average batch {result['average_batch_size']}), "
+          f"latency median {result['latency_median_ms']} ms, p99 {result['latency_p99_ms']} ms, "
+          f"max {result['latency_max_ms']} ms")
+
+
+if __name__ == "__main__":
+    main()
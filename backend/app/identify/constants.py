@@ -0,0 +1,39 @@
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# load the plant image classifier (arcane) on startup - the identify routes answer 503 without it
+IDENTIFY_ENABLED = os.environ.get("IDENTIFY_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+# checkpoint directory of the classifier (default: the checkpoint shipped with arcane)
+IDENTIFY_MODEL_PATH = os.environ.get("IDENTIFY_MODEL_PATH") or None
+# inference backend - torch (fp32), torch-int8, torchscript, onnx or onnx-int8 (see arcane.image_classifier.backends)
+IDENTIFY_BACKEND = os.environ.get("IDENTIFY_BACKEND", "torch")
+# directory of the exported (torchscript / onnx) models (default: <model path>/exports)
+IDENTIFY_EXPORT_DIR = os.environ.get("IDENTIFY_EXPORT_DIR") or None
+# memory-map the fp32 weights from the checkpoint - the pages are shared by all the workers of the box
+IDENTIFY_MMAP_WEIGHTS = os.environ.get("IDENTIFY_MMAP_WEIGHTS", "true").strip().lower() in ("1", "true", "yes")
+# load the classifier when app.main is imported - with `gunicorn --preload`, once, before the workers are forked
+IDENTIFY_PRELOAD = os.environ.get("IDENTIFY_PRELOAD", "false").strip().lower() in ("1", "true", "yes")
+# backends safe to load before a fork - ONNX Runtime sessions and TorchScript start threads that deadlock the workers
+IDENTIFY_PRELOAD_BACKENDS = ("torch", "torch-int8")
+
+# uploaded images are read into memory, from the body stream - larger uploads are rejected with 413
+IDENTIFY_MAX_UPLOAD_BYTES = int(os.environ.get("IDENTIFY_MAX_UPLOAD_BYTES", 10 * 1024 * 1024))
+# bytes of multipart envelope (boundaries, part headers, other fields) allowed on top of the image
+IDENTIFY_MULTIPART_OVERHEAD = 64 * 1024
+# decoded images above this size are rejected with 400 (decompression bombs)
+IDENTIFY_MAX_IMAGE_PIXELS = int(os.environ.get("IDENTIFY_MAX_IMAGE_PIXELS", 40_000_000))
+# input size of the classifier - JPEGs are decoded at the smallest scale (1/2, 1/4, 1/8) still covering it
+IDENTIFY_DECODE_SIZE = (224, 224)
+
+IDENTIFY_TOP_K = 5
+IDENTIFY_MAX_TOP_K = 50
+
+# micro-batching - concurrent identifications are gathered into one forward pass of the model
+IDENTIFY_BATCH_MAX_SIZE = int(os.environ.get("IDENTIFY_BATCH_MAX_SIZE", 16))
+# time the first request of a batch waits for others to join (milliseconds)
+IDENTIFY_BATCH_MAX_WAIT_MS = float(os.environ.get("IDENTIFY_BATCH_MAX_WAIT_MS", 5))
+# requests waiting for a batch before new ones are rejected with 503
+IDENTIFY_BATCH_MAX_QUEUE = int(os.environ.get("IDENTIFY_BATCH_MAX_QUEUE", 256))
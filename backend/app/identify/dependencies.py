@@ -0,0 +1,31 @@
+from fastapi import Request, status
+from fastapi.exceptions import HTTPException
+
+from app.identify.services import MicroBatcher
+
+
+def get_identify_batcher(request: Request) -> MicroBatcher:
+    """
+    Get the micro-batching queue of the plant image classifier - the classifier is loaded once in the
+    application lifespan
+
+    Parameters
+    ----------
+    - **request**: (Request) Incoming request
+
+    Returns
+    -------
+    - **MicroBatcher**: Micro-batching queue of the classifier
+
+    Raises
+    ------
+    - **HTTPException**
+        - **503** - If the classifier is disabled or failed to load
+    """
+    batcher = getattr(request.app.state, "identify_batcher", None)
+    if batcher is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Plant identification is not available",
+        )
+    return batcher
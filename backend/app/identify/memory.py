@@ -0,0 +1,75 @@
+"""
+Memory report of the gunicorn workers (linux)
+
+Usage: python -m app.identify.memory [--pid <gunicorn master pid>]
+
+Lists the gunicorn master and its workers with their resident (RSS) and
+proportional (PSS) memory. RSS counts the shared pages (memory-mapped or
+preloaded weights) in every worker; PSS divides them among the workers, so the
+sum of the PSS is the memory the server actually uses. Each worker reports its
+own memory at `GET /identify/_memory`.
+"""
+import argparse
+import os
+from typing import List, Optional
+
+from app.identify.services import process_memory
+
+
+def _read(pid: int, name: str) -> str:
+    with open(f"/proc/{pid}/{name}", "rb") as file:
+        return file.read().decode(errors="replace")
+
+
+def _pids() -> List[int]:
+    return [int(entry) for entry in os.listdir("/proc") if entry.isdigit()]
+
+
+def _parent(pid: int) -> int:
+    # the command name may contain spaces - the fields after its closing parenthesis are fixed
+    return int(_read(pid, "stat").rsplit(")", 1)[1].split()[1])
+
+
+def find_master() -> Optional[int]:
+    for pid in _pids():
+        try:
+            if "gunicorn" in _read(pid, "cmdline") and "gunicorn" not in _read(_parent(pid), "cmdline"):
+                return pid
+        except (OSError, ValueError, IndexError):
+            continue
+    return None
+
+
+def workers(master: int) -> List[int]:
+    children = []
+    for pid in _pids():
+        try:
+            if _parent(pid) == master:
+                children.append(pid)
+        except (OSError, ValueError, IndexError):
+            continue
+    return sorted(children)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report the memory of the gunicorn workers")
+    parser.add_argument("--pid", type=int, default=None, help="pid of the gunicorn master (default: found in /proc)")
+    args = parser.parse_args()
+
+    master = args.pid or find_master()
+    if master is None:
+        parser.error("no gunicorn master found - pass --pid")
+
+    print(f"{'process':<16}{'pid':>8}{'rss MB':>10}{'pss MB':>10}{'shared MB':>11}{'private MB':>12}")
+    total_rss = total_pss = 0.0
+    for name, pid in [("master", master)] + [("worker", pid) for pid in workers(master)]:
+        memory = process_memory(pid)
+        total_rss += memory["rss_mb"]
+        total_pss += memory["pss_mb"]
+        print(f"{name:<16}{pid:>8}{memory['rss_mb']:>10}{memory['pss_mb']:>10}{memory['shared_mb']:>11}"
+              f"{memory['private_mb']:>12}")
+    print(f"{'total':<16}{'':>8}{total_rss:>10.1f}{total_pss:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import os
+
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import JSONResponse
+
+from app.identify.constants import IDENTIFY_MAX_TOP_K, IDENTIFY_TOP_K
+from app.identify.dependencies import get_identify_batcher
+from app.identify.services import MicroBatcher, identify_plant, process_memory, read_upload
+
+router = APIRouter(prefix="/identify", tags=["identify"])
+
+
+# the body is parsed by `read_upload` (not by FastAPI, which spools it to a temporary file first) - the
+# multipart form is only declared for the OpenAPI schema
+IDENTIFY_REQUEST_BODY = {
+    "required": True,
+    "content": {
+        "multipart/form-data": {
+            "schema": {
+                "type": "object",
+                "required": ["image"],
+                "properties": {"image": {"type": "string", "format": "binary"}},
+            },
+        },
+    },
+}
+
+
+@router.post("/", openapi_extra={"requestBody": IDENTIFY_REQUEST_BODY})
+async def identify(
+    request: Request,
+    k: int = Query(IDENTIFY_TOP_K, ge=1, le=IDENTIFY_MAX_TOP_K),
+    batcher: MicroBatcher = Depends(get_identify_batcher),
+) -> JSONResponse:
+    """
+    Identify the plant of an uploaded image
+
+    Parameters
+    ----------
+    - **request**: (Request) Multipart upload of the image of the plant (field `image`), read into memory
+    - **k**: (int) Number of predictions
+    - **batcher**: (MicroBatcher) Micro-batching queue of the plant image classifier
+
+    Returns
+    -------
+    - **JSONResponse**: JSON response with the top `k` predictions - `name` and `probability`
+
+    Raises
+    ------
+    - **HTTPException**
+        - **400** - If the upload is not a multipart form, is missing the image, is empty or not a supported image
+        - **413** - If the upload is larger than `IDENTIFY_MAX_UPLOAD_BYTES`
+        - **503** - If the classifier is not loaded or the batching queue is full
+    """
+    data = await read_upload(request)
+    predictions = await identify_plant(batcher, data, k)
+    return JSONResponse(status_code=200, content={"predictions": predictions})
+
+
+@router.get("/_batching/stats")
+async def get_batching_stats(batcher: MicroBatcher = Depends(get_identify_batcher)) -> JSONResponse:
+    """
+    Get the counters of the micro-batching queue of the plant image classifier
+
+    Parameters
+    ----------
+    - **batcher**: (MicroBatcher) Micro-batching queue of the plant image classifier
+
+    Returns
+    -------
+    - **JSONResponse**: JSON response with the batching limits, queued / completed / rejected requests,
+      batch size distribution, queue wait and duration of a forward pass
+    """
+    return JSONResponse(status_code=200, content=batcher.stats())
+
+
+@router.get("/_memory")
+async def get_memory() -> JSONResponse:
+    """
+    Get the memory of the worker serving the request - compare the workers to check that the weights of the
+    classifier are shared (see `python -m app.identify.memory`)
+
+    Returns
+    -------
+    - **JSONResponse**: JSON response with the pid of the worker and its resident, proportional, shared and
+      private memory (MB)
+    """
+    return JSONResponse(status_code=200, content={"pid": os.getpid(), **process_memory()})
@@ -0,0 +1,389 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Deque, Dict, List, NamedTuple, Optional, Union
+
+from fastapi import Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import HTTPException
+from multipart.exceptions import MultipartParseError
+from multipart.multipart import MultipartParser, parse_options_header
+from PIL import Image, UnidentifiedImageError
+
+from app.identify.constants import (IDENTIFY_BACKEND, IDENTIFY_BATCH_MAX_QUEUE, IDENTIFY_BATCH_MAX_SIZE,
+                                    IDENTIFY_BATCH_MAX_WAIT_MS, IDENTIFY_DECODE_SIZE, IDENTIFY_EXPORT_DIR,
+                                    IDENTIFY_MAX_IMAGE_PIXELS, IDENTIFY_MAX_UPLOAD_BYTES, IDENTIFY_MMAP_WEIGHTS,
+                                    IDENTIFY_MULTIPART_OVERHEAD)
+
+logger = logging.getLogger(__name__)
+
+
+def load_classifier(model_path: Optional[str] = None, backend: str = IDENTIFY_BACKEND,
+                    export_dir: Optional[str] = IDENTIFY_EXPORT_DIR, mmap_weights: bool = IDENTIFY_MMAP_WEIGHTS):
+    """
+    Load the plant image classifier - blocking, to be run once per worker (or before the workers are forked),
+    off the event loop
+
+    Parameters
+    ----------
+    - **model_path**: (str) Checkpoint directory of the model (default: the checkpoint shipped with arcane)
+    - **backend**: (str) Inference backend - `torch`, `torch-int8`, `torchscript`, `onnx` or `onnx-int8`
+    - **export_dir**: (str) Directory of the exported models (default: `<model_path>/exports`)
+    - **mmap_weights**: (bool) Memory-map the fp32 weights - shared by the workers through the page cache
+
+    Returns
+    -------
+    - **VisionTransformer**: Plant image classifier
+    """
+    # torch / transformers are only imported when the classifier is enabled
+    from arcane.image_classifier import VisionTransformer
+
+    options = {"backend": backend, "export_dir": export_dir, "mmap_weights": mmap_weights}
+    return VisionTransformer(model_path, **options) if model_path else VisionTransformer(**options)
+
+
+def process_memory(pid: Union[int, str] = "self") -> Dict[str, float]:
+    """
+    Get the memory of a process (linux) - resident, proportional (shared pages divided among the processes
+    mapping them), shared and private
+
+    Parameters
+    ----------
+    - **pid**: (Union[int, str]) Process id (default: the current process)
+
+    Returns
+    -------
+    - **Dict[str, float]**: `rss_mb`, `pss_mb`, `shared_mb` and `private_mb`
+    """
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as smaps:
+        for line in smaps:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {
+        "rss_mb": round(fields.get("Rss", 0.0), 1),
+        "pss_mb": round(fields.get("Pss", 0.0), 1),
+        "shared_mb": round(fields.get("Shared_Clean", 0.0) + fields.get("Shared_Dirty", 0.0), 1),
+        "private_mb": round(fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0), 1),
+    }
+
+
+async def read_upload(request: Request, field: str = "image", max_bytes: int = IDENTIFY_MAX_UPLOAD_BYTES) -> bytes:
+    """
+    Read the file `field` of a multipart upload into memory, straight from the request body stream
+
+    The body is parsed as it is received - nothing is spooled to a temporary file, and the request is
+    rejected as soon as it declares (`Content-Length`) or sends more than `max_bytes` (plus the multipart
+    envelope)
+
+    Parameters
+    ----------
+    - **request**: (Request) Multipart (`multipart/form-data`) request
+    - **field**: (str) Name of the form field of the file
+    - **max_bytes**: (int) Maximum size of the file
+
+    Returns
+    -------
+    - **bytes**: Content of the file
+
+    Raises
+    ------
+    - **HTTPException**
+        - **400** - If the body is not a multipart form, the file is missing or empty
+        - **413** - If the file is larger than `max_bytes`
+    """
+    too_large = HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Image larger than {max_bytes} bytes",
+    )
+    max_body = max_bytes + IDENTIFY_MULTIPART_OVERHEAD
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > max_body:
+        raise too_large
+
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or not params.get(b"boundary"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Expected a multipart/form-data upload")
+
+    buffer = bytearray()
+    part = {"headers": {}, "field": b"", "value": b"", "selected": False, "found": False}
+
+    def on_part_begin():
+        part.update(headers={}, field=b"", value=b"", selected=False)
+
+    def on_header_field(data: bytes, start: int, end: int):
+        part["field"] += data[start:end]
+
+    def on_header_value(data: bytes, start: int, end: int):
+        part["value"] += data[start:end]
+
+    def on_header_end():
+        part["headers"][part["field"].lower()] = part["value"]
+        part.update(field=b"", value=b"")
+
+    def on_headers_finished():
+        _, options = parse_options_header(part["headers"].get(b"content-disposition", b""))
+        # only the first part named `field` is kept - the other parts are parsed and dropped
+        part["selected"] = not part["found"] and options.get(b"name") == field.encode()
+        part["found"] = part["found"] or part["selected"]
+
+    def on_part_data(data: bytes, start: int, end: int):
+        if part["selected"]:
+            buffer.extend(data[start:end])
+
+    parser = MultipartParser(params[b"boundary"], callbacks={
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+    })
+    received = 0
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > max_body:
+                raise too_large
+            parser.write(chunk)
+            if len(buffer) > max_bytes:
+                raise too_large
+        parser.finalize()
+    except MultipartParseError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Malformed multipart body")
+
+    if not part["found"]:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Missing file field '{field}'")
+    if not buffer:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Empty image")
+    return bytes(buffer)
+
+
+def decode_image(data: bytes, max_pixels: int = IDENTIFY_MAX_IMAGE_PIXELS) -> Image.Image:
+    """
+    Decode an image from memory into RGB - blocking, to be run off the event loop
+
+    Parameters
+    ----------
+    - **data**: (bytes) Encoded image
+    - **max_pixels**: (int) Maximum number of pixels of the image
+
+    Returns
+    -------
+    - **Image.Image**: Decoded RGB image
+
+    Raises
+    ------
+    - **HTTPException**
+        - **400** - If the data is not a supported image or the image is too large
+    """
+    try:
+        image = Image.open(BytesIO(data))
+        # only the header is read so far - check the size before decoding the pixels
+        width, height = image.size
+        if width * height > max_pixels:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Image of {width}x{height} pixels exceeds {max_pixels} pixels",
+            )
+        # JPEGs only - a 12 MP photo is decoded at 1/8 scale, a fraction of the work of a full decode
+        image.draft("RGB", IDENTIFY_DECODE_SIZE)
+        image.load()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, ValueError) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid image. Error:{e}")
+    return image if image.mode == "RGB" else image.convert("RGB")
+
+
+class _BatchItem(NamedTuple):
+    image: Image.Image
+    k: int
+    future: asyncio.Future
+    enqueued_at: float
+
+
+class MicroBatcher:
+    """
+    Gather concurrent identifications into batches - one forward pass of the model per batch
+
+    A batch is run as soon as `max_batch_size` requests are waiting, or `max_wait_ms`
+    after its first request arrived. Requests arriving while a batch runs are
+    gathered into the next one, so batches grow with the load. Batches run one at
+    a time on a dedicated thread (torch parallelises the forward pass itself);
+    once `max_queue` requests are waiting, new ones are rejected with a 503.
+
+    Parameters
+    ----------
+    - **classifier**: (VisionTransformer) Plant image classifier - `predict_batch` is used
+    - **max_batch_size**: (int) Maximum number of images per forward pass
+    - **max_wait_ms**: (float) Time the first request of a batch waits for others, in milliseconds
+    - **max_queue**: (int) Maximum number of requests waiting for a batch
+    """
+
+    def __init__(self, classifier, max_batch_size: int = IDENTIFY_BATCH_MAX_SIZE,
+                 max_wait_ms: float = IDENTIFY_BATCH_MAX_WAIT_MS, max_queue: int = IDENTIFY_BATCH_MAX_QUEUE):
+        self.classifier = classifier
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max(0.0, max_wait_ms)
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="identify-batcher")
+        self._pending: Deque[_BatchItem] = deque()
+        self._wakeup = asyncio.Event()
+        self.requests = 0
+        self.batches = 0
+        self.rejected = 0
+        self.failed = 0
+        self.batch_sizes: Dict[int, int] = {}
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.inference_seconds = 0.0
+
+    async def predict(self, image: Image.Image, k: int) -> List[dict]:
+        """
+        Predict the top k classes of an image, as part of the next batch
+
+        Parameters
+        ----------
+        - **image**: (Image.Image) Decoded RGB image
+        - **k**: (int) Number of predictions
+
+        Returns
+        -------
+        - **List[dict]**: Top `k` predictions - `name` and softmax `probability`, most probable first
+
+        Raises
+        ------
+        - **HTTPException**
+            - **503** - If the batching queue is full
+        """
+        if len(self._pending) >= self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many concurrent identifications - retry later",
+                headers={"Retry-After": "1"},
+            )
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(_BatchItem(image, k, future, time.perf_counter()))
+        self._wakeup.set()
+        return await future
+
+    async def _next_batch(self) -> List[_BatchItem]:
+        while not self._pending:
+            self._wakeup.clear()
+            await self._wakeup.wait()
+        # the first request waits at most `max_wait_ms` for others to join
+        deadline = self._pending[0].enqueued_at + self.max_wait_ms / 1000
+        while len(self._pending) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+        batch = [self._pending.popleft() for _ in range(min(len(self._pending), self.max_batch_size))]
+        # requests whose client went away are dropped
+        return [item for item in batch if not item.future.done()]
+
+    @staticmethod
+    def _timed(function, *args):
+        started = time.perf_counter()
+        result = function(*args)
+        return result, time.perf_counter() - started
+
+    async def run(self) -> None:
+        """
+        Run the batches - to be run as a background task of the application lifespan
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            if not batch:
+                continue
+            started = time.perf_counter()
+            for item in batch:
+                waited = started - item.enqueued_at
+                self.wait_seconds += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+            try:
+                results, seconds = await loop.run_in_executor(
+                    self._executor, self._timed, self.classifier.predict_batch,
+                    [item.image for item in batch], max(item.k for item in batch),
+                )
+            except Exception as e:
+                logger.exception("Failed to identify a batch of %s images", len(batch))
+                self.failed += len(batch)
+                for item in batch:
+                    if not item.future.done():
+                        item.future.set_exception(e)
+                continue
+            self.batches += 1
+            self.requests += len(batch)
+            self.batch_sizes[len(batch)] = self.batch_sizes.get(len(batch), 0) + 1
+            self.inference_seconds += seconds
+            for item, result in zip(batch, results):
+                if not item.future.done():
+                    item.future.set_result(result[:item.k])
+
+    def stats(self) -> dict:
+        """
+        Get the batching counters
+
+        Returns
+        -------
+        - **dict**: Limits, requests waiting, completed / rejected / failed requests, number of batches and
+          their size distribution, average and maximum queue wait and average duration of a forward pass
+        """
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "max_queue": self.max_queue,
+            "queued": len(self._pending),
+            "requests": self.requests,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "batches": self.batches,
+            "average_batch_size": self.requests / self.batches if self.batches else 0.0,
+            "batch_sizes": {str(size): count for size, count in sorted(self.batch_sizes.items())},
+            "average_queue_wait_ms": 1000 * self.wait_seconds / self.requests if self.requests else 0.0,
+            "max_queue_wait_ms": 1000 * self.max_wait_seconds,
+            "average_batch_seconds": self.inference_seconds / self.batches if self.batches else 0.0,
+        }
+
+    def shutdown(self) -> None:
+        while self._pending:
+            item = self._pending.popleft()
+            if not item.future.done():
+                item.future.set_exception(
+                    HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Shutting down")
+                )
+        self._executor.shutdown(wait=False)
+
+
+async def identify_plant(batcher: MicroBatcher, data: bytes, k: int) -> List[dict]:
+    """
+    Identify the plant of an image - decoded in the threadpool and classified in the next batch
+
+    Parameters
+    ----------
+    - **batcher**: (MicroBatcher) Micro-batching queue of the plant image classifier
+    - **data**: (bytes) Encoded image
+    - **k**: (int) Number of predictions
+
+    Returns
+    -------
+    - **List[dict]**: Top `k` predictions - `name` and softmax `probability`, most probable first
+
+    Raises
+    ------
+    - **HTTPException**
+        - **400** - If the data is not a supported image
+        - **503** - If the batching queue is full
+    """
+    image = await run_in_threadpool(decode_image, data)
+    return await batcher.predict(image, k)
@@ -0,0 +1,69 @@
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.environ.get(name, str(default)).strip().lower() in ("1", "true", "yes")
+
+
+# elasticsearch connection settings - shared by the application wide client
+ES_HOSTS = os.environ["ELASTICSEARCH_HOST"].split(",")
+
+ES_CLIENT_OPTIONS = {
+    # connection pool size per elasticsearch node (kept alive between requests)
+    "connections_per_node": int(os.environ.get("ES_CONNECTIONS_PER_NODE", 25)),
+    # per-request timeout in seconds
+    "request_timeout": float(os.environ.get("ES_REQUEST_TIMEOUT", 10)),
+    "max_retries": int(os.environ.get("ES_MAX_RETRIES", 3)),
+    "retry_on_timeout": _env_bool("ES_RETRY_ON_TIMEOUT", True),
+    "retry_on_status": (429, 502, 503, 504),
+    # exponential backoff (in seconds) before a failed node is retried
+    "dead_node_backoff_factor": float(os.environ.get("ES_DEAD_NODE_BACKOFF_FACTOR", 1.0)),
+    "max_dead_node_backoff": float(os.environ.get("ES_MAX_DEAD_NODE_BACKOFF", 30.0)),
+    "sniff_on_start": _env_bool("ES_SNIFF_ON_START", False),
+    "sniff_on_node_failure": _env_bool("ES_SNIFF_ON_NODE_FAILURE", False),
+    "min_delay_between_sniffing": float(os.environ.get("ES_MIN_DELAY_BETWEEN_SNIFFING", 60)),
+    "http_compress": _env_bool("ES_HTTP_COMPRESS", False),
+}
+
+# bulk indexing
+ES_BULK_MAX_CHUNK_BYTES = int(os.environ.get("ES_BULK_MAX_CHUNK_BYTES", 10 * 1024 * 1024))
+# retries (with exponential backoff) of items rejected with 429 - Too Many Requests
+ES_BULK_MAX_RETRIES = int(os.environ.get("ES_BULK_MAX_RETRIES", 3))
+# maximum number of failed items reported back to the client
+ES_BULK_MAX_ERRORS = int(os.environ.get("ES_BULK_MAX_ERRORS", 100))
+
+# how long a point in time (cursor pagination) is kept alive between two pages
+ES_PIT_KEEP_ALIVE = os.environ.get("ES_PIT_KEEP_ALIVE", "2m")
+
+# search result cache - entries are also invalidated by the writes made through the application
+ES_CACHE_ENABLED = _env_bool("ES_CACHE_ENABLED", True)
+ES_CACHE_MAX_ENTRIES = int(os.environ.get("ES_CACHE_MAX_ENTRIES", 2048))
+ES_CACHE_TTL = float(os.environ.get("ES_CACHE_TTL", 60))
+
+# interval (seconds) between two reloads of the local index/alias/uuid registry
+ES_METADATA_REFRESH_INTERVAL = float(os.environ.get("ES_METADATA_REFRESH_INTERVAL", 60))
+# a lookup missing from a registry reloaded less than this many seconds ago is answered without another reload
+ES_METADATA_MISS_REFRESH_INTERVAL = float(os.environ.get("ES_METADATA_MISS_REFRESH_INTERVAL", 5))
+
+# settings applied to an index while it is bulk loaded (reindex, ingestion) - restored afterwards
+ES_BULK_LOAD_SETTINGS = {"refresh_interval": "-1", "number_of_replicas": 0}
+# seconds between two status checks of a long running elasticsearch task
+ES_TASK_POLL_INTERVAL = float(os.environ.get("ES_TASK_POLL_INTERVAL", 2))
+
+# painless script of the updates by query - sets the fields of `params.doc` on every matching document
+ES_UPDATE_FIELDS_SCRIPT = "for (entry in params.doc.entrySet()) { ctx._source[entry.getKey()] = entry.getValue(); }"
+
+# interval (seconds) between two reconciliations of the plant_idx table with the elasticsearch indices
+PLANT_INDEX_RECONCILE_INTERVAL = float(os.environ.get("PLANT_INDEX_RECONCILE_INTERVAL", 300))
+# postgres advisory lock taken by the reconciliation - a single worker reconciles at a time
+PLANT_INDEX_RECONCILE_LOCK = 0x706C616E74696478  # "plantidx"
+
+# a reindex job whose watching worker did not report for this many seconds is taken over by another worker
+PLANT_REINDEX_JOB_LEASE = float(os.environ.get("PLANT_REINDEX_JOB_LEASE", 60))
+
+# interval (seconds) between two checks of the plant_idx table for changes made by other workers
+PLANT_INDEX_REGISTRY_POLL_INTERVAL = float(os.environ.get("PLANT_INDEX_REGISTRY_POLL_INTERVAL", 10))
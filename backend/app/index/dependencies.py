@@ -1,16 +1,56 @@
-from app.database import SessionLocal
+from typing import AsyncIterator
 
+from fastapi import Request
+from sqlalchemy.ext.asyncio import AsyncSession
 
-def get_db():
+from app.database import AsyncSessionLocal
+from app.index.services import PlantIndexRegistry
+from app.index.utils.es import AsyncElasticSearchClient
+
+
+async def get_db() -> AsyncIterator[AsyncSession]:
     """
-    Get database session
+    Get database session - the connection is returned to the pool once the request is handled
 
     Returns
     -------
-    - **Session**: Database session
+    - **AsyncSession**: Database session
     """
-    db = SessionLocal()
-    try:
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+
+def get_es_client(request: Request) -> AsyncElasticSearchClient:
+    """
+    Get the application wide elasticsearch client
+
+    The client is created once in the application lifespan and shares a
+    single connection pool across all the routers.
+
+    Parameters
+    ----------
+    - **request**: (Request) Incoming request
+
+    Returns
+    -------
+    - **AsyncElasticSearchClient**: Elasticsearch client
+    """
+    return request.app.state.es_client
+
+
+async def get_plant_index_registry(request: Request) -> PlantIndexRegistry:
+    """
+    Get the in-memory registry of the plant indices (`plant_idx` table) - loaded on first use if the
+    load of the application lifespan failed (the index routes need the database anyway)
+
+    Parameters
+    ----------
+    - **request**: (Request) Incoming request
+
+    Returns
+    -------
+    - **PlantIndexRegistry**: Plant index registry
+    """
+    registry = request.app.state.plant_index_registry
+    await registry.ensure_loaded()
+    return registry
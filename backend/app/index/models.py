@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Text, DateTime, Integer
+from sqlalchemy import JSON, Column, Text, DateTime, Integer
 from datetime import datetime
 from app.database import Base
 
@@ -13,3 +13,24 @@ class PlantIndex(Base):
     alias = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), default=datetime.now)
     updated_at = Column(DateTime(timezone=True), default=datetime.now, onupdate=datetime.now)
+
+
+class PlantReindexJob(Base):
+    """
+    Blue-green reindex waiting for its alias swap - lets any worker finish the job of a worker that stopped
+    """
+    __tablename__ = "plant_reindex_job"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    task_id = Column(Text, unique=True, nullable=False)
+    source = Column(Text, nullable=False)
+    source_indices = Column(JSON, nullable=False)
+    target = Column(Text, nullable=False)
+    alias = Column(Text, nullable=False)
+    restore_settings = Column(JSON, nullable=False)
+    # running, completed or failed
+    status = Column(Text, nullable=False, default="running")
+    # renewed by the worker watching the task - the job is taken over once it is older than the lease
+    claimed_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), default=datetime.now)
+    updated_at = Column(DateTime(timezone=True), default=datetime.now, onupdate=datetime.now)
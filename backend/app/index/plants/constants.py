@@ -0,0 +1,93 @@
+import os
+
+# name (or alias) of the elasticsearch index holding the plant records
+PLANTS_INDEX = "plants"
+
+# fields searched by default
+PLANTS_SEARCH_FIELDS = ("generic_name", "scientific_name", "accepted_scientific_name")
+
+# maximum number of searches / gets of a batch request
+PLANTS_BATCH_MAX_REQUESTS = 50
+
+# maximum number of operations of a bulk update / delete request
+PLANTS_BULK_WRITE_MAX_OPERATIONS = 1000
+
+# bulk ingestion defaults
+PLANTS_BULK_CHUNK_SIZE = 500
+PLANTS_BULK_CONCURRENCY = 4
+
+# fields served by the in-memory autocomplete (`<field>.autocomplete` completion sub-fields in elasticsearch)
+PLANTS_AUTOCOMPLETE_FIELDS = ("scientific_name", "generic_name", "accepted_scientific_name")
+# interval (seconds) between two rebuilds of the in-memory autocomplete - picks up writes from other workers
+PLANTS_AUTOCOMPLETE_REFRESH_INTERVAL = 300
+# suggestions reachable by paging the autocomplete (`page` * `size`)
+PLANTS_AUTOCOMPLETE_MAX_SUGGESTIONS = 500
+
+# fields of a plant record (columns of the base dataset)
+PLANT_FIELDS = (
+    "key", "scientific_name", "accepted_scientific_name", "kingdom", "phylum", "order", "family", "genus",
+    "species", "generic_name", "specific_epithet", "taxon_rank", "taxonomic_status", "iucn_red_list_category",
+    "date_identified", "eventDate", "decimal_latitude", "decimal_longitude", "locality", "state_province",
+    "country", "continent", "media", "level0", "level1", "level2", "level3",
+)
+
+# taxonomy facets of the faceted search and number of values returned per facet
+PLANTS_FACET_FIELDS = ("family", "genus", "order", "iucn_red_list_category", "state_province", "country")
+PLANTS_FACET_SIZE = 20
+# maximum age (seconds) of the cached facet counts of the whole catalog - picks up writes from other workers
+PLANTS_FACETS_MAX_AGE = 300
+
+# catalog export defaults
+PLANTS_EXPORT_PAGE_SIZE = 1000
+PLANTS_EXPORT_SLICES = 4
+
+# index template applied to the plant indices (`plants`, `plants-v<timestamp>`, ...) - bump the version on change
+PLANTS_INDEX_TEMPLATE = "plants"
+PLANTS_INDEX_TEMPLATE_VERSION = 1
+PLANTS_INDEX_PATTERNS = ["plants*"]
+
+PLANTS_INDEX_SETTINGS = {
+    "number_of_shards": int(os.environ.get("PLANTS_INDEX_SHARDS", 1)),
+    "number_of_replicas": int(os.environ.get("PLANTS_INDEX_REPLICAS", 1)),
+    # the catalog is read mostly - fewer refreshes mean fewer, larger segments
+    "refresh_interval": os.environ.get("PLANTS_INDEX_REFRESH_INTERVAL", "30s"),
+}
+
+# names - full text search, exact match / sort and completion suggestions
+_NAME_FIELD = {
+    "type": "text",
+    "fields": {
+        "keyword": {"type": "keyword", "ignore_above": 256},
+        "autocomplete": {"type": "completion"},
+    },
+}
+# taxonomy and places - exact match, facets (doc values) only
+_KEYWORD_FIELD = {"type": "keyword", "ignore_above": 256}
+
+PLANTS_INDEX_MAPPINGS = {
+    # fields added through the api that are not mapped below are indexed as keywords
+    "dynamic_templates": [
+        {"strings_as_keywords": {"match_mapping_type": "string", "mapping": _KEYWORD_FIELD}},
+    ],
+    "properties": {
+        "key": {"type": "keyword"},
+        "scientific_name": _NAME_FIELD,
+        "accepted_scientific_name": _NAME_FIELD,
+        "generic_name": _NAME_FIELD,
+        **{
+            field: _KEYWORD_FIELD
+            for field in ("kingdom", "phylum", "order", "family", "genus", "species", "specific_epithet",
+                          "taxon_rank", "taxonomic_status", "iucn_red_list_category", "state_province",
+                          "country", "continent", "level0", "level1", "level2", "level3")
+        },
+        "date_identified": {"type": "keyword", "index": False},
+        "eventDate": {"type": "keyword", "index": False},
+        "locality": {"type": "text"},
+        "decimal_latitude": {"type": "float", "index": False},
+        "decimal_longitude": {"type": "float", "index": False},
+        # built from decimal_latitude / decimal_longitude (see `transform_plant_row`)
+        "location": {"type": "geo_point"},
+        # display only - kept in _source, not indexed
+        "media": {"type": "object", "enabled": False},
+    },
+}
@@ -0,0 +1,71 @@
+from fastapi import Depends, Request
+from fastapi.exceptions import HTTPException
+
+from app.index.dependencies import get_es_client
+from app.index.plants.constants import PLANTS_INDEX
+from app.index.plants.services import PlantAutocomplete, PlantFacets
+from app.index.utils.es import AsyncElasticSearchClient
+
+
+def get_plant_autocomplete(request: Request) -> PlantAutocomplete:
+    """
+    Get the in-memory plant autocomplete of the application
+
+    Parameters
+    ----------
+    - **request**: (Request) Incoming request
+
+    Returns
+    -------
+    - **PlantAutocomplete**: Plant autocomplete
+    """
+    return request.app.state.plant_autocomplete
+
+
+def get_plant_facets(request: Request) -> PlantFacets:
+    """
+    Get the in-process facet counts of the plant catalog
+
+    Parameters
+    ----------
+    - **request**: (Request) Incoming request
+
+    Returns
+    -------
+    - **PlantFacets**: Plant facet counts
+    """
+    return request.app.state.plant_facets
+
+
+async def get_plants_index(
+    request: Request,
+    es_client: AsyncElasticSearchClient = Depends(get_es_client),
+) -> str:
+    """
+    Get the name of the index holding the plant records - `PLANTS_INDEX` itself
+
+    An alias is not resolved to its index: the reads and writes go through the
+    alias and follow its atomic swaps. The registry of the plant indices (loaded in
+    the application lifespan, never from the request) and the local index registry
+    are only used to check that it exists.
+
+    Parameters
+    ----------
+    - **request**: (Request) Incoming request
+    - **es_client**: (AsyncElasticSearchClient) Elasticsearch client
+
+    Returns
+    -------
+    - **str**: Name of the index or alias
+
+    Raises
+    ------
+    - **HTTPException**
+        - **404** - If neither an index nor an alias is named `PLANTS_INDEX`
+    """
+    registry = request.app.state.plant_index_registry
+    if registry.loaded and registry.resolve(PLANTS_INDEX) is not None:
+        return PLANTS_INDEX
+    if not await es_client.index_or_alias_exists(PLANTS_INDEX):
+        raise HTTPException(status_code=404, detail=f"Index - '{PLANTS_INDEX}' does not exists")
+    return PLANTS_INDEX
@@ -0,0 +1,165 @@
+"""
+Load the base dataset CSV into the plants index
+
+Usage: python -m app.index.plants.ingest <csv> [--index plants] [--workers 4] ...
+
+The file is split into chunks of whole CSV records which are parsed and
+transformed (`transform_plant_row`) in a process pool, then indexed by parallel
+bulk requests. Refresh and replicas are disabled during the load and restored
+afterwards.
+"""
+import argparse
+import asyncio
+import csv
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Sequence
+
+from app.index.constants import ES_BULK_LOAD_SETTINGS
+from app.index.plants.constants import (PLANT_FIELDS, PLANTS_BULK_CHUNK_SIZE, PLANTS_BULK_CONCURRENCY, PLANTS_INDEX,
+                                        PLANTS_INDEX_MAPPINGS, PLANTS_INDEX_SETTINGS)
+from app.index.plants.services import transform_plant_row
+from app.index.utils.es import AsyncElasticSearchClient
+
+
+def read_chunks(path: str, chunk_rows: int) -> Iterator[List[str]]:
+    """
+    Read a CSV file in chunks of about `chunk_rows` lines, never splitting a record
+
+    Parameters
+    ----------
+    - **path**: (str) Path of the CSV file
+    - **chunk_rows**: (int) Number of lines per chunk
+
+    Returns
+    -------
+    - **Iterator[List[str]]**: Chunks of lines (line terminators included)
+    """
+    with open(path, newline="", encoding="utf-8") as file:
+        chunk, quotes = [], 0
+        for line in file:
+            chunk.append(line)
+            quotes += line.count('"')
+            # an odd number of quotes means a quoted field continues on the next line
+            if len(chunk) >= chunk_rows and quotes % 2 == 0:
+                yield chunk
+                chunk, quotes = [], 0
+        if chunk:
+            yield chunk
+
+
+def parse_chunk(lines: List[str], columns: Sequence[str]) -> List[dict]:
+    """
+    Parse and transform a chunk of CSV lines into plant records - runs in a worker process
+
+    Parameters
+    ----------
+    - **lines**: (List[str]) Lines of whole CSV records
+    - **columns**: (Sequence[str]) Column names
+
+    Returns
+    -------
+    - **List[dict]**: Plant records
+    """
+    documents = []
+    for row in csv.reader(lines):
+        # skip blank lines and the header row
+        if not row or row == list(columns):
+            continue
+        documents.append(transform_plant_row(dict(zip(columns, row))))
+    return documents
+
+
+async def ingest(path: str, index: str = PLANTS_INDEX, workers: int = None, chunk_rows: int = 5000,
+                 bulk_chunk_size: int = PLANTS_BULK_CHUNK_SIZE, concurrency: int = PLANTS_BULK_CONCURRENCY) -> dict:
+    """
+    Load a base dataset CSV into an index
+
+    Parameters
+    ----------
+    - **path**: (str) Path of the CSV file
+    - **index**: (str) Name of the index or alias - an index is created (with the plant mappings) if it
+      does not exist
+    - **workers**: (int) Number of parsing processes (default: number of CPUs)
+    - **chunk_rows**: (int) Number of CSV lines parsed per task
+    - **bulk_chunk_size**: (int) Number of records per bulk request
+    - **concurrency**: (int) Number of bulk requests in flight
+
+    Returns
+    -------
+    - **dict**: Number of `indexed` and `failed` records, reported `errors`, `seconds` and `rows_per_second`
+    """
+    workers = workers or os.cpu_count() or 1
+    es_client = AsyncElasticSearchClient()
+    try:
+        # after a blue-green reindex the name is an alias - the documents go to the index behind it
+        if not await es_client.index_or_alias_exists(index):
+            await es_client.create_index(index, mappings=PLANTS_INDEX_MAPPINGS, settings=PLANTS_INDEX_SETTINGS)
+        # the bulk-load settings are changed, then restored, on the concrete indices behind the name
+        previous_settings = {}
+        for name in await es_client.resolve_alias(index):
+            previous_settings.update(await es_client.put_index_settings(name, ES_BULK_LOAD_SETTINGS))
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        rows = 0
+
+        async def documents():
+            nonlocal rows
+            pending = deque()
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                chunks = read_chunks(path, chunk_rows)
+                while True:
+                    # keep every worker busy, without reading the whole file ahead
+                    while len(pending) < 2 * workers:
+                        chunk = next(chunks, None)
+                        if chunk is None:
+                            break
+                        pending.append(loop.run_in_executor(pool, parse_chunk, chunk, PLANT_FIELDS))
+                    if not pending:
+                        break
+                    for document in await pending.popleft():
+                        yield document
+                    rows_before, rows = rows, rows + chunk_rows
+                    if rows // 50000 > rows_before // 50000:
+                        elapsed = time.perf_counter() - started
+                        print(f"~{rows} rows read ({rows / elapsed:.0f} rows/s)", file=sys.stderr)
+
+        try:
+            report = await es_client.bulk_index_documents(index, documents(), chunk_size=bulk_chunk_size,
+                                                          concurrency=concurrency, refresh=False)
+        finally:
+            for name, settings in previous_settings.items():
+                await es_client.put_index_settings(name, settings)
+            await es_client.client.indices.refresh(index=index)
+
+        elapsed = time.perf_counter() - started
+        report["seconds"] = round(elapsed, 2)
+        report["rows_per_second"] = round((report["indexed"] + report["failed"]) / elapsed, 1)
+        return report
+    finally:
+        await es_client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load the base dataset CSV into elasticsearch")
+    parser.add_argument("path", help="path of the CSV file (e.g. base_dataset_v2.csv)")
+    parser.add_argument("--index", default=PLANTS_INDEX, help="name of the index (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=None, help="parsing processes (default: number of CPUs)")
+    parser.add_argument("--chunk-rows", type=int, default=5000, help="CSV lines per parsing task")
+    parser.add_argument("--bulk-chunk-size", type=int, default=PLANTS_BULK_CHUNK_SIZE, help="records per bulk request")
+    parser.add_argument("--concurrency", type=int, default=PLANTS_BULK_CONCURRENCY, help="bulk requests in flight")
+    args = parser.parse_args()
+
+    report = asyncio.run(ingest(args.path, index=args.index, workers=args.workers, chunk_rows=args.chunk_rows,
+                                bulk_chunk_size=args.bulk_chunk_size, concurrency=args.concurrency))
+    print(f"Indexed {report['indexed']} rows into '{args.index}' in {report['seconds']}s "
+          f"({report['rows_per_second']} rows/s), {report['failed']} failed")
+    for error in report["errors"]:
+        print(f"  {error}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,43 @@
-from fastapi import APIRouter, Body, Query
+from typing import List
+
+from fastapi import APIRouter, BackgroundTasks, Body, Depends, Query, Request
 from fastapi.exceptions import HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from app.index.dependencies import get_es_client
+from app.index.plants.constants import (PLANTS_AUTOCOMPLETE_MAX_SUGGESTIONS, PLANTS_BULK_CHUNK_SIZE,
+                                        PLANTS_BULK_CONCURRENCY, PLANTS_EXPORT_PAGE_SIZE, PLANTS_EXPORT_SLICES)
+from app.index.plants.dependencies import get_plant_autocomplete, get_plant_facets, get_plants_index
+from app.index.plants.schemas import PlantBatchRequest, PlantBulkWrite, PlantUpdateByQuery
+from app.index.plants.services import (PlantAutocomplete, PlantFacets, bulk_index_plants, bulk_write_plants,
+                                       export_plants, facet_aggregations, facet_counts, plant_facet_query,
+                                       plant_search_query, run_plant_batch, split_fields,
+                                       start_plant_update_by_query)
+from app.index.utils.es import AsyncElasticSearchClient
 
-from app.index.utils.es import ElasticSearchClient
+router = APIRouter(prefix="/plants", tags=["index"])
 
-es_client = ElasticSearchClient()
 
-router = APIRouter(prefix="/plants", tags=["index"])
+def _es_response(content) -> Response:
+    # raw elasticsearch bytes are passed through as is
+    if isinstance(content, bytes):
+        return Response(status_code=200, content=content, media_type="application/json")
+    return JSONResponse(status_code=200, content=content)
 
 
 @router.get("/")
 async def get_plants(
-    page: int = Query(1, ge=1), size: int = Query(20, ge=1, le=50)
-) -> JSONResponse:
+    page: int = Query(1, ge=1),
+    size: int = Query(20, ge=1, le=50),
+    cursor: str = Query(None),
+    use_cursor: bool = Query(False),
+    track_total_hits: bool = Query(True),
+    source_includes: str = Query(None),
+    source_excludes: str = Query(None),
+    raw: bool = Query(False),
+    es_client: AsyncElasticSearchClient = Depends(get_es_client),
+    index: str = Depends(get_plants_index),
+) -> Response:
     """
     Get all plants from plants index
 
@@ -20,16 +45,32 @@ async def get_plants(
     ----------
     - **page**: (int) Page number - greater than or equal to 1 (default: 1)
     - **size**: (int) Number of plants per page - greater than or equal to 1 and less than or equal to 50 (default: 50)
+    - **cursor**: (str) Cursor returned with the previous page - pages with point in time and search_after
+    - **use_cursor**: (bool) Start a cursor pagination - the response carries the `cursor` of the next page
+    - **track_total_hits**: (bool) Count the total number of hits exactly - disable when not needed (default: true)
+    - **source_includes**: (str) Comma separated fields of the plant records to be returned (e.g. `scientific_name,family`)
+    - **source_excludes**: (str) Comma separated fields of the plant records not to be returned (e.g. `media`)
+    - **raw**: (bool) Pass the elasticsearch response through undecoded - ignored in cursor mode (default: false)
+    - **es_client**: (AsyncElasticSearchClient) Elasticsearch client
+    - **index**: (str) Name of the plant index or alias (`PLANTS_INDEX`)
 
     Returns
     -------
-    - **JSONResponse**: JSON response with all plants
+    - **Response**: JSON response with all plants
     """
-    client = es_client.client
-    response = client.search(
-        index="plants", size=size, from_=(page - 1) * size, query={"match_all": {}}
+    response = await es_client.paginated_search(
+        index,
+        size,
+        page=page,
+        cursor=cursor,
+        use_cursor=use_cursor,
+        track_total_hits=track_total_hits,
+        raw=raw,
+        query={"match_all": {}},
+        source_includes=split_fields(source_includes),
+        source_excludes=split_fields(source_excludes),
     )
-    return JSONResponse(status_code=200, content=response.body)
+    return _es_response(response)
 
 
 @router.get("/autocomplete")
@@ -38,33 +79,77 @@ async def autocomplete_plants(
     field: str = Query("scientific_name.autocomplete"),
     page: int = Query(1, ge=1),
     size: int = Query(20, ge=1, le=50),
+    cursor: str = Query(None, deprecated=True),
+    use_cursor: bool = Query(False, deprecated=True),
+    track_total_hits: bool = Query(True, deprecated=True),
+    es_client: AsyncElasticSearchClient = Depends(get_es_client),
+    index: str = Depends(get_plants_index),
+    autocomplete: PlantAutocomplete = Depends(get_plant_autocomplete),
 ) -> JSONResponse:
     """
     Autocomplete plants from plants index
 
+    Suggestions are served from the in-memory autocomplete when it is ready,
+    otherwise from the elasticsearch completion suggester - both rank the names by
+    weight then alphabetically and answer the same options (`text`, `_id`, `_score`).
+    Pages are taken from the deduplicated suggestions, up to
+    `PLANTS_AUTOCOMPLETE_MAX_SUGGESTIONS`.
+
     Parameters
     ----------
     - **query**: (str) Search query
+    - **field**: (str) Completion field (default: scientific_name.autocomplete)
     - **page**: (int) Page number - greater than or equal to 1 (default: 1)
-    - **size**: (int) Number of plants per page - greater than or equal to 1 and less than or equal to 50 (default: 50)
+    - **size**: (int) Number of suggestions per page - greater than or equal to 1 and less than or equal to 50 (default: 20)
+    - **cursor**: (str) Deprecated, ignored - page with `page` and `size`; the response carries a `null`
+      cursor (no next page)
+    - **use_cursor**: (bool) Deprecated, ignored - same as `cursor`
+    - **track_total_hits**: (bool) Deprecated, ignored - suggestions carry no hit count
+    - **es_client**: (AsyncElasticSearchClient) Elasticsearch client
+    - **index**: (str) Name of the plant index or alias (`PLANTS_INDEX`)
+    - **autocomplete**: (PlantAutocomplete) In-memory plant autocomplete
 
     Returns
     -------
-    - **JSONResponse**: JSON response with all plants
-    """
-    client = es_client.client
-    response = client.search(
-        index="plants",
-        size=size,
-        from_=(page - 1) * size,
-        suggest={
-            "autocomplete_suggest": {
-                "text": query,
-                "completion": {"field": field, "skip_duplicates": True, "size": 50},
-            }
-        },
-    )
-    return JSONResponse(status_code=200, content=response.body)
+    - **JSONResponse**: JSON response with the suggestions of the page
+
+    Raises
+    ------
+    - **HTTPException**
+        - **400** - If the page goes beyond `PLANTS_AUTOCOMPLETE_MAX_SUGGESTIONS`
+    """
+    offset = (page - 1) * size
+    if offset + size > PLANTS_AUTOCOMPLETE_MAX_SUGGESTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Only the first {PLANTS_AUTOCOMPLETE_MAX_SUGGESTIONS} suggestions can be paged through",
+        )
+    options = autocomplete.suggest(field, query, size, offset=offset)
+    if options is None:
+        # the completion suggester has no offset - the suggestions up to the page are fetched and sliced
+        response = await es_client.paginated_search(
+            index,
+            0,
+            track_total_hits=False,
+            source=False,
+            suggest={
+                "autocomplete_suggest": {
+                    "text": query,
+                    "completion": {"field": field, "skip_duplicates": True, "size": offset + size},
+                }
+            },
+        )
+        # same options as the in-memory autocomplete
+        options = [
+            {"text": option["text"], "_id": option["_id"], "_score": option["_score"]}
+            for option in response["suggest"]["autocomplete_suggest"][0]["options"][offset:]
+        ]
+    suggestion = {"text": query, "offset": 0, "length": len(query), "options": options}
+    content = {"suggest": {"autocomplete_suggest": [suggestion]}}
+    if cursor is not None or use_cursor:
+        # cursor clients stop paging
+        content["cursor"] = None
+    return JSONResponse(status_code=200, content=content)
 
 
 @router.get("/search")
@@ -73,7 +158,15 @@ async def search_plants(
     fields: str = Query("generic_name,scientific_name,accepted_scientific_name"),
     page: int = Query(1, ge=1),
     size: int = Query(20, ge=1, le=50),
-) -> JSONResponse:
+    cursor: str = Query(None),
+    use_cursor: bool = Query(False),
+    track_total_hits: bool = Query(True),
+    source_includes: str = Query(None),
+    source_excludes: str = Query(None),
+    raw: bool = Query(False),
+    es_client: AsyncElasticSearchClient = Depends(get_es_client),
+    index: str = Depends(get_plants_index),
+) -> Response:
     """
     Search plants from plants index
 
@@ -82,48 +175,330 @@ async def search_plants(
     - **query**: (str) Search query
     - **page**: (int) Page number - greater than or equal to 1 (default: 1)
     - **size**: (int) Number of plants per page - greater than or equal to 1 and less than or equal to 50 (default: 50)
+    - **cursor**: (str) Cursor returned with the previous page - pages with point in time and search_after
+    - **use_cursor**: (bool) Start a cursor pagination - the response carries the `cursor` of the next page
+    - **track_total_hits**: (bool) Count the total number of hits exactly - disable when not needed (default: true)
+    - **source_includes**: (str) Comma separated fields of the plant records to be returned (e.g. `scientific_name,family`)
+    - **source_excludes**: (str) Comma separated fields of the plant records not to be returned (e.g. `media`)
+    - **raw**: (bool) Pass the elasticsearch response through undecoded - ignored in cursor mode (default: false)
+    - **es_client**: (AsyncElasticSearchClient) Elasticsearch client
+    - **index**: (str) Name of the plant index or alias (`PLANTS_INDEX`)
+
+    Returns
+    -------
+    - **Response**: JSON response with all plants
+    """
+    response = await es_client.paginated_search(
+        index,
+        size,
+        page=page,
+        cursor=cursor,
+        use_cursor=use_cursor,
+        track_total_hits=track_total_hits,
+        raw=raw,
+        # normalized so that equivalent searches share the same cache entry
+        query=plant_search_query(query, split_fields(fields)),
+        source_includes=split_fields(source_includes),
+        source_excludes=split_fields(source_excludes),
+    )
+    return _es_response(response)
+
+
+@router.get("/facets")
+async def facet_plants(
+    query: str = Query(None, min_length=3),
+    fields: str = Query("generic_name,scientific_name,accepted_scientific_name"),
+    family: List[str] = Query(None),
+    genus: List[str] = Query(None),
+    order: List[str] = Query(None),
+    iucn_red_list_category: List[str] = Query(None),
+    state_province: List[str] = Query(None),
+    country: List[str] = Query(None),
+    page: int = Query(1, ge=1),
+    size: int = Query(20, ge=1, le=50),
+    source_includes: str = Query(None),
+    source_excludes: str = Query(None),
+    es_client: AsyncElasticSearchClient = Depends(get_es_client),
+    index: str = Depends(get_plants_index),
+    facets: PlantFacets = Depends(get_plant_facets),
+) -> JSONResponse:
+    """
+    Faceted search of plants from plants index
+
+    The hits and the facet counts (terms aggregations) are returned by a single
+    elasticsearch request; the facet filters run in filter context. Without query
+    nor filters the facet counts of the whole catalog are served from memory.
+    The facets of an index mapped before the plant index template are read from
+    their `<field>.keyword` sub-fields.
+
+    Parameters
+    ----------
+    - **query**: (str) Search query - all the plants match if not given
+    - **fields**: (str) Comma separated fields searched by `query`
+    - **family**, **genus**, **order**, **iucn_red_list_category**, **state_province**, **country**: (List[str])
+      Facet filters - repeat the parameter to accept several values (e.g. `family=Fabaceae&family=Rosaceae`)
+    - **page**: (int) Page number - greater than or equal to 1 (default: 1)
+    - **size**: (int) Number of plants per page - greater than or equal to 1 and less than or equal to 50 (default: 20)
+    - **source_includes**: (str) Comma separated fields of the plant records to be returned
+    - **source_excludes**: (str) Comma separated fields of the plant records not to be returned
+    - **es_client**: (AsyncElasticSearchClient) Elasticsearch client
+    - **index**: (str) Name of the plant index or alias (`PLANTS_INDEX`)
+    - **facets**: (PlantFacets) Facet counts of the whole catalog
 
     Returns
     -------
-    - **JSONResponse**: JSON response with all plants
-    """
-    client = es_client.client
-    fields = fields.split(",")
-    response = client.search(
-        index="plants",
-        size=size,
-        from_=(page - 1) * size,
-        query={"multi_match": {"query": query, "fields": fields}},
+    - **JSONResponse**: JSON response with the plants (`hits`) and the facet counts (`facets`)
+
+    Raises
+    ------
+    - **HTTPException**
+        - **409** - If a facet is mapped without a keyword field - reindex the plants
+    """
+    filters = {
+        "family": family,
+        "genus": genus,
+        "order": order,
+        "iucn_red_list_category": iucn_red_list_category,
+        "state_province": state_province,
+        "country": country,
+    }
+    page_options = {
+        "page": page,
+        "source_includes": split_fields(source_includes),
+        "source_excludes": split_fields(source_excludes),
+    }
+    if not query and not any(filters.values()):
+        catalog = await facets.get(es_client, index)
+        response = await es_client.paginated_search(index, size, query={"match_all": {}}, **page_options)
+        return JSONResponse(status_code=200, content={"hits": response["hits"], "facets": catalog["facets"]})
+
+    paths = await facets.paths(es_client, index)
+    response = await es_client.paginated_search(
+        index,
+        size,
+        query=plant_facet_query(query, split_fields(fields), filters, paths),
+        aggs=facet_aggregations(paths=paths),
+        **page_options,
+    )
+    return JSONResponse(
+        status_code=200,
+        content={"hits": response["hits"], "facets": facet_counts(response["aggregations"])},
     )
-    return JSONResponse(status_code=200, content=response.body)
+
+
+@router.post("/batch")
+async def batch_plants(
+    batch: PlantBatchRequest,
+    es_client: AsyncElasticSearchClient = Depends(get_es_client),
+    index: str = Depends(get_plants_index),
+) -> JSONResponse:
+    """
+    Run several plant searches and gets in one call
+
+    The searches are sent as one `_msearch` and the gets as one `_mget` request,
+    concurrently - a view needs a single elasticsearch round-trip instead of one
+    per search / plant.
+
+    Parameters
+    ----------
+    - **batch**: (PlantBatchRequest) Searches and gets (at most 50)
+        - **type**: `search` - **query**, **fields**, **page**, **size**, **source_includes**, **source_excludes**
+          as in `/search`
+        - **type**: `get` - **id**, **source_includes**, **source_excludes** as in `/{plant_id}`
+    - **es_client**: (AsyncElasticSearchClient) Elasticsearch client
+    - **index**: (str) Name of the plant index or alias (`PLANTS_INDEX`)
+
+    Returns
+    -------
+    - **JSONResponse**: JSON response with one result per request, in the same order (`results`)
+        - **status**: Status of the request (200, 404, ...)
+        - **response** | **error**: Search response or plant record, or the error
+    """
+    results = await run_plant_batch(es_client, index, batch.requests)
+    return JSONResponse(status_code=200, content={"results": results})
+
+
+@router.get("/export")
+async def export_plants_catalog(
+    data_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    query: str = Query(None, min_length=3),
+    fields: str = Query("generic_name,scientific_name,accepted_scientific_name"),
+    source_includes: str = Query(None),
+    slices: int = Query(PLANTS_EXPORT_SLICES, ge=1, le=16),
+    es_client: AsyncElasticSearchClient = Depends(get_es_client),
+    index: str = Depends(get_plants_index),
+) -> StreamingResponse:
+    """
+    Export the plants catalog as a stream
+
+    The whole index (or the plants matching `query`) is read from a point in
+    time in parallel slices and streamed as it is read - memory stays constant
+    whatever the catalog size.
+
+    Parameters
+    ----------
+    - **format**: (str) Format of the export - `ndjson` or `csv` (default: ndjson)
+    - **query**: (str) Search query, as in `/search` - all the plants are exported if not given
+    - **fields**: (str) Comma separated fields searched by `query`
+    - **source_includes**: (str) Comma separated fields to be exported (CSV columns)
+    - **slices**: (int) Number of slices read in parallel (default: 4)
+    - **es_client**: (AsyncElasticSearchClient) Elasticsearch client
+    - **index**: (str) Name of the plant index or alias (`PLANTS_INDEX`)
+
+    Returns
+    -------
+    - **StreamingResponse**: NDJSON or CSV stream of the plant records
+    """
+    chunks = export_plants(
+        es_client,
+        index,
+        data_format=data_format,
+        query=plant_search_query(query, split_fields(fields)),
+        columns=split_fields(source_includes),
+        slices=slices,
+        page_size=PLANTS_EXPORT_PAGE_SIZE,
+    )
+    media_type = "text/csv" if data_format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="plants.{data_format}"'},
+    )
+
+
+@router.patch("/bulk")
+async def bulk_write(
+    bulk: PlantBulkWrite,
+    es_client: AsyncElasticSearchClient = Depends(get_es_client),
+    index: str = Depends(get_plants_index),
+    autocomplete: PlantAutocomplete = Depends(get_plant_autocomplete),
+) -> JSONResponse:
+    """
+    Partially update, upsert and delete plant records in one call
+
+    All the operations are sent in a single `_bulk` request. An operation carrying
+    `if_seq_no` and `if_primary_term` (returned by `GET /{plant_id}` and by this
+    endpoint) is only applied if the plant did not change since it was read - a
+    concurrent edit makes it fail with a 409 instead of being silently overwritten.
+
+    Parameters
+    ----------
+    - **bulk**: (PlantBulkWrite) Operations (at most 1000)
+        - **operations**: **action** (`update`, `upsert` or `delete`), **id**, **doc** (fields to be set),
+          **if_seq_no** and **if_primary_term** (optional, not with `upsert`)
+        - **refresh**: Make the changes visible to search before returning (default: false)
+    - **es_client**: (AsyncElasticSearchClient) Elasticsearch client
+    - **index**: (str) Name of the plant index or alias (`PLANTS_INDEX`)
+    - **autocomplete**: (PlantAutocomplete) In-memory plant autocomplete
+
+    Returns
+    -------
+    - **JSONResponse**: JSON response with one result per operation, in the same order (`results`) -
+      status 200 if all the operations were applied, 207 otherwise
+        - **id**, **status**
+        - **result**, **_seq_no**, **_primary_term** | **error**
+
+    Raises
+    ------
+    - **HTTPException**
+        - **4xx** - If elasticsearch rejects the whole request
+    """
+    results = await bulk_write_plants(es_client, index, bulk.operations, autocomplete, refresh=bulk.refresh)
+    failed = sum(1 for result in results if "error" in result)
+    return JSONResponse(status_code=207 if failed else 200, content={"failed": failed, "results": results})
+
+
+@router.post("/update-by-query")
+async def update_plants_by_query(
+    update: PlantUpdateByQuery,
+    es_client: AsyncElasticSearchClient = Depends(get_es_client),
+    index: str = Depends(get_plants_index),
+    autocomplete: PlantAutocomplete = Depends(get_plant_autocomplete),
+) -> JSONResponse:
+    """
+    Set fields on every plant matching a query, as a background elasticsearch task
+
+    Parameters
+    ----------
+    - **update**: (PlantUpdateByQuery) Selected plants and fields to be set
+        - **query**, **fields**: Search query, as in `/search`
+        - **filters**: Accepted values by field, as in `/facets` (e.g. `{"genus": ["Acacia"]}`)
+        - **doc**: Fields to be set
+        - **slices**: Number of parallel slices - one per shard if not given
+        - **requests_per_second**: Throttle of the update - unthrottled if not given
+    - **es_client**: (AsyncElasticSearchClient) Elasticsearch client
+    - **index**: (str) Name of the plant index or alias (`PLANTS_INDEX`)
+    - **autocomplete**: (PlantAutocomplete) In-memory plant autocomplete
+
+    Returns
+    -------
+    - **JSONResponse**: JSON response with the id of the task (`task_id`) - progress at `/index/_tasks/{task_id}`
+
+    Raises
+    ------
+    - **HTTPException**
+        - **409** - If a filtered field is mapped without a keyword field - reindex the plants
+    """
+    task_id = await start_plant_update_by_query(es_client, index, update, autocomplete)
+    return JSONResponse(status_code=202, content={"task_id": task_id})
 
 
 @router.get("/{plant_id}")
-async def get_plant(plant_id: str) -> JSONResponse:
+async def get_plant(
+    plant_id: str,
+    source_includes: str = Query(None),
+    source_excludes: str = Query(None),
+    raw: bool = Query(False),
+    es_client: AsyncElasticSearchClient = Depends(get_es_client),
+    index: str = Depends(get_plants_index),
+) -> Response:
     """
     Get plant details from plants index
 
     Parameters
     ----------
     - **plant_id**: (str) Plant id
+    - **source_includes**: (str) Comma separated fields of the plant record to be returned
+    - **source_excludes**: (str) Comma separated fields of the plant record not to be returned
+    - **raw**: (bool) Pass the elasticsearch response through undecoded (default: false)
+    - **es_client**: (AsyncElasticSearchClient) Elasticsearch client
+    - **index**: (str) Name of the plant index or alias (`PLANTS_INDEX`)
 
     Returns
     -------
-    - **JSONResponse**: JSON response with plant details
+    - **Response**: JSON response with plant details
+
+    Raises
+    ------
+    - **HTTPException**:
+        - **404** - If the plant does not exist.
     """
-    client = es_client.client
-    response = client.get(index="plants", id=plant_id)
-    return JSONResponse(status_code=200, content=response.body)
+    response = await es_client.get_document_by_id(
+        index,
+        plant_id,
+        raw=raw,
+        source_includes=split_fields(source_includes),
+        source_excludes=split_fields(source_excludes),
+    )
+    return _es_response(response)
 
 
 @router.post("/")
-async def add_plants(plant_data: dict = Body(...)) -> JSONResponse:
+async def add_plants(
+    plant_data: dict = Body(...),
+    es_client: AsyncElasticSearchClient = Depends(get_es_client),
+    index: str = Depends(get_plants_index),
+    autocomplete: PlantAutocomplete = Depends(get_plant_autocomplete),
+) -> JSONResponse:
     """
     Add plant records to the Elasticsearch index.
 
     Parameters
     ----------
     - **plant_data**: (dict) JSON data containing plant information.
+    - **es_client**: (AsyncElasticSearchClient) Elasticsearch client
+    - **index**: (str) Name of the plant index or alias (`PLANTS_INDEX`)
+    - **autocomplete**: (PlantAutocomplete) In-memory plant autocomplete
 
     Returns
     -------
@@ -136,9 +511,10 @@ async def add_plants(plant_data: dict = Body(...)) -> JSONResponse:
     """
     try:
         # Add the plant record to the Elasticsearch index
-        response = es_client.index_document("plants", plant_data)
+        response = await es_client.index_document(index, plant_data)
 
         if response:
+            autocomplete.add_document(response, plant_data)
             return JSONResponse(
                 status_code=201, content={"message": "Plant records added successfully"}
             )
@@ -154,8 +530,65 @@ async def add_plants(plant_data: dict = Body(...)) -> JSONResponse:
         )
 
 
+@router.post("/bulk")
+async def bulk_add_plants(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    data_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    chunk_size: int = Query(PLANTS_BULK_CHUNK_SIZE, ge=1, le=5000),
+    concurrency: int = Query(PLANTS_BULK_CONCURRENCY, ge=1, le=16),
+    refresh: bool = Query(True),
+    es_client: AsyncElasticSearchClient = Depends(get_es_client),
+    index: str = Depends(get_plants_index),
+    autocomplete: PlantAutocomplete = Depends(get_plant_autocomplete),
+) -> JSONResponse:
+    """
+    Bulk add plant records streamed in the request body to the Elasticsearch index.
+
+    The body is read as a stream and indexed in chunks, so uploads of any size
+    are supported. A record's `_id` field (if any) is used as the document id.
+
+    Parameters
+    ----------
+    - **request**: (Request) Request with a NDJSON (one JSON object per line) or CSV (with header) body.
+    - **background_tasks**: (BackgroundTasks) Rebuilds the in-memory autocomplete after the response
+    - **format**: (str) Format of the body - `ndjson` or `csv` (default: ndjson)
+    - **chunk_size**: (int) Number of records per bulk request (default: 500)
+    - **concurrency**: (int) Number of bulk requests in flight (default: 4)
+    - **refresh**: (bool) Refresh the index once all the records are indexed - set to false
+      when loading large datasets (default: true)
+    - **es_client**: (AsyncElasticSearchClient) Elasticsearch client
+    - **index**: (str) Name of the plant index or alias (`PLANTS_INDEX`)
+    - **autocomplete**: (PlantAutocomplete) In-memory plant autocomplete
+
+    Returns
+    -------
+    - **JSONResponse**: JSON response with the number of indexed and failed records, and the failed items.
+        - **201** - If all the records are indexed
+        - **207** - If some of the records failed
+    """
+    report = await bulk_index_plants(
+        es_client,
+        index,
+        request.stream(),
+        data_format=data_format,
+        chunk_size=chunk_size,
+        concurrency=concurrency,
+        refresh=refresh,
+    )
+    if report["indexed"]:
+        background_tasks.add_task(autocomplete.build, es_client, index)
+    return JSONResponse(status_code=207 if report["failed"] else 201, content=report)
+
+
 @router.put("/{plant_id}")
-async def update_plant(plant_id: str, plant_data: dict = Body(...)) -> JSONResponse:
+async def update_plant(
+    plant_id: str,
+    plant_data: dict = Body(...),
+    es_client: AsyncElasticSearchClient = Depends(get_es_client),
+    index: str = Depends(get_plants_index),
+    autocomplete: PlantAutocomplete = Depends(get_plant_autocomplete),
+) -> JSONResponse:
     """
     Update a plant record in the Elasticsearch index.
 
@@ -163,6 +596,9 @@ async def update_plant(plant_id: str, plant_data: dict = Body(...)) -> JSONRespo
     ----------
     - **plant_id**: (str) Plant ID to be updated.
     - **plant_data**: (dict) JSON data containing updated plant information.
+    - **es_client**: (AsyncElasticSearchClient) Elasticsearch client
+    - **index**: (str) Name of the plant index or alias (`PLANTS_INDEX`)
+    - **autocomplete**: (PlantAutocomplete) In-memory plant autocomplete
 
     Returns
     -------
@@ -175,9 +611,10 @@ async def update_plant(plant_id: str, plant_data: dict = Body(...)) -> JSONRespo
     """
     try:
         # Update the plant record in the Elasticsearch index
-        response = es_client.update_document_by_id("plants", plant_id, plant_data)
+        response = await es_client.update_document_by_id(index, plant_id, plant_data)
 
         if response:
+            autocomplete.update_document(plant_id, plant_data)
             return JSONResponse(
                 status_code=200,
                 content={"message": "Plant record updated successfully"},
@@ -194,21 +631,30 @@ async def update_plant(plant_id: str, plant_data: dict = Body(...)) -> JSONRespo
 
 
 @router.delete("/{plant_id}")
-async def delete_plant(plant_id: str) -> JSONResponse:
+async def delete_plant(
+    plant_id: str,
+    es_client: AsyncElasticSearchClient = Depends(get_es_client),
+    index: str = Depends(get_plants_index),
+    autocomplete: PlantAutocomplete = Depends(get_plant_autocomplete),
+) -> JSONResponse:
     """
     Delete a plant from plants index
 
     Parameters
     ----------
     - **plant_id**: (str) Plant id
+    - **es_client**: (AsyncElasticSearchClient) Elasticsearch client
+    - **index**: (str) Name of the plant index or alias (`PLANTS_INDEX`)
+    - **autocomplete**: (PlantAutocomplete) In-memory plant autocomplete
 
     Returns
     -------
     - **JSONResponse**: JSON response indicating the success or failure of the deletion
     """
-    response = es_client.delete_document_by_id(index="plants", document_id=plant_id)
+    response = await es_client.delete_document_by_id(index=index, document_id=plant_id)
 
     if response:
+        autocomplete.remove_document(plant_id)
         return JSONResponse(
             status_code=200, content={"message": "Plant deleted successfully"}
         )
@@ -0,0 +1,68 @@
+from typing import Dict, List, Literal, Optional, Union
+
+from pydantic import BaseModel, Field, model_validator
+
+from app.index.plants.constants import (PLANTS_BATCH_MAX_REQUESTS, PLANTS_BULK_WRITE_MAX_OPERATIONS,
+                                        PLANTS_SEARCH_FIELDS)
+
+
+class PlantSearchSpec(BaseModel):
+    type: Literal["search"]
+    query: str = Field(..., min_length=3)
+    fields: List[str] = list(PLANTS_SEARCH_FIELDS)
+    page: int = Field(1, ge=1)
+    size: int = Field(20, ge=1, le=50)
+    source_includes: Optional[List[str]] = None
+    source_excludes: Optional[List[str]] = None
+
+
+class PlantGetSpec(BaseModel):
+    type: Literal["get"]
+    id: str
+    source_includes: Optional[List[str]] = None
+    source_excludes: Optional[List[str]] = None
+
+
+class PlantBatchRequest(BaseModel):
+    requests: List[Union[PlantSearchSpec, PlantGetSpec]] = Field(
+        ..., min_length=1, max_length=PLANTS_BATCH_MAX_REQUESTS
+    )
+
+
+class PlantBulkOperation(BaseModel):
+    action: Literal["update", "upsert", "delete"]
+    id: str
+    doc: Optional[dict] = None
+    if_seq_no: Optional[int] = Field(None, ge=0)
+    if_primary_term: Optional[int] = Field(None, ge=1)
+
+    @model_validator(mode="after")
+    def check_operation(self) -> "PlantBulkOperation":
+        if self.action != "delete" and not self.doc:
+            raise ValueError(f"'doc' is required for '{self.action}'")
+        if (self.if_seq_no is None) != (self.if_primary_term is None):
+            raise ValueError("'if_seq_no' and 'if_primary_term' go together")
+        # elasticsearch rejects the whole bulk request when doc_as_upsert is combined with them
+        if self.action == "upsert" and self.if_seq_no is not None:
+            raise ValueError("'if_seq_no' and 'if_primary_term' are not supported with 'upsert'")
+        return self
+
+
+class PlantBulkWrite(BaseModel):
+    operations: List[PlantBulkOperation] = Field(..., min_length=1, max_length=PLANTS_BULK_WRITE_MAX_OPERATIONS)
+    refresh: bool = False
+
+
+class PlantUpdateByQuery(BaseModel):
+    query: Optional[str] = Field(None, min_length=3)
+    fields: List[str] = list(PLANTS_SEARCH_FIELDS)
+    filters: Dict[str, List[str]] = {}
+    doc: dict = Field(..., min_length=1)
+    slices: Optional[int] = Field(None, ge=1)
+    requests_per_second: Optional[float] = Field(None, gt=0)
+
+    @model_validator(mode="after")
+    def check_selection(self) -> "PlantUpdateByQuery":
+        if not self.query and not any(self.filters.values()):
+            raise ValueError("'query' or 'filters' is required")
+        return self
@@ -0,0 +1,840 @@
+import asyncio
+import codecs
+import csv
+import io
+import json
+import logging
+import math
+import time
+from typing import AsyncIterator, Dict, List, Optional, Union
+
+from elasticsearch import helpers
+from fastapi import status
+from fastapi.exceptions import HTTPException
+
+from app.index.constants import ES_BULK_MAX_ERRORS, ES_TASK_POLL_INTERVAL
+from app.index.plants.constants import (PLANT_FIELDS, PLANTS_AUTOCOMPLETE_FIELDS,
+                                        PLANTS_AUTOCOMPLETE_REFRESH_INTERVAL, PLANTS_FACET_FIELDS,
+                                        PLANTS_FACET_SIZE, PLANTS_FACETS_MAX_AGE, PLANTS_INDEX_MAPPINGS,
+                                        PLANTS_INDEX_PATTERNS, PLANTS_INDEX_SETTINGS, PLANTS_INDEX_TEMPLATE,
+                                        PLANTS_INDEX_TEMPLATE_VERSION)
+from app.index.plants.schemas import PlantBulkOperation, PlantGetSpec, PlantSearchSpec, PlantUpdateByQuery
+from app.index.utils.es import AsyncElasticSearchClient
+from app.index.utils.prefix_index import PrefixIndex
+
+logger = logging.getLogger(__name__)
+
+# references of the running background jobs - keeps them from being garbage collected
+_jobs = set()
+
+
+def split_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """
+    Split a comma separated list of fields
+
+    Parameters
+    ----------
+    - **fields**: (str) Comma separated fields
+
+    Returns
+    -------
+    - **Optional[List[str]]**: Fields, or None if no field is given
+    """
+    if not fields:
+        return None
+    return [field.strip() for field in fields.split(",") if field.strip()] or None
+
+
+def transform_plant_row(row: dict) -> dict:
+    """
+    Turn a row of the base dataset into a plant record
+
+    - `media` holds single quoted JSON: quotes are rewritten and the JSON parsed
+      (the raw value is kept if it is not valid JSON)
+    - `decimal_latitude` / `decimal_longitude` are converted to floats (left out
+      when empty, not a number or not finite) and combined into the `location` geo point
+
+    Parameters
+    ----------
+    - **row**: (dict) CSV row, by column name
+
+    Returns
+    -------
+    - **dict**: Plant record
+    """
+    document = dict(row)
+    media = document.get("media")
+    if isinstance(media, str) and media:
+        try:
+            document["media"] = json.loads(media.replace("'", '"'))
+        except json.JSONDecodeError:
+            pass
+    for field in ("decimal_latitude", "decimal_longitude"):
+        if field in document:
+            try:
+                value = float(document[field])
+            except (TypeError, ValueError):
+                value = None
+            # nan / inf are not valid JSON nor valid coordinates
+            if value is None or not math.isfinite(value):
+                del document[field]
+            else:
+                document[field] = value
+    latitude, longitude = document.get("decimal_latitude"), document.get("decimal_longitude")
+    if latitude is not None and longitude is not None and -90 <= latitude <= 90 and -180 <= longitude <= 180:
+        document["location"] = {"lat": latitude, "lon": longitude}
+    return document
+
+
+def _report_error(report: dict, error: dict) -> None:
+    report["failed"] += 1
+    if len(report["errors"]) < ES_BULK_MAX_ERRORS:
+        report["errors"].append(error)
+
+
+async def iter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """
+    Split a stream of utf-8 encoded bytes into lines
+
+    Parameters
+    ----------
+    - **stream**: (AsyncIterator[bytes]) Byte stream (e.g. `Request.stream()`)
+
+    Returns
+    -------
+    - **AsyncIterator[str]**: Lines of the stream without the line terminator
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    async for chunk in stream:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer.strip():
+        yield buffer.rstrip("\r")
+
+
+async def parse_ndjson(lines: AsyncIterator[str], report: dict) -> AsyncIterator[dict]:
+    """
+    Parse newline delimited JSON documents
+
+    Parameters
+    ----------
+    - **lines**: (AsyncIterator[str]) NDJSON lines
+    - **report**: (dict) Invalid lines are counted and reported here and skipped
+
+    Returns
+    -------
+    - **AsyncIterator[dict]**: Parsed documents
+    """
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            document = json.loads(line)
+        except json.JSONDecodeError as e:
+            _report_error(report, {"line": line_number, "error": f"Invalid JSON: {e}"})
+            continue
+        if not isinstance(document, dict):
+            _report_error(report, {"line": line_number, "error": "Document must be a JSON object"})
+            continue
+        yield document
+
+
+async def parse_csv(lines: AsyncIterator[str], report: dict) -> AsyncIterator[dict]:
+    """
+    Parse CSV records - the first record is used as header
+
+    Quoted fields spanning several lines are supported. Empty values are
+    left out of the documents.
+
+    Parameters
+    ----------
+    - **lines**: (AsyncIterator[str]) CSV lines
+    - **report**: (dict) Invalid records are counted and reported here and skipped
+
+    Returns
+    -------
+    - **AsyncIterator[dict]**: Parsed documents
+    """
+    header = None
+    record, record_line, line_number = "", 0, 0
+    async for line in lines:
+        line_number += 1
+        if not record:
+            record_line = line_number
+            record = line
+        else:
+            record += "\n" + line
+        # an odd number of quotes means the record continues on the next line
+        if record.count('"') % 2:
+            continue
+        row, record = next(csv.reader([record])), ""
+        if header is None:
+            header = row
+            continue
+        if not row:
+            continue
+        if len(row) != len(header):
+            _report_error(report, {"line": record_line,
+                                   "error": f"Expected {len(header)} columns, got {len(row)}"})
+            continue
+        yield {column: value for column, value in zip(header, row) if value != ""}
+    if record:
+        _report_error(report, {"line": record_line, "error": "Unterminated quoted field"})
+
+
+async def bulk_index_plants(es_client: AsyncElasticSearchClient, index: str, stream: AsyncIterator[bytes],
+                            data_format: str = "ndjson", chunk_size: int = 500, concurrency: int = 4,
+                            refresh: bool = True) -> dict:
+    """
+    Bulk index plant records streamed as NDJSON or CSV - CSV rows go through
+    `transform_plant_row`
+
+    Parameters
+    ----------
+    - **es_client**: (AsyncElasticSearchClient) Elasticsearch client
+    - **index**: (str) Name of the index
+    - **stream**: (AsyncIterator[bytes]) Request body stream
+    - **data_format**: (str) `ndjson` or `csv`
+    - **chunk_size**: (int) Number of documents per bulk request
+    - **concurrency**: (int) Number of bulk requests in flight
+    - **refresh**: (bool) Refresh the index once all the records are indexed
+
+    Returns
+    -------
+    - **dict**: Number of `indexed` and `failed` records and the reported `errors`
+    """
+    parse_report = {"failed": 0, "errors": []}
+    if data_format == "csv":
+        documents = (transform_plant_row(row) async for row in parse_csv(iter_lines(stream), parse_report))
+    else:
+        documents = parse_ndjson(iter_lines(stream), parse_report)
+
+    report = await es_client.bulk_index_documents(index, documents, chunk_size=chunk_size,
+                                                  concurrency=concurrency, refresh=refresh)
+    report["failed"] += parse_report["failed"]
+    report["errors"] = (parse_report["errors"] + report["errors"])[:ES_BULK_MAX_ERRORS]
+    return report
+
+
+async def install_plants_index_template(es_client: AsyncElasticSearchClient) -> None:
+    """
+    Install (or upgrade) the index template of the plant indices
+
+    Parameters
+    ----------
+    - **es_client**: (AsyncElasticSearchClient) Elasticsearch client
+    """
+    if await es_client.put_index_template(PLANTS_INDEX_TEMPLATE, PLANTS_INDEX_PATTERNS,
+                                          PLANTS_INDEX_TEMPLATE_VERSION, mappings=PLANTS_INDEX_MAPPINGS,
+                                          settings=PLANTS_INDEX_SETTINGS):
+        logger.info("Installed index template '%s' (version %s)", PLANTS_INDEX_TEMPLATE,
+                    PLANTS_INDEX_TEMPLATE_VERSION)
+
+
+def plant_search_query(query: Optional[str], fields: Optional[List[str]]) -> dict:
+    """
+    Build the query of a plant search
+
+    Parameters
+    ----------
+    - **query**: (str) Search query - all the plants match if not given
+    - **fields**: (List[str]) Fields to be searched
+
+    Returns
+    -------
+    - **dict**: Elasticsearch query
+    """
+    if not query:
+        return {"match_all": {}}
+    return {"multi_match": {"query": " ".join(query.split()), "fields": sorted(fields or [])}}
+
+
+def plant_facet_query(query: Optional[str], fields: Optional[List[str]], filters: Dict[str, List[str]],
+                      paths: Optional[Dict[str, str]] = None) -> dict:
+    """
+    Build the query of a faceted plant search - the facet filters run in filter
+    context (not scored, cached by elasticsearch)
+
+    Parameters
+    ----------
+    - **query**: (str) Search query - all the plants match if not given
+    - **fields**: (List[str]) Fields to be searched
+    - **filters**: (Dict[str, List[str]]) Accepted values by facet - a plant matches any of the values of a facet
+    - **paths**: (Dict[str, str]) Keyword field of each facet (see `facet_field_paths`) - default: the facet itself
+
+    Returns
+    -------
+    - **dict**: Elasticsearch query
+    """
+    paths = paths or {}
+    clauses = [{"terms": {paths.get(field, field): sorted(values)}}
+               for field, values in sorted(filters.items()) if values]
+    if not clauses:
+        return plant_search_query(query, fields)
+    return {"bool": {"must": plant_search_query(query, fields), "filter": clauses}}
+
+
+def facet_aggregations(fields=PLANTS_FACET_FIELDS, size: int = PLANTS_FACET_SIZE,
+                       paths: Optional[Dict[str, str]] = None) -> dict:
+    """
+    Build the terms aggregations of the facets
+
+    Parameters
+    ----------
+    - **fields**: (Iterable[str]) Facet fields
+    - **size**: (int) Number of values per facet
+    - **paths**: (Dict[str, str]) Keyword field of each facet (see `facet_field_paths`) - default: the facet itself
+
+    Returns
+    -------
+    - **dict**: Elasticsearch aggregations
+    """
+    paths = paths or {}
+    return {field: {"terms": {"field": paths.get(field, field), "size": size}} for field in fields}
+
+
+async def facet_field_paths(es_client: AsyncElasticSearchClient, index: str,
+                            fields=PLANTS_FACET_FIELDS) -> Dict[str, str]:
+    """
+    Get the keyword field aggregated / filtered for each facet
+
+    Indices created from `PLANTS_INDEX_MAPPINGS` map the facets as keywords. Indices
+    mapped dynamically (before the index template) map them as text, with a
+    `<field>.keyword` sub-field - used instead.
+
+    Parameters
+    ----------
+    - **es_client**: (AsyncElasticSearchClient) Elasticsearch client
+    - **index**: (str) Name of the plant index or alias
+    - **fields**: (Iterable[str]) Facet fields
+
+    Returns
+    -------
+    - **Dict[str, str]**: Keyword field by facet
+
+    Raises
+    ------
+    - **HTTPException**
+        - **409** - If a facet has no keyword field - the index must be reindexed
+          (`POST /index/{index_name}/reindex`)
+    """
+    response = await es_client.client.indices.get_mapping(index=index)
+    paths = {}
+    for field in fields:
+        mappings = [body.get("mappings", {}).get("properties", {}).get(field) for body in response.body.values()]
+        mappings = [mapping for mapping in mappings if mapping]
+        if all(mapping.get("type") == "keyword" for mapping in mappings):
+            # also covers the facets not mapped yet - their aggregation is empty
+            paths[field] = field
+        elif all(mapping.get("type") == "keyword"
+                 or mapping.get("fields", {}).get("keyword", {}).get("type") == "keyword" for mapping in mappings):
+            paths[field] = f"{field}.keyword"
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Facet '{field}' is not mapped as a keyword on '{index}' - reindex it "
+                       f"(POST /index/{{index_name}}/reindex) to apply the plant index template",
+            )
+    return paths
+
+
+def facet_counts(aggregations: dict) -> Dict[str, List[dict]]:
+    """
+    Get the facet values and their number of plants from the aggregation results
+
+    Parameters
+    ----------
+    - **aggregations**: (dict) `aggregations` of an elasticsearch response
+
+    Returns
+    -------
+    - **Dict[str, List[dict]]**: Values (`value`) and number of plants (`count`) by facet
+    """
+    return {
+        field: [{"value": bucket["key"], "count": bucket["doc_count"]} for bucket in result["buckets"]]
+        for field, result in aggregations.items()
+    }
+
+
+def _source_filter(source_includes: Optional[List[str]], source_excludes: Optional[List[str]]) -> Union[dict, bool]:
+    source = {}
+    if source_includes:
+        source["includes"] = source_includes
+    if source_excludes:
+        source["excludes"] = source_excludes
+    return source or True
+
+
+def _batch_error(status: int, error) -> dict:
+    if isinstance(error, dict):
+        error = error.get("reason") or error.get("type") or error
+    return {"status": status, "error": error}
+
+
+async def run_plant_batch(es_client: AsyncElasticSearchClient, index: str,
+                          specs: List[Union[PlantSearchSpec, PlantGetSpec]]) -> List[dict]:
+    """
+    Run a batch of plant searches and gets - all the searches go in one `_msearch`
+    and all the gets in one `_mget` request, both sent concurrently
+
+    Parameters
+    ----------
+    - **es_client**: (AsyncElasticSearchClient) Elasticsearch client
+    - **index**: (str) Name of the plant index
+    - **specs**: (List[Union[PlantSearchSpec, PlantGetSpec]]) Searches and gets
+
+    Returns
+    -------
+    - **List[dict]**: One result per spec, in the order of the specs - `status` and either
+      `response` (search response or plant record) or `error`
+    """
+    searches = [(position, spec) for position, spec in enumerate(specs) if isinstance(spec, PlantSearchSpec)]
+    gets = [(position, spec) for position, spec in enumerate(specs) if isinstance(spec, PlantGetSpec)]
+
+    async def run_searches():
+        if not searches:
+            return []
+        return await es_client.multi_search(index, [
+            {
+                "query": plant_search_query(spec.query, spec.fields),
+                "from": (spec.page - 1) * spec.size,
+                "size": spec.size,
+                "_source": _source_filter(spec.source_includes, spec.source_excludes),
+            }
+            for _, spec in searches
+        ])
+
+    async def run_gets():
+        if not gets:
+            return []
+        return await es_client.multi_get(index, [
+            {"_id": spec.id, "_source": _source_filter(spec.source_includes, spec.source_excludes)}
+            for _, spec in gets
+        ])
+
+    search_responses, documents = await asyncio.gather(run_searches(), run_gets(), return_exceptions=True)
+
+    results: List[Optional[dict]] = [None] * len(specs)
+    for group, responses in ((searches, search_responses), (gets, documents)):
+        if isinstance(responses, Exception):
+            logger.warning("Plant batch request failed: %s", responses)
+            for position, _ in group:
+                results[position] = _batch_error(502, "Search backend request failed")
+            continue
+        for (position, spec), response in zip(group, responses):
+            if "error" in response:
+                results[position] = _batch_error(response.get("status", 500), response["error"])
+            elif isinstance(spec, PlantGetSpec) and not response.get("found"):
+                results[position] = _batch_error(404, f"Document - '{spec.id}' does not exists")
+            else:
+                results[position] = {"status": 200, "response": response}
+    return results
+
+
+async def bulk_write_plants(es_client: AsyncElasticSearchClient, index: str, operations: List[PlantBulkOperation],
+                            autocomplete: "PlantAutocomplete", refresh: bool = False) -> List[dict]:
+    """
+    Apply partial updates, upserts and deletes of plant records in a single `_bulk`
+    request - operations carrying `if_seq_no` / `if_primary_term` fail with a 409
+    if the plant changed since it was read
+
+    Parameters
+    ----------
+    - **es_client**: (AsyncElasticSearchClient) Elasticsearch client
+    - **index**: (str) Name of the plant index
+    - **operations**: (List[PlantBulkOperation]) Operations
+    - **autocomplete**: (PlantAutocomplete) In-memory plant autocomplete - kept in sync with the applied operations
+    - **refresh**: (bool) Make the changes visible to search before returning
+
+    Returns
+    -------
+    - **List[dict]**: Result of every operation, in the order of the request - `id`, `status` and either
+      `result`, `_seq_no` and `_primary_term`, or `error`
+    """
+    items = await es_client.bulk_write(index, [
+        {
+            "op": "delete" if operation.action == "delete" else "update",
+            "_id": operation.id,
+            "doc": operation.doc,
+            "doc_as_upsert": operation.action == "upsert",
+            "if_seq_no": operation.if_seq_no,
+            "if_primary_term": operation.if_primary_term,
+        }
+        for operation in operations
+    ], refresh=refresh)
+
+    results = []
+    for operation, item in zip(operations, items):
+        status = item.get("status", 500)
+        if status >= 300:
+            results.append({"id": operation.id, **_batch_error(status, item.get("error"))})
+            continue
+        if operation.action == "delete":
+            autocomplete.remove_document(operation.id)
+        else:
+            autocomplete.update_document(operation.id, operation.doc)
+        results.append({"id": operation.id, "status": status, "result": item.get("result"),
+                        "_seq_no": item.get("_seq_no"), "_primary_term": item.get("_primary_term")})
+    return results
+
+
+async def _complete_update_by_query(es_client: AsyncElasticSearchClient, index: str, task_id: str,
+                                    autocomplete: "PlantAutocomplete") -> None:
+    try:
+        task = await es_client.wait_for_task(task_id, poll_interval=ES_TASK_POLL_INTERVAL)
+        if task.get("error") or task.get("response", {}).get("failures"):
+            logger.error("Update by query '%s' failed: %s", task_id,
+                         task.get("error") or task["response"]["failures"])
+        # results cached while the task was running may mix old and new values
+        es_client.invalidate_cache(index)
+        await autocomplete.build(es_client, index)
+    except Exception:
+        logger.exception("Update by query '%s' failed", task_id)
+
+
+async def start_plant_update_by_query(es_client: AsyncElasticSearchClient, index: str, update: PlantUpdateByQuery,
+                                      autocomplete: "PlantAutocomplete") -> str:
+    """
+    Start setting fields on every plant matching a query, as an elasticsearch task
+    (painless script `update_by_query`). Once the task completes - in the background -
+    the cached results are dropped and the in-memory autocomplete is rebuilt.
+
+    Parameters
+    ----------
+    - **es_client**: (AsyncElasticSearchClient) Elasticsearch client
+    - **index**: (str) Name of the plant index
+    - **update**: (PlantUpdateByQuery) Selected plants (`query`, `fields`, `filters`) and fields to be set (`doc`)
+    - **autocomplete**: (PlantAutocomplete) In-memory plant autocomplete
+
+    Returns
+    -------
+    - **str**: Id of the elasticsearch task
+    """
+    filtered = [field for field, values in update.filters.items() if values]
+    paths = await facet_field_paths(es_client, index, filtered) if filtered else None
+    task_id = await es_client.start_update_by_query(
+        index,
+        plant_facet_query(update.query, update.fields, update.filters, paths),
+        update.doc,
+        slices=update.slices,
+        requests_per_second=update.requests_per_second,
+    )
+    job = asyncio.create_task(_complete_update_by_query(es_client, index, task_id, autocomplete))
+    _jobs.add(job)
+    job.add_done_callback(_jobs.discard)
+    return task_id
+
+
+async def export_plants(es_client: AsyncElasticSearchClient, index: str, data_format: str = "ndjson",
+                        query: dict = None, columns: List[str] = None, slices: int = 4,
+                        page_size: int = 1000) -> AsyncIterator[str]:
+    """
+    Stream the plant records of an index as NDJSON or CSV
+
+    Parameters
+    ----------
+    - **es_client**: (AsyncElasticSearchClient) Elasticsearch client
+    - **index**: (str) Name of the index or alias
+    - **data_format**: (str) `ndjson` or `csv`
+    - **query**: (dict) Query the plant records must match (default: match_all)
+    - **columns**: (List[str]) Fields to be exported (default: all for NDJSON, `PLANT_FIELDS` for CSV)
+    - **slices**: (int) Number of slices read in parallel
+    - **page_size**: (int) Number of records read per request
+
+    Returns
+    -------
+    - **AsyncIterator[str]**: Chunks of the export, one per page of records
+    """
+    hits = es_client.scan_documents(index, query=query, slices=slices, page_size=page_size,
+                                    source_includes=columns)
+    buffer, buffered = io.StringIO(), 0
+    writer = None
+    if data_format == "csv":
+        columns = list(columns or PLANT_FIELDS)
+        writer = csv.writer(buffer)
+        writer.writerow(["_id", *columns])
+
+    async for hit in hits:
+        source = hit.get("_source", {})
+        if writer is None:
+            buffer.write(json.dumps({"_id": hit["_id"], **source}, ensure_ascii=False))
+            buffer.write("\n")
+        else:
+            writer.writerow([hit["_id"], *(
+                json.dumps(value, ensure_ascii=False) if isinstance(value, (dict, list)) else value
+                for value in (source.get(column) for column in columns)
+            )])
+        buffered += 1
+        if buffered >= page_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            buffered = 0
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+class PlantAutocomplete:
+    """
+    In-memory autocomplete over the plant names of an index
+
+    One `PrefixIndex` is kept per field of `PLANTS_AUTOCOMPLETE_FIELDS`. The indices
+    are built from elasticsearch in the background and kept up to date by the plant
+    write endpoints; until the first build completes `ready` is False and callers
+    are expected to fall back to the elasticsearch completion suggester.
+    """
+
+    def __init__(self, fields: tuple = PLANTS_AUTOCOMPLETE_FIELDS):
+        self.fields = fields
+        self.ready = False
+        self._indices: Dict[str, PrefixIndex] = {field: PrefixIndex() for field in fields}
+        self._documents: Dict[str, dict] = {}
+        # writes received while a build is running - replayed on the new indices
+        self._pending: Optional[List[tuple]] = None
+        self._build_lock = asyncio.Lock()
+
+    def _names(self, source: dict) -> dict:
+        return {field: source[field] for field in self.fields
+                if isinstance(source.get(field), str) and source[field].strip()}
+
+    def _add(self, document_id: str, names: dict) -> None:
+        for field, name in names.items():
+            self._indices[field].add(name, document_id)
+        if names:
+            self._documents[document_id] = names
+
+    def _remove(self, document_id: str) -> dict:
+        names = self._documents.pop(document_id, {})
+        for field, name in names.items():
+            self._indices[field].remove(name, document_id)
+        return names
+
+    def add_document(self, document_id: str, source: dict) -> None:
+        """
+        Add the names of an indexed plant record
+
+        Parameters
+        ----------
+        - **document_id**: (str) Plant id
+        - **source**: (dict) Plant record
+        """
+        if self._pending is not None:
+            self._pending.append(("add", document_id, source))
+        self._remove(document_id)
+        self._add(document_id, self._names(source))
+
+    def update_document(self, document_id: str, partial: dict) -> None:
+        """
+        Apply a partial update of a plant record
+
+        Parameters
+        ----------
+        - **document_id**: (str) Plant id
+        - **partial**: (dict) Updated fields of the plant record
+        """
+        if self._pending is not None:
+            self._pending.append(("update", document_id, partial))
+        if not any(field in partial for field in self.fields):
+            return
+        names = self._remove(document_id)
+        names.update(self._names(partial))
+        self._add(document_id, names)
+
+    def remove_document(self, document_id: str) -> None:
+        """
+        Remove the names of a deleted plant record
+
+        Parameters
+        ----------
+        - **document_id**: (str) Plant id
+        """
+        if self._pending is not None:
+            self._pending.append(("remove", document_id, None))
+        self._remove(document_id)
+
+    def suggest(self, field: str, prefix: str, size: int, offset: int = 0) -> Optional[List[dict]]:
+        """
+        Get the names of a field starting with given prefix, ranked as the elasticsearch
+        completion suggester ranks them - the `.autocomplete` sub-fields carry no weight,
+        so by name
+
+        Parameters
+        ----------
+        - **field**: (str) Plant field (a `.autocomplete` suffix is ignored)
+        - **prefix**: (str) Prefix typed by the user
+        - **size**: (int) Maximum number of suggestions
+        - **offset**: (int) Number of suggestions to skip
+
+        Returns
+        -------
+        - **Optional[List[dict]]**: Suggestions (`text`, `_id`, `_score`) - None if the field is not served from memory
+        """
+        if field.endswith(".autocomplete"):
+            field = field[:-len(".autocomplete")]
+        if not self.ready or field not in self._indices:
+            return None
+        return self._indices[field].search(prefix, size=size, offset=offset)
+
+    async def build(self, es_client: AsyncElasticSearchClient, index: str) -> None:
+        """
+        (Re)build the prefix indices from all the plant records of an index
+
+        Parameters
+        ----------
+        - **es_client**: (AsyncElasticSearchClient) Elasticsearch client
+        - **index**: (str) Name of the index or alias
+        """
+        async with self._build_lock:
+            await self._build(es_client, index)
+
+    async def _build(self, es_client: AsyncElasticSearchClient, index: str) -> None:
+        self._pending = []
+        try:
+            documents, entries = {}, {field: [] for field in self.fields}
+            async for hit in helpers.async_scan(es_client.client, index=index, size=5000,
+                                                _source=list(self.fields), query={"match_all": {}}):
+                names = self._names(hit.get("_source", {}))
+                if not names:
+                    continue
+                documents[hit["_id"]] = names
+                for field, name in names.items():
+                    entries[field].append((name, hit["_id"]))
+            indices = {field: PrefixIndex(entries[field]) for field in self.fields}
+
+            pending, self._pending = self._pending, None
+            self._indices, self._documents = indices, documents
+            for operation, document_id, source in pending:
+                if operation == "remove":
+                    self.remove_document(document_id)
+                else:
+                    getattr(self, f"{operation}_document")(document_id, source)
+            self.ready = True
+        finally:
+            self._pending = None
+
+    async def run(self, es_client: AsyncElasticSearchClient, index: str,
+                  interval: float = PLANTS_AUTOCOMPLETE_REFRESH_INTERVAL) -> None:
+        """
+        Build the prefix indices, then rebuild them every `interval` seconds
+
+        Parameters
+        ----------
+        - **es_client**: (AsyncElasticSearchClient) Elasticsearch client
+        - **index**: (str) Name of the index or alias
+        - **interval**: (float) Seconds between two rebuilds
+        """
+        while True:
+            try:
+                await self.build(es_client, index)
+            except Exception as e:
+                logger.warning("Plant autocomplete build failed: %s", e)
+            await asyncio.sleep(interval)
+
+
+class PlantFacets:
+    """
+    In-process facet counts of the whole plant catalog
+
+    The counts are computed once and served from memory until the next write
+    made through the elasticsearch client (see `AsyncElasticSearchClient.generation`)
+    or until they are `max_age` seconds old - writes made by other workers are
+    picked up then. Concurrent requests share a single computation.
+
+    Parameters
+    ----------
+    - **max_age**: (float) Maximum age of the counts, in seconds
+    """
+
+    def __init__(self, max_age: float = PLANTS_FACETS_MAX_AGE):
+        self.max_age = max_age
+        self._counts: Dict[str, dict] = {}
+        # keyword field of each facet, by index - with the indices they were read from
+        self._paths: Dict[str, tuple] = {}
+        self._lock = asyncio.Lock()
+
+    def _fresh(self, es_client: AsyncElasticSearchClient, index: str) -> Optional[dict]:
+        entry = self._counts.get(index)
+        if entry is None or entry["generation"] != es_client.generation:
+            return None
+        if time.monotonic() - entry["computed_at"] > self.max_age:
+            return None
+        return entry
+
+    async def paths(self, es_client: AsyncElasticSearchClient, index: str) -> Dict[str, str]:
+        """
+        Get the keyword field of each facet (see `facet_field_paths`) - read again once
+        the alias points to other indices
+
+        Parameters
+        ----------
+        - **es_client**: (AsyncElasticSearchClient) Elasticsearch client
+        - **index**: (str) Name of the plant index or alias
+
+        Returns
+        -------
+        - **Dict[str, str]**: Keyword field by facet
+        """
+        indices = tuple(await es_client.resolve_alias(index))
+        cached = self._paths.get(index)
+        if cached is not None and cached[0] == indices:
+            return cached[1]
+        paths = await facet_field_paths(es_client, index)
+        self._paths[index] = (indices, paths)
+        return paths
+
+    async def get(self, es_client: AsyncElasticSearchClient, index: str) -> dict:
+        """
+        Get the facet counts of the whole catalog
+
+        Parameters
+        ----------
+        - **es_client**: (AsyncElasticSearchClient) Elasticsearch client
+        - **index**: (str) Name of the plant index
+
+        Returns
+        -------
+        - **dict**: Total number of plants (`total`) and facet counts (`facets`)
+
+        Raises
+        ------
+        - **HTTPException**
+            - **409** - If a facet has no keyword field (see `facet_field_paths`)
+        """
+        entry = self._fresh(es_client, index)
+        if entry is None:
+            async with self._lock:
+                entry = self._fresh(es_client, index)
+                if entry is None:
+                    # read before the search - a write during the search leaves the counts stale
+                    generation = es_client.generation
+                    paths = await self.paths(es_client, index)
+                    response = await es_client.client.search(index=index, size=0, track_total_hits=True,
+                                                             aggs=facet_aggregations(paths=paths))
+                    entry = {
+                        "generation": generation,
+                        "computed_at": time.monotonic(),
+                        "total": response["hits"]["total"]["value"],
+                        "facets": facet_counts(response["aggregations"]),
+                    }
+                    self._counts[index] = entry
+        return {"total": entry["total"], "facets": entry["facets"]}
+
+    async def warm(self, es_client: AsyncElasticSearchClient, index: str) -> None:
+        """
+        Precompute the facet counts - failures are logged, the counts are then computed on first use
+
+        Parameters
+        ----------
+        - **es_client**: (AsyncElasticSearchClient) Elasticsearch client
+        - **index**: (str) Name of the plant index
+        """
+        try:
+            await self.get(es_client, index)
+        except Exception as e:
+            logger.warning("Plant facets precomputation failed: %s", e)
@@ -1,14 +1,18 @@
+from typing import Optional
+
 from fastapi import APIRouter, Body, Depends, Query
 from fastapi.exceptions import HTTPException
 from fastapi.responses import JSONResponse
+from sqlalchemy import delete, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.index.dependencies import get_db
+from app.index.dependencies import get_db, get_es_client, get_plant_index_registry
 from app.index.models import PlantIndex
+from app.index.plants.constants import PLANTS_INDEX_MAPPINGS, PLANTS_INDEX_SETTINGS
 from app.index.plants.router import router as plant_router
-from app.index.schemas import PlantIndexCreate
-from app.index.utils.es import ElasticSearchClient
-
-es_client = ElasticSearchClient()
+from app.index.schemas import PlantIndexCreate, PlantIndexReindex
+from app.index.services import PlantIndexRegistry, start_blue_green_reindex
+from app.index.utils.es import AsyncElasticSearchClient
 
 router = APIRouter(prefix="/index", tags=["index"])
 
@@ -16,22 +20,107 @@ router.include_router(plant_router)
 
 
 @router.get("/")
-async def get_indices() -> JSONResponse:
+async def get_indices(
+    es_client: AsyncElasticSearchClient = Depends(get_es_client),
+) -> JSONResponse:
     """
     Get all elasticsearch indices
 
+    Parameters
+    ----------
+    - **es_client**: (AsyncElasticSearchClient) Elasticsearch client
+
     Returns
     -------
     - **JSONResponse**: JSON response with all indices
     """
-    indices = es_client.get_indices()
+    indices = await es_client.get_indices()
     return JSONResponse(status_code=200, content=indices)
 
 
+@router.get("/_cache")
+async def get_cache_stats(
+    es_client: AsyncElasticSearchClient = Depends(get_es_client),
+) -> JSONResponse:
+    """
+    Get the hit/miss counters of the search result cache
+
+    Parameters
+    ----------
+    - **es_client**: (AsyncElasticSearchClient) Elasticsearch client
+
+    Returns
+    -------
+    - **JSONResponse**: JSON response with the cache statistics
+
+    Raises
+    ------
+    - **HTTPException**
+        - **404** - If the cache is disabled
+    """
+    if es_client.cache is None:
+        raise HTTPException(status_code=404, detail="Search result cache is disabled")
+    return JSONResponse(status_code=200, content=es_client.cache.stats())
+
+
+@router.delete("/_cache")
+async def clear_cache(
+    es_client: AsyncElasticSearchClient = Depends(get_es_client),
+) -> JSONResponse:
+    """
+    Drop all the entries of the search result cache
+
+    Parameters
+    ----------
+    - **es_client**: (AsyncElasticSearchClient) Elasticsearch client
+
+    Returns
+    -------
+    - **JSONResponse**: JSON response with status of the cache clearing
+    """
+    es_client.invalidate_cache()
+    return JSONResponse(status_code=200, content={"message": "Search result cache cleared"})
+
+
+@router.get("/_tasks/{task_id}")
+async def get_task_status(
+    task_id: str,
+    es_client: AsyncElasticSearchClient = Depends(get_es_client),
+) -> JSONResponse:
+    """
+    Get the status of a long running elasticsearch task (reindex, update by query)
+
+    Parameters
+    ----------
+    - **task_id**: (str) Id of the task
+    - **es_client**: (AsyncElasticSearchClient) Elasticsearch client
+
+    Returns
+    -------
+    - **JSONResponse**: JSON response with the task status
+        - **completed**: Whether the task completed
+        - **task.status**: Progress of the task (total, created, updated, deleted, batches, ...)
+        - **response** | **error**: Result of the completed task
+
+    Raises
+    ------
+    - **HTTPException**
+        - **404** - If the task does not exist
+    """
+    task = await es_client.get_task(task_id)
+    return JSONResponse(status_code=200, content=task)
+
+
 @router.post("/")
-async def create_index(index: PlantIndexCreate, db=Depends(get_db)) -> JSONResponse:
+async def create_index(
+    index: PlantIndexCreate,
+    db: AsyncSession = Depends(get_db),
+    es_client: AsyncElasticSearchClient = Depends(get_es_client),
+    registry: PlantIndexRegistry = Depends(get_plant_index_registry),
+) -> JSONResponse:
     """
-    Create elasticsearch index for given index name
+    Create elasticsearch index for given index name, with the mappings and
+    settings of the plant index template
 
     Parameters
     ----------
@@ -39,7 +128,9 @@ async def create_index(index: PlantIndexCreate, db=Depends(get_db)) -> JSONRespo
         - **index_name**: Name of the index to be created
         - **description**: Description of the index to be created
         - **alias**: Alias of the index to be created
-    **db**: (Session) Database session
+    **db**: (AsyncSession) Database session
+    **es_client**: (AsyncElasticSearchClient) Elasticsearch client
+    **registry**: (PlantIndexRegistry) Registry of the plant indices
 
     Returns
     -------
@@ -51,14 +142,19 @@ async def create_index(index: PlantIndexCreate, db=Depends(get_db)) -> JSONRespo
         - **409** - If index already exists
         - **500** - If index creation fails
     """
-    if es_client.create_index(index.index_name):
+    if registry.exists(index.index_name):
+        raise HTTPException(status_code=409, detail=f"Index - '{index.index_name}' already exists")
+    if await es_client.create_index(index.index_name, mappings=PLANTS_INDEX_MAPPINGS,
+                                    settings=PLANTS_INDEX_SETTINGS):
         try:
             plant_idx = PlantIndex(
-                index_name=index.index_name, description=index.description
+                idx_uuid=await es_client.get_index_uuid(index.index_name),
+                index_name=index.index_name,
+                description=index.description,
             )
             db.add(plant_idx)
-            db.commit()
-            db.refresh(PlantIndex)
+            await db.commit()
+            registry.put(plant_idx)
         except Exception:
             raise HTTPException(
                 status_code=500, detail="Index creation failed - Internal Server Error"
@@ -70,14 +166,21 @@ async def create_index(index: PlantIndexCreate, db=Depends(get_db)) -> JSONRespo
 
 
 @router.delete("/{index_name}")
-async def delete_index(index_name: str, db=Depends(get_db)) -> JSONResponse:
+async def delete_index(
+    index_name: str,
+    db: AsyncSession = Depends(get_db),
+    es_client: AsyncElasticSearchClient = Depends(get_es_client),
+    registry: PlantIndexRegistry = Depends(get_plant_index_registry),
+) -> JSONResponse:
     """
     Delete elasticsearch index for given index name
 
     Parameters
     ----------
     - **index_name**: (str) Name of the index to be deleted
-    - **db**: (Session) Database session
+    - **db**: (AsyncSession) Database session
+    - **es_client**: (AsyncElasticSearchClient) Elasticsearch client
+    - **registry**: (PlantIndexRegistry) Registry of the plant indices
 
     Returns
     -------
@@ -89,9 +192,11 @@ async def delete_index(index_name: str, db=Depends(get_db)) -> JSONResponse:
         - **404** - If index does not exist
         - **500** - If index deletion fails
     """
-    if es_client.delete_index(index_name):
+    if await es_client.delete_index(index_name):
         try:
-            db.query(PlantIndex).filter(PlantIndex.index_name == index_name).delete()
+            await db.execute(delete(PlantIndex).where(PlantIndex.index_name == index_name))
+            await db.commit()
+            registry.remove(index_name)
             return JSONResponse(
                 status_code=200,
                 content={"message": f"Index - '{index_name}' deleted successfully"},
@@ -107,7 +212,8 @@ async def update_index(
     index_name: str,
     description: str = Body(None),
     alias: str = Body(None),
-    db=Depends(get_db),
+    db: AsyncSession = Depends(get_db),
+    registry: PlantIndexRegistry = Depends(get_plant_index_registry),
 ) -> JSONResponse:
     """
     Update elasticsearch index for given index name
@@ -117,7 +223,8 @@ async def update_index(
     - **index_name**: (str) Name of the index to be updated
     - **description**: (str) Description of the index to be updated
     - **alias**: (str) Alias of the index to be updated
-    - **db**: (Session) Database session
+    - **db**: (AsyncSession) Database session
+    - **registry**: (PlantIndexRegistry) Registry of the plant indices
 
     Returns
     -------
@@ -129,7 +236,7 @@ async def update_index(
         - **404** - If index does not exist
         - **500** - If index update fails
     """
-    if es_client.index_exists(index_name):
+    if registry.exists(index_name):
         try:
             if description and alias:
                 update_dict = {"description": description, "alias": alias}
@@ -141,9 +248,11 @@ async def update_index(
                 raise HTTPException(
                     status_code=400, detail="Description or alias is required"
                 )
-            db.query(PlantIndex).filter(PlantIndex.index_name == index_name).update(
-                update_dict
+            await db.execute(
+                update(PlantIndex).where(PlantIndex.index_name == index_name).values(update_dict)
             )
+            await db.commit()
+            registry.update(index_name, update_dict)
             return JSONResponse(
                 status_code=200,
                 content={"message": f"Index - '{index_name}' updated successfully"},
@@ -160,7 +269,10 @@ async def update_index(
 
 @router.get("/{index_name}/search")
 async def search_index(
-    index_name: str, field: str = Query(None), query: str = Query(None)
+    index_name: str,
+    field: str = Query(None),
+    query: str = Query(None),
+    es_client: AsyncElasticSearchClient = Depends(get_es_client),
 ) -> JSONResponse:
     """
     Search elasticsearch index for given index name and query
@@ -170,6 +282,7 @@ async def search_index(
     - **index_name**: (str) Name of the index to be searched
     - **field**: (str) Field to be searched
     - **query**: (str) Query to be searched
+    - **es_client**: (AsyncElasticSearchClient) Elasticsearch client
 
     Returns
     -------
@@ -185,10 +298,10 @@ async def search_index(
     if not field or not query:
         raise HTTPException(status_code=400, detail="Field and query are required")
 
-    if es_client.index_or_alias_exists(index_name):
+    if await es_client.index_or_alias_exists(index_name):
         try:
-            q = {"query": {"match": {field: query}}}
-            results = es_client.search_document(index_name, q)
+            q = {"query": {"match": {field: " ".join(query.split())}}}
+            results = await es_client.search_document(index_name, q)
             return JSONResponse(status_code=200, content=results)
         except Exception:
             raise HTTPException(
@@ -198,3 +311,54 @@ async def search_index(
         raise HTTPException(
             status_code=404, detail=f"Index - '{index_name}' does not exists"
         )
+
+
+@router.post("/{index_name}/reindex")
+async def reindex_index(
+    index_name: str,
+    reindex: Optional[PlantIndexReindex] = None,
+    es_client: AsyncElasticSearchClient = Depends(get_es_client),
+    registry: PlantIndexRegistry = Depends(get_plant_index_registry),
+) -> JSONResponse:
+    """
+    Rebuild an index into a new versioned index and swap an alias to it, without downtime
+
+    The documents are copied by a sliced, throttled elasticsearch `_reindex` task.
+    Once it completes, the alias is moved to the new index in a single atomic call
+    and the `plant_idx` table is updated - by another worker if this one stops first.
+    Poll `/index/_tasks/{task_id}` for the progress.
+
+    Parameters
+    ----------
+    - **index_name**: (str) Name of the index or alias to be rebuilt
+    - **reindex**: (PlantIndexReindex) Reindex options
+        - **alias**: Alias swapped to the new index (default: index_name). A concrete
+          index with the same name is deleted by the swap
+        - **mappings**: Mappings of the new index (default: mappings of the source)
+        - **settings**: Settings of the new index (default: analysis settings of the source)
+        - **slices**: Number of parallel slices (default: one per shard)
+        - **requests_per_second**: Throttle of the reindex (default: unthrottled)
+    - **es_client**: (AsyncElasticSearchClient) Elasticsearch client
+    - **registry**: (PlantIndexRegistry) Registry of the plant indices
+
+    Returns
+    -------
+    - **JSONResponse**: JSON response with the task id and the name of the new index
+
+    Raises
+    ------
+    - **HTTPException**
+        - **404** - If index does not exist
+    """
+    reindex = reindex or PlantIndexReindex()
+    job = await start_blue_green_reindex(
+        es_client,
+        index_name,
+        reindex.alias or index_name,
+        mappings=reindex.mappings,
+        settings=reindex.settings,
+        slices=reindex.slices,
+        requests_per_second=reindex.requests_per_second,
+        registry=registry,
+    )
+    return JSONResponse(status_code=202, content=job)
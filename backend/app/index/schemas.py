@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 from typing import Optional
 from uuid import UUID
@@ -27,3 +27,11 @@ class PlantIndexInDB(PlantIndexBase):
 
 class PlantIndex(PlantIndexInDB):
     pass
+
+
+class PlantIndexReindex(BaseModel):
+    alias: Optional[str] = None
+    mappings: Optional[dict] = None
+    settings: Optional[dict] = None
+    slices: Optional[int] = Field(None, ge=1)
+    requests_per_second: Optional[float] = Field(None, gt=0)
@@ -0,0 +1,440 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from fastapi.exceptions import HTTPException
+from sqlalchemy import delete, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from app.database import AsyncSessionLocal
+from app.index.constants import (ES_BULK_LOAD_SETTINGS, ES_TASK_POLL_INTERVAL, PLANT_INDEX_RECONCILE_INTERVAL,
+                                 PLANT_INDEX_RECONCILE_LOCK, PLANT_INDEX_REGISTRY_POLL_INTERVAL,
+                                 PLANT_REINDEX_JOB_LEASE)
+from app.index.models import PlantIndex, PlantReindexJob
+from app.index.plants.constants import PLANTS_INDEX_SETTINGS
+from app.index.utils.es import AsyncElasticSearchClient
+
+logger = logging.getLogger(__name__)
+
+# references of the running background jobs - keeps them from being garbage collected
+_jobs = set()
+# ids of the reindex jobs watched by this worker
+_watched_jobs = set()
+
+
+class PlantIndexRegistry:
+    """
+    Process-local copy of the `plant_idx` table
+
+    Lets the routes resolve index names and aliases without a database hit. The
+    registry is loaded once, updated by the changes made through this worker and
+    kept in sync with the other workers by polling the table: a cheap
+    `max(updated_at), count(*)` query, with a full reload only when it changed.
+    """
+
+    def __init__(self):
+        self.indices: Dict[str, dict] = {}
+        self._version: Optional[tuple] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._version is not None
+
+    @staticmethod
+    def _entry(plant_index: PlantIndex) -> dict:
+        return {
+            "index_name": plant_index.index_name,
+            "alias": plant_index.alias,
+            "idx_uuid": plant_index.idx_uuid,
+            "description": plant_index.description,
+        }
+
+    async def refresh(self, force: bool = False) -> bool:
+        """
+        Reload the registry if the `plant_idx` table changed
+
+        Parameters
+        ----------
+        - **force**: (bool) Reload even if the table did not change
+
+        Returns
+        -------
+        - **bool**: Whether the registry was reloaded
+        """
+        async with self._lock:
+            async with AsyncSessionLocal() as db:
+                version = tuple((await db.execute(select(func.max(PlantIndex.updated_at), func.count()))).one())
+                if not force and version == self._version:
+                    return False
+                rows = (await db.execute(select(PlantIndex))).scalars().all()
+            self.indices = {row.index_name: self._entry(row) for row in rows}
+            self._version = version
+            return True
+
+    async def ensure_loaded(self) -> None:
+        """
+        Load the registry if it was never loaded
+        """
+        if not self.loaded:
+            await self.refresh()
+
+    async def run(self, interval: float = PLANT_INDEX_REGISTRY_POLL_INTERVAL) -> None:
+        """
+        Load the registry, then check the table for changes every `interval` seconds
+
+        Parameters
+        ----------
+        - **interval**: (float) Seconds between two checks
+        """
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning("Plant index registry refresh failed: %s", e)
+            await asyncio.sleep(interval)
+
+    def get(self, index_name: str) -> Optional[dict]:
+        return self.indices.get(index_name)
+
+    def exists(self, index_name: str) -> bool:
+        return index_name in self.indices
+
+    def resolve(self, index_or_alias: str) -> Optional[str]:
+        """
+        Get the index registered under a name or an alias
+
+        Parameters
+        ----------
+        - **index_or_alias**: (str) Name or alias of the index
+
+        Returns
+        -------
+        - **Optional[str]**: Name of the index, None if neither a registered name nor alias
+        """
+        if index_or_alias in self.indices:
+            return index_or_alias
+        for entry in self.indices.values():
+            if entry["alias"] == index_or_alias:
+                return entry["index_name"]
+        return None
+
+    def put(self, plant_index: PlantIndex) -> None:
+        self.indices[plant_index.index_name] = self._entry(plant_index)
+
+    def update(self, index_name: str, values: dict) -> None:
+        if index_name in self.indices:
+            self.indices[index_name].update(values)
+
+    def remove(self, index_name: str) -> None:
+        self.indices.pop(index_name, None)
+
+
+def versioned_index_name(alias: str) -> str:
+    """
+    Get a new versioned index name for an alias (e.g. `plants-v20240101120000`)
+
+    Parameters
+    ----------
+    - **alias**: (str) Name of the alias
+
+    Returns
+    -------
+    - **str**: Name of the index
+    """
+    return f"{alias}-v{datetime.utcnow():%Y%m%d%H%M%S}"
+
+
+async def _record_alias_swap(index: str, idx_uuid: str, alias: str, removed_indices: List[str],
+                             source: str) -> None:
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(PlantIndex).where(PlantIndex.alias == alias).values(alias=None))
+        if removed_indices:
+            await db.execute(delete(PlantIndex).where(PlantIndex.index_name.in_(removed_indices)))
+        # the reconciliation may have registered the new index while it was being filled
+        statement = insert(PlantIndex).values(idx_uuid=idx_uuid, index_name=index,
+                                              description=f"Reindexed from '{source}'", alias=alias)
+        statement = statement.on_conflict_do_update(
+            index_elements=[PlantIndex.index_name],
+            set_={
+                "idx_uuid": statement.excluded.idx_uuid,
+                "description": statement.excluded.description,
+                "alias": statement.excluded.alias,
+                "updated_at": func.now(),
+            },
+        )
+        await db.execute(statement)
+        await db.commit()
+
+
+async def _running_reindex_jobs() -> List[PlantReindexJob]:
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(select(PlantReindexJob).where(PlantReindexJob.status == "running"))).scalars().all()
+
+
+async def _claim_reindex_job(job_id: int, lease: float = PLANT_REINDEX_JOB_LEASE) -> bool:
+    # renews the claim of this worker, or takes over a job whose claim expired - only one worker gets it
+    expired = func.now() - timedelta(seconds=lease)
+    async with AsyncSessionLocal() as db:
+        claimed = (await db.execute(
+            update(PlantReindexJob)
+            .where(PlantReindexJob.id == job_id, PlantReindexJob.status == "running",
+                   or_(PlantReindexJob.claimed_at.is_(None), PlantReindexJob.claimed_at < expired))
+            .values(claimed_at=func.now())
+            .returning(PlantReindexJob.id)
+        )).scalar_one_or_none()
+        await db.commit()
+        return claimed is not None
+
+
+async def _renew_reindex_job(job_id: int, claimed_at: Optional[datetime]) -> None:
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(PlantReindexJob).where(PlantReindexJob.id == job_id)
+                         .values(claimed_at=claimed_at))
+        await db.commit()
+
+
+async def _finish_reindex_job(job_id: int, status: str) -> None:
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(PlantReindexJob).where(PlantReindexJob.id == job_id)
+                         .values(status=status, claimed_at=None))
+        await db.commit()
+
+
+async def _complete_reindex(es_client: AsyncElasticSearchClient, job: PlantReindexJob,
+                            registry: Optional[PlantIndexRegistry]) -> None:
+    source, target, alias = job.source, job.target, job.alias
+    status = "failed"
+    try:
+        while True:
+            try:
+                task = await es_client.get_task(job.task_id)
+            except HTTPException:
+                logger.error("Reindex '%s' -> '%s': task '%s' not found, alias '%s' left unchanged",
+                             source, target, job.task_id, alias)
+                return
+            progress = task.get("task", {}).get("status", {})
+            logger.info("Reindex '%s' -> '%s': %s/%s documents", source, target,
+                        progress.get("created", 0) + progress.get("updated", 0), progress.get("total", "?"))
+            if task.get("completed"):
+                break
+            await _renew_reindex_job(job.id, func.now())
+            await asyncio.sleep(ES_TASK_POLL_INTERVAL)
+
+        failures = task.get("response", {}).get("failures")
+        if task.get("error") or failures:
+            logger.error("Reindex '%s' -> '%s' failed, alias '%s' left unchanged: %s",
+                         source, target, alias, task.get("error") or failures)
+            return
+
+        await es_client.put_index_settings(target, job.restore_settings)
+        await es_client.client.indices.refresh(index=target)
+
+        # a concrete index named like the alias has to be removed in the same atomic call - unless a
+        # previous attempt of the job already did
+        removed_indices = [index for index in job.source_indices
+                           if index == alias and await es_client.index_exists(index)]
+        await es_client.swap_alias(alias, target, remove_indices=removed_indices)
+
+        idx_uuid = await es_client.get_index_uuid(target)
+        await _record_alias_swap(target, idx_uuid, alias, removed_indices, source)
+        status = "completed"
+        if registry is not None:
+            await registry.refresh(force=True)
+        logger.info("Alias '%s' now points to '%s'", alias, target)
+    except asyncio.CancelledError:
+        # worker shutting down - the claim is released for another worker to take the job over
+        status = None
+        logger.warning("Reindex '%s' -> '%s' interrupted, alias swap left to another worker", source, target)
+        await asyncio.shield(_renew_reindex_job(job.id, None))
+        raise
+    except Exception:
+        logger.exception("Reindex '%s' -> '%s' failed", source, target)
+    finally:
+        if status is not None:
+            try:
+                await _finish_reindex_job(job.id, status)
+            except Exception as e:
+                logger.warning("Failed to record the end of the reindex '%s' -> '%s': %s", source, target, e)
+
+
+def _watch_reindex(es_client: AsyncElasticSearchClient, job: PlantReindexJob,
+                   registry: Optional[PlantIndexRegistry]) -> None:
+    task = asyncio.create_task(_complete_reindex(es_client, job, registry))
+    _jobs.add(task)
+    _watched_jobs.add(job.id)
+    task.add_done_callback(_jobs.discard)
+    task.add_done_callback(lambda _: _watched_jobs.discard(job.id))
+
+
+async def resume_reindex_jobs(es_client: AsyncElasticSearchClient,
+                              registry: Optional[PlantIndexRegistry] = None) -> int:
+    """
+    Take over the running reindex jobs whose worker stopped (claim older than `PLANT_REINDEX_JOB_LEASE`)
+    and swap their alias once their task completes
+
+    Parameters
+    ----------
+    - **es_client**: (AsyncElasticSearchClient) Elasticsearch client
+    - **registry**: (PlantIndexRegistry) Registry of the plant indices - reloaded after the swaps
+
+    Returns
+    -------
+    - **int**: Number of jobs taken over
+    """
+    resumed = 0
+    for job in await _running_reindex_jobs():
+        if job.id not in _watched_jobs and await _claim_reindex_job(job.id):
+            logger.info("Resuming reindex '%s' -> '%s' (task '%s')", job.source, job.target, job.task_id)
+            _watch_reindex(es_client, job, registry)
+            resumed += 1
+    return resumed
+
+
+async def cancel_reindex_jobs() -> None:
+    """
+    Stop watching the reindex jobs of this worker - to be called on shutdown, their claims are released
+    """
+    for task in list(_jobs):
+        task.cancel()
+    await asyncio.gather(*_jobs, return_exceptions=True)
+
+
+async def start_blue_green_reindex(es_client: AsyncElasticSearchClient, source: str, alias: str,
+                                   mappings: Optional[dict] = None, settings: Optional[dict] = None,
+                                   slices: Optional[int] = None,
+                                   requests_per_second: Optional[float] = None,
+                                   registry: Optional[PlantIndexRegistry] = None) -> dict:
+    """
+    Rebuild an index behind an alias without downtime
+
+    A new versioned index is created (with given mappings / settings, or those of
+    the source) and filled by a sliced, throttled `_reindex` task, with refresh and
+    replicas disabled. Once the task completes - in the background - the settings
+    are restored, the alias is swapped to the new index in a single atomic
+    `_aliases` call and the `plant_idx` table is updated. The job is persisted in the
+    `plant_reindex_job` table: if the worker stops before the swap, another worker
+    takes it over (`resume_reindex_jobs`).
+
+    Parameters
+    ----------
+    - **es_client**: (AsyncElasticSearchClient) Elasticsearch client
+    - **source**: (str) Name of the source index or alias
+    - **alias**: (str) Alias to be swapped to the new index - a concrete index with
+      the same name is deleted by the swap
+    - **mappings**: (dict) Mappings of the new index
+    - **settings**: (dict) Settings of the new index
+    - **slices**: (int) Number of parallel slices - one per shard if not given
+    - **requests_per_second**: (float) Throttle of the reindex - unthrottled if not given
+    - **registry**: (PlantIndexRegistry) Registry of the plant indices - reloaded after the swap
+
+    Returns
+    -------
+    - **dict**: Id of the elasticsearch task (`task_id`, to poll the progress) and name of the new index
+
+    Raises
+    ------
+    - **HTTPException**
+        - **404** - If the source index does not exist
+    """
+    source_indices = await es_client.resolve_alias(source)
+    if not source_indices:
+        raise HTTPException(status_code=404, detail=f"Index - '{source}' does not exists")
+
+    if mappings is None:
+        mappings, source_settings = await es_client.get_index_definition(source_indices[0])
+        settings = settings if settings is not None else source_settings
+    settings = dict(settings or {})
+    # settings not given are restored to the values of the plant index template, not to the elasticsearch defaults
+    restore_settings = {key: settings.get(key, PLANTS_INDEX_SETTINGS.get(key)) for key in ES_BULK_LOAD_SETTINGS}
+
+    target = versioned_index_name(alias)
+    await es_client.create_index(target, mappings=mappings, settings={**settings, **ES_BULK_LOAD_SETTINGS})
+    task_id = await es_client.start_reindex(source, target, slices=slices,
+                                            requests_per_second=requests_per_second)
+
+    # persisted - if this worker stops before the task completes, another one swaps the alias
+    async with AsyncSessionLocal() as db:
+        job = PlantReindexJob(task_id=task_id, source=source, source_indices=source_indices, target=target,
+                              alias=alias, restore_settings=restore_settings, status="running",
+                              claimed_at=datetime.now(timezone.utc))
+        db.add(job)
+        await db.commit()
+    _watch_reindex(es_client, job, registry)
+    return {"task_id": task_id, "target_index": target, "alias": alias}
+
+
+async def _upsert_plant_indices(uuids: Dict[str, str]) -> Optional[int]:
+    async with AsyncSessionLocal() as db:
+        # transaction scoped lock - released by the commit, other workers skip this round
+        if not (await db.execute(select(func.pg_try_advisory_xact_lock(PLANT_INDEX_RECONCILE_LOCK)))).scalar():
+            return None
+        if not uuids:
+            return 0
+        statement = insert(PlantIndex).values([
+            {"idx_uuid": uuid, "index_name": index, "description": f"Initialized '{index}'"}
+            for index, uuid in sorted(uuids.items())
+        ])
+        statement = statement.on_conflict_do_update(
+            index_elements=[PlantIndex.index_name],
+            set_={"idx_uuid": statement.excluded.idx_uuid, "updated_at": func.now()},
+            where=PlantIndex.idx_uuid != statement.excluded.idx_uuid,
+        )
+        changed = (await db.execute(statement)).rowcount
+        await db.commit()
+        return changed
+
+
+async def reconcile_plant_indices(es_client: AsyncElasticSearchClient) -> Optional[int]:
+    """
+    Add the elasticsearch indices missing from the `plant_idx` table and update the
+    uuids of the recreated ones
+
+    The indices and their uuids come from a single `_settings` call (the index
+    registry reload) and the rows are upserted in a single transaction, under a
+    postgres advisory lock - when several workers reconcile at the same time, only
+    one of them does it.
+
+    Parameters
+    ----------
+    - **es_client**: (AsyncElasticSearchClient) Elasticsearch client
+
+    Returns
+    -------
+    - **Optional[int]**: Number of rows added or updated, None if another worker holds the lock
+    """
+    await es_client.refresh_metadata()
+    uuids = {index: uuid for index, uuid in es_client.metadata.uuids.items()
+             if uuid is not None and not index.startswith(".")}
+    return await _upsert_plant_indices(uuids)
+
+
+async def run_plant_index_reconciliation(es_client: AsyncElasticSearchClient,
+                                         registry: Optional[PlantIndexRegistry] = None,
+                                         interval: float = PLANT_INDEX_RECONCILE_INTERVAL) -> None:
+    """
+    Reconcile the `plant_idx` table now and then every `interval` seconds - picks
+    up the indices created or recreated outside of the application - and take over
+    the reindex jobs left by stopped workers
+
+    Parameters
+    ----------
+    - **es_client**: (AsyncElasticSearchClient) Elasticsearch client
+    - **registry**: (PlantIndexRegistry) Registry of the plant indices - reloaded when rows changed
+    - **interval**: (float) Seconds between two reconciliations
+    """
+    while True:
+        try:
+            changed = await reconcile_plant_indices(es_client)
+            if changed:
+                logger.info("Reconciled %s plant indices with elasticsearch", changed)
+                if registry is not None:
+                    await registry.refresh(force=True)
+        except Exception as e:
+            logger.warning("Plant index reconciliation failed: %s", e)
+        try:
+            await resume_reindex_jobs(es_client, registry)
+        except Exception as e:
+            logger.warning("Resuming the reindex jobs failed: %s", e)
+        await asyncio.sleep(interval)
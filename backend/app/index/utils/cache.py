@@ -0,0 +1,163 @@
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Set
+
+
+def make_cache_key(*parts) -> str:
+    """
+    Build a cache key from JSON serializable parts - dict keys are sorted so
+    equal queries map to the same key
+
+    Parameters
+    ----------
+    - **parts**: Parts of the key (index, query, page, size, ...)
+
+    Returns
+    -------
+    - **str**: Cache key
+    """
+    return json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+
+
+class ResultCache(ABC):
+    """
+    Interface of the caches used in front of elasticsearch
+
+    Entries are tagged (e.g. with the index they were read from) so that a write
+    can invalidate every entry depending on the data it changed.
+    """
+
+    @abstractmethod
+    def get(self, key: Hashable) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    def set(self, key: Hashable, value: Any, tags: Iterable[str] = (), ttl: Optional[float] = None) -> None:
+        ...
+
+    @abstractmethod
+    def invalidate(self, tag: str) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+    @abstractmethod
+    def stats(self) -> dict:
+        ...
+
+
+class TTLCache(ResultCache):
+    """
+    In-process cache bounded both in number of entries (least recently used
+    entries are evicted first) and in age (entries expire after `ttl` seconds)
+
+    Parameters
+    ----------
+    - **maxsize**: (int) Maximum number of entries
+    - **ttl**: (float) Time to live of an entry, in seconds
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._tags: Dict[str, Set[Hashable]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _delete(self, key: Hashable) -> None:
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Get a cached value
+
+        Parameters
+        ----------
+        - **key**: (Hashable) Cache key
+
+        Returns
+        -------
+        - **Optional[Any]**: Cached value, or None if missing or expired
+        """
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self._delete(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, tags: Iterable[str] = (), ttl: Optional[float] = None) -> None:
+        """
+        Cache a value
+
+        Parameters
+        ----------
+        - **key**: (Hashable) Cache key
+        - **value**: (Any) Value to be cached
+        - **tags**: (Iterable[str]) Tags used to invalidate the entry
+        - **ttl**: (float) Time to live of the entry, in seconds (default: the ttl of the cache)
+        """
+        if key in self._entries:
+            self._delete(key)
+        tags = tuple(tags)
+        self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value, tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.maxsize:
+            self._delete(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate(self, tag: str) -> None:
+        """
+        Drop all the entries tagged with given tag
+
+        Parameters
+        ----------
+        - **tag**: (str) Tag of the entries (e.g. index name)
+        """
+        for key in list(self._tags.get(tag, ())):
+            self._delete(key)
+
+    def clear(self) -> None:
+        """
+        Drop all the entries
+        """
+        self._entries.clear()
+        self._tags.clear()
+
+    def stats(self) -> dict:
+        """
+        Get the cache counters
+
+        Returns
+        -------
+        - **dict**: Size, limits, hits, misses, hit ratio and evictions of the cache
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
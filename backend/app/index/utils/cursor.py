@@ -0,0 +1,50 @@
+import base64
+import binascii
+import json
+
+from fastapi.exceptions import HTTPException
+
+
+def encode_cursor(pit_id: str, search_after: list) -> str:
+    """
+    Encode a point in time and a search_after position into an opaque cursor
+
+    Parameters
+    ----------
+    - **pit_id**: (str) Point in time id
+    - **search_after**: (list) Sort values of the last hit of the page
+
+    Returns
+    -------
+    - **str**: URL safe cursor
+    """
+    payload = json.dumps({"pit": pit_id, "after": search_after}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """
+    Decode a cursor created by `encode_cursor`
+
+    Parameters
+    ----------
+    - **cursor**: (str) Cursor
+
+    Returns
+    -------
+    - **tuple**: Point in time id and search_after position
+
+    Raises
+    ------
+    - **HTTPException**
+        - **400** - If the cursor is invalid
+    """
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(cursor + padding))
+        pit_id, search_after = payload["pit"], payload["after"]
+        if not isinstance(pit_id, str) or not isinstance(search_after, list):
+            raise ValueError("Malformed cursor")
+        return pit_id, search_after
+    except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
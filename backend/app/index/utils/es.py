@@ -1,18 +1,124 @@
-from elasticsearch import Elasticsearch
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, Dict, List, Union
+
+from elastic_transport import JsonSerializer
+from elasticsearch import ApiError, AsyncElasticsearch, ConnectionTimeout, NotFoundError, TransportError, helpers
 from fastapi.exceptions import HTTPException
 from dotenv import load_dotenv
-import os
+
+from app.index.constants import (ES_BULK_MAX_CHUNK_BYTES, ES_BULK_MAX_ERRORS,
+                                 ES_BULK_MAX_RETRIES, ES_CLIENT_OPTIONS, ES_HOSTS,
+                                 ES_METADATA_MISS_REFRESH_INTERVAL, ES_METADATA_REFRESH_INTERVAL, ES_PIT_KEEP_ALIVE,
+                                 ES_UPDATE_FIELDS_SCRIPT)
+from app.index.utils.cache import ResultCache, make_cache_key
+from app.index.utils.cursor import decode_cursor, encode_cursor
+from app.index.utils.metadata import IndexMetadata
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+
+class RawJsonSerializer(JsonSerializer):
+    """
+    JSON serializer leaving the response bodies undecoded - the raw bytes can be
+    passed through to the HTTP response without a decode/encode cycle
+    """
 
-class ElasticSearchClient:
-    def __init__(self, hosts: list = None):
+    def loads(self, data: bytes) -> bytes:
+        return data
+
+
+class AsyncElasticSearchClient:
+    def __init__(self, hosts: list = None, cache: ResultCache = None, **options):
         if hosts is None:
-            hosts = [os.environ['ELASTICSEARCH_HOST']]
-        self.client = Elasticsearch(hosts=hosts)
+            hosts = ES_HOSTS
+        client_options = {**ES_CLIENT_OPTIONS, **options}
+        self.client = AsyncElasticsearch(hosts=hosts, **client_options)
+        # same cluster, returning the response bodies as raw bytes
+        raw_serializers = {"application/json": RawJsonSerializer(),
+                           "application/vnd.elasticsearch+json": RawJsonSerializer()}
+        self.raw_client = AsyncElasticsearch(hosts=hosts, serializers=raw_serializers, **client_options)
+        # optional cache of search results - invalidated by the writes made through this client
+        self.cache = cache
+        # bumped on every write made through this client - lets in-process derived data detect changes
+        self.generation = 0
+        # local registry of indices, aliases and uuids - spares existence checks on the hot paths
+        self.metadata = IndexMetadata()
+        self._metadata_lock = asyncio.Lock()
+
+    async def close(self) -> None:
+        """
+        Close the underlying connection pools
+        """
+        await self.client.close()
+        await self.raw_client.close()
+
+    def _cache_tags(self, index: str) -> List[str]:
+        # an index and the aliases pointing to it (or an alias and its indices) share their cached results
+        return sorted({index, *self.metadata.aliases.get(index, ()), *self.metadata.get_aliases(index)})
+
+    def invalidate_cache(self, index: str = None) -> None:
+        """
+        Drop the cached search results of given index - and of its aliases, or the
+        indices behind it if it is an alias
+
+        Parameters
+        ----------
+        - **index**: (str) Name of the index or alias - all the results are dropped if not given
+        """
+        self.generation += 1
+        if self.cache is None:
+            return
+        if index is None:
+            self.cache.clear()
+        else:
+            for tag in self._cache_tags(index):
+                self.cache.invalidate(tag)
+
+    async def refresh_metadata(self) -> None:
+        """
+        Reload the local registry of indices, aliases and uuids from elasticsearch
+
+        Concurrent callers share a single reload.
+        """
+        requested_at = time.monotonic()
+        async with self._metadata_lock:
+            if self.metadata.refreshed_at >= requested_at:
+                return
+            settings = await self.client.indices.get_settings(index="*", filter_path="*.settings.index.uuid")
+            aliases = await self.client.indices.get_alias(index="*")
+            self.metadata.load(settings.body or {}, aliases.body or {})
+
+    async def run_metadata_refresh(self, interval: float = ES_METADATA_REFRESH_INTERVAL) -> None:
+        """
+        Reload the local registry every `interval` seconds - picks up the changes
+        made outside of this process
 
-    def get_index_uuid(self, index: str) -> str:
+        Parameters
+        ----------
+        - **interval**: (float) Seconds between two reloads
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh_metadata()
+            except Exception as e:
+                logger.warning("Index metadata refresh failed: %s", e)
+
+    async def _known(self, check) -> bool:
+        # a miss may come from a change made by another process - reload once before answering, unless the
+        # registry was just reloaded (repeated lookups of a missing name would otherwise reload it every time)
+        if check():
+            return True
+        if time.monotonic() - self.metadata.refreshed_at < ES_METADATA_MISS_REFRESH_INTERVAL:
+            return False
+        await self.refresh_metadata()
+        return check()
+
+    async def get_index_uuid(self, index: str) -> str:
         """
         Get uuid for given index
 
@@ -30,15 +136,21 @@ class ElasticSearchClient:
             - **404** - If index does not exist
             - **500** - If UUID fetch fails
         """
-        if self.client.indices.exists(index=index):
+        if await self.index_exists(index):
+            uuid = self.metadata.get_uuid(index)
+            if uuid is not None:
+                return uuid
             try:
-                return self.client.indices.get_settings(index=index)[index]['settings']['index']['uuid']
+                settings = await self.client.indices.get_settings(index=index)
+                uuid = settings[index]['settings']['index']['uuid']
             except Exception:
                 raise HTTPException(status_code=500, detail="UUID fetch failed - Internal Server Error")
+            self.metadata.add_index(index, uuid)
+            return uuid
         else:
             raise HTTPException(status_code=404, detail=f"Index - '{index}' does not exists")
 
-    def get_indices(self, header: str = "index") -> list:
+    async def get_indices(self, header: str = "index") -> list:
         """
         Get all the indices in elasticsearch
 
@@ -56,13 +168,13 @@ class ElasticSearchClient:
             - **500** - If index fetch fails
         """
         try:
-            return self.client.cat.indices(h=header, s='index').split()
+            return (await self.client.cat.indices(h=header, s='index')).split()
         except Exception:
             raise HTTPException(status_code=500, detail="Index fetch failed - Internal Server Error")
 
-    def index_exists(self, index_name: str) -> bool:
+    async def index_exists(self, index_name: str) -> bool:
         """
-        Check if an index exists or not
+        Check if an index exists or not - answered from the local registry
 
         Parameters
         ----------
@@ -72,38 +184,40 @@ class ElasticSearchClient:
         -------
         - **bool**: Status of the index existence
         """
-        return self.client.indices.exists(index_name)
+        return await self._known(lambda: self.metadata.index_exists(index_name))
 
-    def create_index(self, index: str) -> bool:
+    async def create_index(self, index: str, mappings: dict = None, settings: dict = None) -> bool:
         """
         Create elasticsearch index for given index name
 
         Parameters
         ----------
-        index: str
-            Name of the index to be created
+        - **index**: (str) Name of the index to be created
+        - **mappings**: (dict) Mappings of the index
+        - **settings**: (dict) Settings of the index
 
         Returns
         -------
-        bool
-            Status of the index creation
+        - **bool**: Status of the index creation
 
         Raises
         ------
-        HTTPException
-            409 - If index already exists
-            500 - If index creation fails
+        - **HTTPException**
+            - **409** - If index already exists
+            - **500** - If index creation fails
         """
-        if self.client.indices.exists(index):
+        if await self.index_exists(index):
             raise HTTPException(status_code=409, detail=f"Index - '{index}' already exists")
         else:
             try:
-                self.client.indices.create(index=index)
+                await self.client.indices.create(index=index, mappings=mappings, settings=settings)
+                self.metadata.add_index(index)
+                self.invalidate_cache()
                 return True
             except Exception:
                 raise HTTPException(status_code=500, detail="Index creation failed - Internal Server Error")
 
-    def delete_index(self, index: str) -> bool:
+    async def delete_index(self, index: str) -> bool:
         """
         Delete elasticsearch index for given index name
 
@@ -121,16 +235,21 @@ class ElasticSearchClient:
             - **404** - If index does not exist
             - **500** - If index deletion fails
         """
-        if self.client.indices.exists(index):
+        if await self.index_exists(index):
             try:
-                self.client.indices.delete(index=index)
+                await self.client.indices.delete(index=index)
+                self.metadata.remove_index(index)
+                self.invalidate_cache()
                 return True
+            except NotFoundError:
+                self.metadata.remove_index(index)
+                raise HTTPException(status_code=404, detail=f"Index - '{index}' does not exists")
             except Exception:
                 raise HTTPException(status_code=500, detail="Index deletion failed - Internal Server Error")
         else:
             raise HTTPException(status_code=404, detail=f"Index - '{index}' does not exists")
 
-    def create_alias(self, index: str, alias: str) -> bool:
+    async def create_alias(self, index: str, alias: str) -> bool:
         """
         Create alias for given index
 
@@ -149,18 +268,20 @@ class ElasticSearchClient:
             - **404** - If index does not exist
             - **500** - If alias creation fails
         """
-        if self.client.indices.exists(index):
+        if await self.index_exists(index):
             try:
-                self.client.indices.put_alias(index=index, name=alias)
+                await self.client.indices.put_alias(index=index, name=alias)
+                self.metadata.add_alias(index, alias)
+                self.invalidate_cache()
                 return True
             except Exception:
                 raise HTTPException(status_code=500, detail="Alias creation failed - Internal Server Error")
         else:
             raise HTTPException(status_code=404, detail=f"Index - '{index}' does not exists")
 
-    def alias_exists(self, alias: str) -> bool:
+    async def alias_exists(self, alias: str) -> bool:
         """
-        Check if an alias exists or not
+        Check if an alias exists or not - answered from the local registry
 
         Parameters
         ----------
@@ -170,9 +291,9 @@ class ElasticSearchClient:
         -------
         - **bool**: Status of the alias existence
         """
-        return self.client.indices.exists_alias(alias)
+        return await self._known(lambda: self.metadata.alias_exists(alias))
 
-    def delete_alias(self, index: str, alias: str) -> bool:
+    async def delete_alias(self, index: str, alias: str) -> bool:
         """
         Delete alias for given index
 
@@ -191,16 +312,18 @@ class ElasticSearchClient:
             - **404** - If index does not exist
             - **500** - If alias deletion fails
         """
-        if self.client.indices.exists(index):
+        if await self.index_exists(index):
             try:
-                self.client.indices.delete_alias(index=index, name=alias)
+                await self.client.indices.delete_alias(index=index, name=alias)
+                self.metadata.remove_alias(index, alias)
+                self.invalidate_cache()
                 return True
             except Exception:
                 raise HTTPException(status_code=500, detail="Alias deletion failed - Internal Server Error")
         else:
             raise HTTPException(status_code=404, detail=f"Index - '{index}' does not exists")
 
-    def update_alias(self, index: str, alias: str) -> bool:
+    async def update_alias(self, index: str, alias: str) -> bool:
         """
         Update alias for given index
 
@@ -219,21 +342,24 @@ class ElasticSearchClient:
             - **404** - If index does not exist
             - **500** - If alias update fails
         """
-        if self.client.indices.exists(index):
+        if await self.index_exists(index):
             try:
-                # delete all existing aliases for the index
-                for alias_name in self.client.indices.get_alias(index).keys():
-                    self.delete_alias(index=index, alias=alias_name)
-                # create new alias for the index
-                return self.create_alias(index=index, alias=alias)
+                # replace all existing aliases of the index in a single atomic call - read fresh, the
+                # local registry may miss the changes made by other processes
+                await self.refresh_metadata()
+                actions = [{"remove": {"index": index, "alias": alias_name}}
+                           for alias_name in self.metadata.get_aliases(index)]
+                actions.append({"add": {"index": index, "alias": alias}})
+                await self.update_aliases(actions)
+                return True
             except Exception:
                 raise HTTPException(status_code=500, detail="Alias update failed - Internal Server Error")
         else:
             raise HTTPException(status_code=404, detail=f"Index - '{index}' does not exists")
 
-    def index_or_alias_exists(self, index_or_alias: str) -> bool:
+    async def index_or_alias_exists(self, index_or_alias: str) -> bool:
         """
-        Check if an index or alias exists or not
+        Check if an index or alias exists or not - answered from the local registry
 
         Parameters
         ----------
@@ -249,11 +375,12 @@ class ElasticSearchClient:
             - **500** - If index or alias existence check fails
         """
         try:
-            return self.client.indices.exists(index_or_alias) or self.client.indices.exists_alias(index_or_alias)
+            return await self._known(lambda: self.metadata.index_exists(index_or_alias)
+                                     or self.metadata.alias_exists(index_or_alias))
         except Exception:
             raise HTTPException(status_code=500, detail="Index or alias existence check failed - Internal Server Error")
 
-    def index_document(self, index: str, document: dict) -> bool:
+    async def index_document(self, index: str, document: dict, document_id: str = None) -> str:
         """
         Index document in elasticsearch index
 
@@ -261,10 +388,11 @@ class ElasticSearchClient:
         ----------
         - **index**: (str) Name of the index to be created
         - **document**: (dict) Document to be indexed
+        - **document_id**: (str) Id of the document - generated by elasticsearch if not given
 
         Returns
         -------
-        - **bool**: Status of the document indexing
+        - **str**: Id of the indexed document
 
         Raises
         ------
@@ -272,12 +400,13 @@ class ElasticSearchClient:
             - **500** - If document indexing fails
         """
         try:
-            self.client.index(index=index, body=document)
-            return True
+            response = await self.client.index(index=index, document=document, id=document_id)
+            self.invalidate_cache(index)
+            return response["_id"]
         except Exception:
             raise HTTPException(status_code=500, detail="Document indexing failed - Internal Server Error")
 
-    def search_document(self, index: str, query: dict) -> dict:
+    async def search_document(self, index: str, query: dict) -> dict:
         """
         Search document in elasticsearch index
 
@@ -295,12 +424,24 @@ class ElasticSearchClient:
         - **HTTPException**
             - **500** - If document search fails
         """
+        key = make_cache_key("search_document", index, query)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
         try:
-            return self.client.search(index=index, body=query)
+            result = (await self.client.search(index=index, body=query)).body
+        except NotFoundError:
+            # the local registry is stale - the index was removed outside of this process
+            await self.refresh_metadata()
+            raise HTTPException(status_code=404, detail=f"Index - '{index}' does not exists")
         except Exception:
             raise HTTPException(status_code=500, detail="Document search failed - Internal Server Error")
+        if self.cache is not None:
+            self.cache.set(key, result, tags=self._cache_tags(index))
+        return result
 
-    def delete_document_by_id(self, index: str, document_id: str) -> bool:
+    async def delete_document_by_id(self, index: str, document_id: str) -> bool:
         """
         Delete document in elasticsearch index
 
@@ -319,12 +460,13 @@ class ElasticSearchClient:
             - **500** - If document deletion fails
         """
         try:
-            self.client.delete(index=index, id=document_id)
+            await self.client.delete(index=index, id=document_id)
+            self.invalidate_cache(index)
             return True
         except Exception:
             raise HTTPException(status_code=500, detail="Document deletion failed - Internal Server Error")
 
-    def delete_document_by_query(self, index: str, query: dict) -> bool:
+    async def delete_document_by_query(self, index: str, query: dict) -> bool:
         """
         Delete document in elasticsearch index
 
@@ -343,12 +485,13 @@ class ElasticSearchClient:
             - **500** - If document deletion fails
         """
         try:
-            self.client.delete_by_query(index=index, body=query)
+            await self.client.delete_by_query(index=index, body=query)
+            self.invalidate_cache(index)
             return True
         except Exception:
             raise HTTPException(status_code=500, detail="Document deletion failed - Internal Server Error")
 
-    def update_document_by_id(self, index: str, document_id: str, document: dict) -> bool:
+    async def update_document_by_id(self, index: str, document_id: str, document: dict) -> bool:
         """
         Update document in elasticsearch index
 
@@ -368,20 +511,22 @@ class ElasticSearchClient:
             - **500** - If document update fails
         """
         try:
-            self.client.update(index=index, id=document_id, body={"doc": document})
+            await self.client.update(index=index, id=document_id, doc=document)
+            self.invalidate_cache(index)
             return True
         except Exception:
             raise HTTPException(status_code=500, detail="Document update failed - Internal Server Error")
 
-    def update_document_by_query(self, index: str, query: dict, document: dict) -> bool:
+    async def update_document_by_query(self, index: str, query: dict, document: dict) -> bool:
         """
-        Update document in elasticsearch index
+        Update documents in elasticsearch index - the fields of `document` are set on
+        every document matching the query
 
         Parameters
         ----------
         - **index**: (str) Name of the index to be created
         - **query**: (dict) Query to be searched
-        - **document**: (dict) Document to be updated
+        - **document**: (dict) Fields to be updated
 
         Returns
         -------
@@ -393,12 +538,100 @@ class ElasticSearchClient:
             - **500** - If document update fails
         """
         try:
-            self.client.update_by_query(index=index, query=query, body={"doc": document})
+            await self.client.update_by_query(index=index, query=query, conflicts="proceed",
+                                              script={"source": ES_UPDATE_FIELDS_SCRIPT, "lang": "painless",
+                                                      "params": {"doc": document}})
+            self.invalidate_cache(index)
             return True
         except Exception:
             raise HTTPException(status_code=500, detail="Document update failed - Internal Server Error")
 
-    def get_document_by_id(self, index: str, document_id: str) -> dict:
+    async def start_update_by_query(self, index: str, query: dict, document: dict, slices: int = None,
+                                    requests_per_second: float = None) -> str:
+        """
+        Start setting the fields of `document` on every document matching a query, as a
+        background task - poll its progress with `get_task`
+
+        Documents changed concurrently are skipped (`conflicts: proceed`) and counted in
+        the `version_conflicts` of the task status.
+
+        Parameters
+        ----------
+        - **index**: (str) Name of the index or alias
+        - **query**: (dict) Query of the documents to be updated
+        - **document**: (dict) Fields to be updated
+        - **slices**: (int) Number of parallel slices - one per shard if not given
+        - **requests_per_second**: (float) Throttle of the update - unthrottled if not given
+
+        Returns
+        -------
+        - **str**: Id of the elasticsearch task
+        """
+        response = await self.client.update_by_query(
+            index=index,
+            query=query,
+            script={"source": ES_UPDATE_FIELDS_SCRIPT, "lang": "painless", "params": {"doc": document}},
+            conflicts="proceed",
+            slices=slices or "auto",
+            requests_per_second=requests_per_second or -1,
+            wait_for_completion=False,
+        )
+        self.invalidate_cache(index)
+        return response["task"]
+
+    async def bulk_write(self, index: str, operations: List[dict], refresh: bool = False) -> List[dict]:
+        """
+        Apply partial updates, upserts and deletes in a single `_bulk` request
+
+        An operation carrying `if_seq_no` / `if_primary_term` (as returned when the
+        document was read) only applies if the document did not change since - it
+        fails with a 409 version conflict otherwise.
+
+        Parameters
+        ----------
+        - **index**: (str) Name of the index or alias
+        - **operations**: (List[dict]) Operations - `op` (`update` or `delete`), `_id`, `doc` and
+          `doc_as_upsert` (update only), `if_seq_no` and `if_primary_term` (optional)
+        - **refresh**: (bool) Make the changes visible to search before returning
+
+        Returns
+        -------
+        - **List[dict]**: Result of every operation, in the order of the request - `_id`, `status`,
+          `result` (`updated`, `created`, `deleted`, `noop`), `_seq_no`, `_primary_term` or `error`
+
+        Raises
+        ------
+        - **HTTPException**
+            - **4xx** - If elasticsearch rejects the whole request (e.g. a validation error)
+            - **502** - If elasticsearch fails the whole request otherwise, or cannot be reached
+            - **504** - If elasticsearch does not answer in time
+        """
+        lines = []
+        for operation in operations:
+            action = {"_index": index, "_id": operation["_id"]}
+            for key in ("if_seq_no", "if_primary_term"):
+                if operation.get(key) is not None:
+                    action[key] = operation[key]
+            lines.append({operation["op"]: action})
+            if operation["op"] == "update":
+                lines.append({"doc": operation["doc"], "doc_as_upsert": operation.get("doc_as_upsert", False)})
+        try:
+            response = await self.client.bulk(operations=lines, refresh=refresh)
+        except ApiError as e:
+            status_code = e.meta.status if 400 <= e.meta.status < 500 else 502
+            raise HTTPException(status_code=status_code, detail=f"Bulk request rejected: {e.message}")
+        except ConnectionTimeout:
+            raise HTTPException(status_code=504, detail="Bulk request timed out - some operations may be applied")
+        except TransportError as e:
+            raise HTTPException(status_code=502, detail=f"Bulk request failed: {e.message}")
+        items = [result for item in response["items"] for result in item.values()]
+        if any(item.get("status", 500) < 300 for item in items):
+            self.invalidate_cache(index)
+        return items
+
+    async def get_document_by_id(self, index: str, document_id: str, raw: bool = False,
+                                 source_includes: List[str] = None,
+                                 source_excludes: List[str] = None) -> Union[dict, bytes]:
         """
         Get document in elasticsearch index
 
@@ -406,17 +639,524 @@ class ElasticSearchClient:
         ----------
         - **index**: (str) Name of the index to be created
         - **document_id**: (str) Id of the document to be fetched
+        - **raw**: (bool) Return the undecoded response body
+        - **source_includes**: (List[str]) Fields of the document to be returned
+        - **source_excludes**: (List[str]) Fields of the document not to be returned
 
         Returns
         -------
-        - **dict**: Document fetched
+        - **Union[dict, bytes]**: Document fetched
 
         Raises
         ------
         - **HTTPException**
+            - **404** - If document does not exist
             - **500** - If document fetch fails
         """
+        client = self.raw_client if raw else self.client
         try:
-            return self.client.get(index=index, id=document_id)
+            response = await client.get(index=index, id=document_id,
+                                        source_includes=source_includes, source_excludes=source_excludes)
+            return response.body
+        except NotFoundError:
+            raise HTTPException(status_code=404, detail=f"Document - '{document_id}' does not exists")
         except Exception:
             raise HTTPException(status_code=500, detail="Document fetch failed - Internal Server Error")
+
+    async def multi_search(self, index: str, searches: List[dict]) -> List[dict]:
+        """
+        Run several searches in a single `_msearch` round-trip
+
+        Parameters
+        ----------
+        - **index**: (str) Name of the index or alias
+        - **searches**: (List[dict]) Search request bodies (query, from, size, _source, ...)
+
+        Returns
+        -------
+        - **List[dict]**: Search responses, in the order of the searches - a failed search
+          carries an `error` and its `status`
+        """
+        lines = []
+        for search in searches:
+            lines += [{"index": index}, search]
+        response = await self.client.msearch(searches=lines)
+        return response["responses"]
+
+    async def multi_get(self, index: str, documents: List[dict]) -> List[dict]:
+        """
+        Get several documents in a single `_mget` round-trip
+
+        Parameters
+        ----------
+        - **index**: (str) Name of the index or alias
+        - **documents**: (List[dict]) Documents to be fetched - `_id` and optional `_source` filtering
+
+        Returns
+        -------
+        - **List[dict]**: Documents, in the order of the request - a missing document has
+          `found` false, a failed fetch carries an `error`
+        """
+        response = await self.client.mget(index=index, docs=documents)
+        return response["docs"]
+
+    async def bulk_index_documents(self, index: str, documents: AsyncIterator[dict], chunk_size: int = 500,
+                                   concurrency: int = 4, refresh: bool = True,
+                                   max_errors: int = ES_BULK_MAX_ERRORS) -> dict:
+        """
+        Bulk index a stream of documents in elasticsearch index
+
+        Documents are pulled from `documents` into a bounded queue and indexed by
+        `concurrency` workers, each running `helpers.async_streaming_bulk` in chunks
+        of `chunk_size` documents - memory stays flat regardless of the stream size.
+        A document's `_id` key (if any) is used as the document id.
+
+        Parameters
+        ----------
+        - **index**: (str) Name of the index
+        - **documents**: (AsyncIterator[dict]) Documents to be indexed
+        - **chunk_size**: (int) Number of documents per bulk request
+        - **concurrency**: (int) Number of bulk requests in flight
+        - **refresh**: (bool) Refresh the index once all the documents are indexed
+        - **max_errors**: (int) Maximum number of failed items to report
+
+        Returns
+        -------
+        - **dict**: Number of `indexed` and `failed` documents and the reported `errors`
+        """
+        queue = asyncio.Queue(maxsize=chunk_size * concurrency)
+        done = object()
+        report = {"indexed": 0, "failed": 0, "errors": []}
+
+        async def produce():
+            async for document in documents:
+                await queue.put(document)
+            for _ in range(concurrency):
+                await queue.put(done)
+
+        async def actions():
+            while True:
+                document = await queue.get()
+                if document is done:
+                    return
+                action = {"_index": index, "_source": document}
+                if "_id" in document:
+                    action["_id"] = document.pop("_id")
+                yield action
+
+        async def consume():
+            async for ok, item in helpers.async_streaming_bulk(self.client, actions(),
+                                                               chunk_size=chunk_size,
+                                                               max_chunk_bytes=ES_BULK_MAX_CHUNK_BYTES,
+                                                               max_retries=ES_BULK_MAX_RETRIES,
+                                                               raise_on_error=False,
+                                                               raise_on_exception=False):
+                if ok:
+                    report["indexed"] += 1
+                    continue
+                report["failed"] += 1
+                if len(report["errors"]) < max_errors:
+                    _, result = item.popitem()
+                    report["errors"].append({"_id": result.get("_id"),
+                                             "status": result.get("status"),
+                                             "error": result.get("error")})
+
+        tasks = [asyncio.ensure_future(produce())]
+        tasks += [asyncio.ensure_future(consume()) for _ in range(concurrency)]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # do not leave workers blocked on the queue if one of them failed
+            for task in tasks:
+                task.cancel()
+
+        if refresh:
+            await self.client.indices.refresh(index=index)
+        if report["indexed"]:
+            self.invalidate_cache(index)
+        return report
+
+    async def open_point_in_time(self, index: str, keep_alive: str = ES_PIT_KEEP_ALIVE) -> str:
+        """
+        Open a point in time for given index
+
+        Parameters
+        ----------
+        - **index**: (str) Name of the index or alias
+        - **keep_alive**: (str) Time to keep the point in time alive
+
+        Returns
+        -------
+        - **str**: Point in time id
+        """
+        return (await self.client.open_point_in_time(index=index, keep_alive=keep_alive))["id"]
+
+    async def close_point_in_time(self, pit_id: str) -> None:
+        """
+        Close a point in time - an already expired point in time is ignored
+
+        Parameters
+        ----------
+        - **pit_id**: (str) Point in time id
+        """
+        try:
+            await self.client.close_point_in_time(id=pit_id)
+        except NotFoundError:
+            pass
+
+    async def paginated_search(self, index: str, size: int, page: int = 1, cursor: str = None,
+                               use_cursor: bool = False, track_total_hits: bool = True, raw: bool = False,
+                               **body) -> Union[dict, bytes]:
+        """
+        Search a page of documents in elasticsearch index
+
+        By default pages are fetched with `from`/`size`. With `use_cursor` (first page) or
+        `cursor` (next pages) the search runs against a point in time and pages with
+        `search_after`, so every page costs the same regardless of its depth. The
+        response then carries a `cursor` for the next page (`None` on the last page).
+        Pages fetched with `from`/`size` are served from the result cache (if any) and
+        can be returned as the raw response bytes of elasticsearch (`raw`).
+
+        Parameters
+        ----------
+        - **index**: (str) Name of the index or alias
+        - **size**: (int) Number of documents per page
+        - **page**: (int) Page number - ignored in cursor mode
+        - **cursor**: (str) Cursor returned with the previous page
+        - **use_cursor**: (bool) Start a cursor pagination
+        - **track_total_hits**: (bool) Count the total number of hits exactly
+        - **raw**: (bool) Return the undecoded response body - ignored in cursor mode
+        - **body**: Search request body (query, suggest, sort, source_includes, ...)
+
+        Returns
+        -------
+        - **Union[dict, bytes]**: Search results
+
+        Raises
+        ------
+        - **HTTPException**
+            - **400** - If the cursor is invalid
+            - **410** - If the cursor expired
+        """
+        if cursor is None and not use_cursor:
+            key = make_cache_key("paginated_search", index, page, size, track_total_hits, raw, body)
+            if self.cache is not None:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    return cached
+            client = self.raw_client if raw else self.client
+            response = await client.search(index=index, size=size, from_=(page - 1) * size,
+                                           track_total_hits=track_total_hits, **body)
+            if self.cache is not None:
+                self.cache.set(key, response.body, tags=self._cache_tags(index))
+            return response.body
+
+        if cursor is not None:
+            pit_id, search_after = decode_cursor(cursor)
+        else:
+            pit_id, search_after = await self.open_point_in_time(index), None
+
+        # _shard_doc is a cheap, unique tiebreaker within a point in time
+        sort = list(body.pop("sort", None) or [{"_score": "desc"}])
+        if not any(field == "_shard_doc" or (isinstance(field, dict) and "_shard_doc" in field)
+                   for field in sort):
+            sort.append({"_shard_doc": "asc"})
+
+        try:
+            response = await self.client.search(pit={"id": pit_id, "keep_alive": ES_PIT_KEEP_ALIVE},
+                                                size=size, sort=sort, search_after=search_after,
+                                                track_total_hits=track_total_hits, **body)
+        except Exception as error:
+            # a point in time opened by this call is not handed out in a cursor - close it here
+            if cursor is None:
+                try:
+                    await self.close_point_in_time(pit_id)
+                except Exception:
+                    logger.warning("Closing point in time of a failed search failed", exc_info=True)
+            if isinstance(error, NotFoundError):
+                raise HTTPException(status_code=410, detail="Cursor expired")
+            raise
+
+        result = response.body
+        hits = result["hits"]["hits"]
+        if len(hits) < size:
+            await self.close_point_in_time(result.get("pit_id", pit_id))
+            result["cursor"] = None
+        else:
+            result["cursor"] = encode_cursor(result.get("pit_id", pit_id), hits[-1]["sort"])
+        return result
+
+    async def scan_documents(self, index: str, query: dict = None, slices: int = 1, page_size: int = 1000,
+                             source_includes: List[str] = None) -> AsyncIterator[dict]:
+        """
+        Iterate over all the documents of an index matching a query
+
+        The documents are read from a point in time in `slices` parallel slices, each
+        paging with `search_after`. Pages go through a bounded queue, so the slices
+        only read ahead of the consumer by a few pages - memory stays constant
+        whatever the index size.
+
+        Parameters
+        ----------
+        - **index**: (str) Name of the index or alias
+        - **query**: (dict) Query the documents must match (default: match_all)
+        - **slices**: (int) Number of slices read in parallel
+        - **page_size**: (int) Number of documents per page
+        - **source_includes**: (List[str]) Fields of the documents to be returned
+
+        Returns
+        -------
+        - **AsyncIterator[dict]**: Hits (`_id`, `_source`, ...) in no particular order
+        """
+        pit_id = await self.open_point_in_time(index)
+        queue = asyncio.Queue(maxsize=2 * slices)
+        done = object()
+
+        async def read_slice(slice_id: int):
+            search_after, current_pit_id = None, pit_id
+            try:
+                while True:
+                    response = await self.client.search(
+                        pit={"id": current_pit_id, "keep_alive": ES_PIT_KEEP_ALIVE},
+                        query=query or {"match_all": {}},
+                        slice={"id": slice_id, "max": slices} if slices > 1 else None,
+                        sort=[{"_shard_doc": "asc"}],
+                        search_after=search_after,
+                        size=page_size,
+                        source_includes=source_includes,
+                        track_total_hits=False,
+                    )
+                    hits = response["hits"]["hits"]
+                    if hits:
+                        await queue.put(hits)
+                    if len(hits) < page_size:
+                        break
+                    search_after, current_pit_id = hits[-1]["sort"], response.get("pit_id", current_pit_id)
+            except Exception as e:
+                await queue.put(e)
+                return
+            await queue.put(done)
+
+        tasks = [asyncio.ensure_future(read_slice(slice_id)) for slice_id in range(slices)]
+        try:
+            remaining = slices
+            while remaining:
+                hits = await queue.get()
+                if hits is done:
+                    remaining -= 1
+                    continue
+                if isinstance(hits, Exception):
+                    raise hits
+                for hit in hits:
+                    yield hit
+        finally:
+            for task in tasks:
+                task.cancel()
+            await self.close_point_in_time(pit_id)
+
+    async def update_aliases(self, actions: List[dict]) -> None:
+        """
+        Apply alias actions (`add`, `remove`, `remove_index`) in a single atomic call
+
+        Parameters
+        ----------
+        - **actions**: (List[dict]) Alias actions
+        """
+        await self.client.indices.update_aliases(actions=actions)
+        for action in actions:
+            (operation, target), = action.items()
+            if operation == "add":
+                self.metadata.add_alias(target["index"], target["alias"])
+            elif operation == "remove":
+                self.metadata.remove_alias(target["index"], target["alias"])
+            elif operation == "remove_index":
+                self.metadata.remove_index(target["index"])
+        self.invalidate_cache()
+
+    async def swap_alias(self, alias: str, index: str, remove_indices: List[str] = ()) -> None:
+        """
+        Point an alias to an index, atomically - the alias never points at nothing
+
+        The alias is removed from every index it points to and added to `index` in a
+        single `_aliases` call. `remove_indices` are deleted in the same call, which is
+        required when a concrete index carries the name of the alias.
+
+        Parameters
+        ----------
+        - **alias**: (str) Name of the alias
+        - **index**: (str) Name of the index the alias must point to
+        - **remove_indices**: (List[str]) Indices to be deleted with the swap
+        """
+        # read fresh - with a stale registry, an alias moved by another process would be left on two indices
+        await self.refresh_metadata()
+        actions = [{"remove": {"index": current, "alias": alias}}
+                   for current in sorted(self.metadata.aliases.get(alias, ())) if current not in remove_indices]
+        actions.append({"add": {"index": index, "alias": alias}})
+        actions += [{"remove_index": {"index": removed}} for removed in remove_indices]
+        await self.update_aliases(actions)
+
+    async def resolve_alias(self, index_or_alias: str) -> List[str]:
+        """
+        Get the indices behind an index name or alias
+
+        Parameters
+        ----------
+        - **index_or_alias**: (str) Name of the index or alias
+
+        Returns
+        -------
+        - **List[str]**: Names of the indices - empty if the name is unknown
+        """
+        if await self.index_exists(index_or_alias):
+            return [index_or_alias]
+        return sorted(self.metadata.aliases.get(index_or_alias, ()))
+
+    async def get_index_definition(self, index: str) -> tuple:
+        """
+        Get the mappings and the analysis settings of an index
+
+        Parameters
+        ----------
+        - **index**: (str) Name of the index
+
+        Returns
+        -------
+        - **tuple**: Mappings and settings (analysis only) of the index
+        """
+        mappings = await self.client.indices.get_mapping(index=index)
+        settings = await self.client.indices.get_settings(index=index, filter_path="*.settings.index.analysis")
+        analysis = settings.body.get(index, {}).get("settings", {}).get("index", {}).get("analysis")
+        return mappings[index]["mappings"], ({"analysis": analysis} if analysis else None)
+
+    async def start_reindex(self, source: str, dest: str, slices: int = None,
+                            requests_per_second: float = None) -> str:
+        """
+        Start copying the documents of an index into another, as a background task
+
+        Parameters
+        ----------
+        - **source**: (str) Name of the source index or alias
+        - **dest**: (str) Name of the destination index
+        - **slices**: (int) Number of parallel slices - one per shard if not given
+        - **requests_per_second**: (float) Throttle of the reindex - unthrottled if not given
+
+        Returns
+        -------
+        - **str**: Id of the elasticsearch task
+        """
+        response = await self.client.reindex(
+            source={"index": source},
+            dest={"index": dest},
+            slices=slices or "auto",
+            requests_per_second=requests_per_second or -1,
+            wait_for_completion=False,
+        )
+        return response["task"]
+
+    async def get_task(self, task_id: str) -> dict:
+        """
+        Get the status of an elasticsearch task (reindex, update by query, ...)
+
+        Parameters
+        ----------
+        - **task_id**: (str) Id of the task
+
+        Returns
+        -------
+        - **dict**: Task status - `completed`, `task.status` (progress), `response` or `error`
+
+        Raises
+        ------
+        - **HTTPException**
+            - **404** - If the task does not exist
+        """
+        try:
+            return (await self.client.tasks.get(task_id=task_id)).body
+        except NotFoundError:
+            raise HTTPException(status_code=404, detail=f"Task - '{task_id}' does not exists")
+
+    async def wait_for_task(self, task_id: str, poll_interval: float = 2.0, on_progress=None) -> dict:
+        """
+        Wait for an elasticsearch task to complete
+
+        Parameters
+        ----------
+        - **task_id**: (str) Id of the task
+        - **poll_interval**: (float) Seconds between two status checks
+        - **on_progress**: (Callable[[dict], None]) Called with the task status after every check
+
+        Returns
+        -------
+        - **dict**: Final task status
+        """
+        while True:
+            task = await self.get_task(task_id)
+            if on_progress is not None:
+                on_progress(task.get("task", {}).get("status", {}))
+            if task.get("completed"):
+                return task
+            await asyncio.sleep(poll_interval)
+
+    async def put_index_settings(self, index: str, settings: dict) -> Dict[str, dict]:
+        """
+        Update the dynamic settings of an index - or of every index behind an alias
+
+        Parameters
+        ----------
+        - **index**: (str) Name of the index or alias
+        - **settings**: (dict) Settings to be updated (e.g. `{"refresh_interval": "-1"}`)
+
+        Returns
+        -------
+        - **Dict[str, dict]**: Previous values of the updated settings (None if they were not set), by
+          concrete index - restored with `put_index_settings(<index>, <previous values>)`
+
+        Raises
+        ------
+        - **HTTPException**
+            - **404** - If the index does not exist
+        """
+        try:
+            # keyed by concrete index - an alias is resolved by elasticsearch
+            current = await self.client.indices.get_settings(index=index, flat_settings=True)
+        except NotFoundError:
+            raise HTTPException(status_code=404, detail=f"Index - '{index}' does not exists")
+        indices = sorted(current)
+        await self.client.indices.put_settings(index=",".join(indices), settings=settings)
+        return {name: {key: current[name]["settings"].get(f"index.{key}") for key in settings} for name in indices}
+
+    async def put_index_template(self, name: str, index_patterns: List[str], version: int,
+                                 mappings: dict = None, settings: dict = None, priority: int = 100) -> bool:
+        """
+        Install a versioned index template - applied to the indices created afterwards
+        whose name matches one of the patterns
+
+        Parameters
+        ----------
+        - **name**: (str) Name of the template
+        - **index_patterns**: (List[str]) Index name patterns (e.g. `plants*`)
+        - **version**: (int) Version of the template - an installed template with the same
+          or a higher version is left untouched
+        - **mappings**: (dict) Mappings of the indices
+        - **settings**: (dict) Settings of the indices
+        - **priority**: (int) Priority over the other templates matching the same indices
+
+        Returns
+        -------
+        - **bool**: Whether the template was installed
+        """
+        try:
+            templates = await self.client.indices.get_index_template(name=name)
+            installed = templates["index_templates"][0]["index_template"].get("version")
+            if installed is not None and installed >= version:
+                return False
+        except NotFoundError:
+            pass
+        await self.client.indices.put_index_template(
+            name=name,
+            index_patterns=index_patterns,
+            version=version,
+            priority=priority,
+            template={"mappings": mappings or {}, "settings": settings or {}},
+        )
+        return True
@@ -0,0 +1,74 @@
+import time
+from typing import Dict, List, Optional, Set
+
+
+class IndexMetadata:
+    """
+    In-process registry of the elasticsearch indices, their uuids and aliases
+
+    Lets the hot paths answer "does this index / alias exist" and "what is the
+    uuid of this index" without a round-trip to elasticsearch. The registry is
+    loaded from elasticsearch (`load`) and kept in sync with the changes made
+    through the application.
+    """
+
+    def __init__(self):
+        self.uuids: Dict[str, Optional[str]] = {}
+        self.aliases: Dict[str, Set[str]] = {}
+        # time.monotonic() of the last load - 0 if never loaded
+        self.refreshed_at = 0.0
+
+    @property
+    def loaded(self) -> bool:
+        return self.refreshed_at > 0
+
+    def load(self, settings: dict, aliases: dict) -> None:
+        """
+        Replace the registry with the state read from elasticsearch
+
+        Parameters
+        ----------
+        - **settings**: (dict) Response of `GET /*/_settings` (filtered on the index uuid)
+        - **aliases**: (dict) Response of `GET /*/_alias`
+        """
+        self.uuids = {
+            index: body.get("settings", {}).get("index", {}).get("uuid")
+            for index, body in settings.items()
+        }
+        for index in aliases:
+            self.uuids.setdefault(index, None)
+        self.aliases = {}
+        for index, body in aliases.items():
+            for alias in body.get("aliases", {}):
+                self.aliases.setdefault(alias, set()).add(index)
+        self.refreshed_at = time.monotonic()
+
+    def index_exists(self, index: str) -> bool:
+        return index in self.uuids
+
+    def alias_exists(self, alias: str) -> bool:
+        return alias in self.aliases
+
+    def get_uuid(self, index: str) -> Optional[str]:
+        return self.uuids.get(index)
+
+    def get_aliases(self, index: str) -> List[str]:
+        return sorted(alias for alias, indices in self.aliases.items() if index in indices)
+
+    def add_index(self, index: str, uuid: str = None) -> None:
+        self.uuids[index] = uuid
+
+    def remove_index(self, index: str) -> None:
+        self.uuids.pop(index, None)
+        for alias in self.get_aliases(index):
+            self.remove_alias(index, alias)
+
+    def add_alias(self, index: str, alias: str) -> None:
+        self.aliases.setdefault(alias, set()).add(index)
+
+    def remove_alias(self, index: str, alias: str) -> None:
+        indices = self.aliases.get(alias)
+        if indices is not None:
+            indices.discard(index)
+            if not indices:
+                del self.aliases[alias]
@@ -0,0 +1,126 @@
+import heapq
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Tuple
+
+# sorts after any character - upper bound of the keys starting with a prefix
+_MAX_CHAR = chr(0x10FFFF)
+
+
+class PrefixIndex:
+    """
+    In-memory prefix index over names, backed by a sorted array of keys
+
+    Names are matched case-insensitively. A prefix lookup is a binary search
+    followed by a slice, so suggestions are served without any network round-trip.
+    Every name keeps track of the documents it comes from, so a name is only
+    dropped once no document references it anymore.
+
+    Suggestions are ranked as the elasticsearch completion suggester ranks them:
+    by weight (the highest weight of the documents of a name), then alphabetically.
+    """
+
+    def __init__(self, entries: Iterable[Tuple] = ()):
+        self._keys: List[str] = []
+        self._names: Dict[str, str] = {}
+        self._documents: Dict[str, Dict[str, int]] = {}
+        # weight of the names weighing more or less than the default - empty while every name weighs 1
+        self._weights: Dict[str, int] = {}
+        for name, document_id, *weight in entries:
+            key = self._key(name)
+            if not key:
+                continue
+            if key not in self._names:
+                self._names[key] = name
+                self._documents[key] = {}
+            self._documents[key][document_id] = weight[0] if weight else 1
+            self._update_weight(key)
+        self._keys = sorted(self._names)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @staticmethod
+    def _key(name: str) -> str:
+        return name.strip().lower()
+
+    def _update_weight(self, key: str) -> None:
+        documents = self._documents.get(key)
+        weight = max(documents.values()) if documents else 1
+        if weight == 1:
+            self._weights.pop(key, None)
+        else:
+            self._weights[key] = weight
+
+    def add(self, name: str, document_id: str, weight: int = 1) -> None:
+        """
+        Add a name referenced by given document
+
+        Parameters
+        ----------
+        - **name**: (str) Name to be suggested
+        - **document_id**: (str) Id of the document holding the name
+        - **weight**: (int) Weight of the name in this document (as the `weight` of a completion input)
+        """
+        key = self._key(name)
+        if not key:
+            return
+        if key not in self._names:
+            self._names[key] = name
+            self._documents[key] = {}
+            insort(self._keys, key)
+        self._documents[key][document_id] = weight
+        self._update_weight(key)
+
+    def remove(self, name: str, document_id: str) -> None:
+        """
+        Remove the reference of given document to a name
+
+        Parameters
+        ----------
+        - **name**: (str) Name to be removed
+        - **document_id**: (str) Id of the document holding the name
+        """
+        key = self._key(name)
+        documents = self._documents.get(key)
+        if documents is None:
+            return
+        documents.pop(document_id, None)
+        if not documents:
+            del self._documents[key]
+            del self._names[key]
+            del self._keys[bisect_left(self._keys, key)]
+        self._update_weight(key)
+
+    def search(self, prefix: str, size: int = 10, offset: int = 0) -> List[dict]:
+        """
+        Get the names starting with given prefix, ranked by weight then alphabetically
+
+        Parameters
+        ----------
+        - **prefix**: (str) Prefix to be matched
+        - **size**: (int) Maximum number of names
+        - **offset**: (int) Number of matching names to skip
+
+        Returns
+        -------
+        - **List[dict]**: Matching names (`text`) with one of their document ids (`_id`) and their weight (`_score`)
+        """
+        prefix = self._key(prefix)
+        start = bisect_left(self._keys, prefix)
+        if not self._weights:
+            # every name weighs the same - the alphabetical order is the ranking
+            keys = self._keys[start + offset:start + offset + size]
+            keys = [key for key in keys if key.startswith(prefix)]
+        else:
+            end = bisect_left(self._keys, prefix + _MAX_CHAR, start)
+            ranked = heapq.nsmallest(offset + size, self._keys[start:end],
+                                     key=lambda key: (-self._weights.get(key, 1), key))
+            keys = ranked[offset:]
+        return [self._suggestion(key) for key in keys]
+
+    def _suggestion(self, key: str) -> dict:
+        documents = self._documents[key]
+        weight = self._weights.get(key, 1)
+        # one of the documents giving the name its weight
+        document_id = next(document_id for document_id, value in documents.items() if value == weight)
+        return {"text": self._names[key], "_id": document_id, "_score": float(weight)}
@@ -1,65 +1,114 @@
+import asyncio
+import gc
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import Depends, FastAPI, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy import text
 from app.index.dependencies import get_db
 from app.index.router import router as index_router
 from app.auth.router import router as auth_router
-from app.database import Base, sync_engine, SessionLocal
-from app.index.utils.es import ElasticSearchClient
+from app.identify.router import router as identify_router
+from app.identify.constants import (IDENTIFY_BACKEND, IDENTIFY_ENABLED, IDENTIFY_MODEL_PATH, IDENTIFY_PRELOAD,
+                                    IDENTIFY_PRELOAD_BACKENDS)
+from app.identify.services import MicroBatcher, load_classifier
+from app.auth.constants import AUTH_USER_CACHE_ENABLED, AUTH_USER_CACHE_MAX_ENTRIES, AUTH_USER_CACHE_TTL
+from app.auth.services import PasswordHasher, UserCache
+from app.database import Base, async_engine
+from app.index.constants import ES_CACHE_ENABLED, ES_CACHE_MAX_ENTRIES, ES_CACHE_TTL
+from app.index.utils.cache import TTLCache
+from app.index.utils.es import AsyncElasticSearchClient
 from app.index.models import PlantIndex
+from app.index.services import PlantIndexRegistry, cancel_reindex_jobs, run_plant_index_reconciliation
+from app.index.plants.constants import PLANTS_INDEX
+from app.index.plants.services import PlantAutocomplete, PlantFacets, install_plants_index_template
 from app.auth.models import User
 
-Base.metadata.create_all(bind=sync_engine)
-
-app = FastAPI()
+logger = logging.getLogger(__name__)
 
-app.include_router(index_router)
-app.include_router(auth_router)
+# loaded on import - with `gunicorn --preload`, once in the master: the forked workers share its pages
+preloaded_classifier = None
+if IDENTIFY_ENABLED and IDENTIFY_PRELOAD and IDENTIFY_BACKEND not in IDENTIFY_PRELOAD_BACKENDS:
+    logger.warning("IDENTIFY_PRELOAD ignored - the '%s' backend is not safe to load before a fork, every worker "
+                   "loads its own (supported: %s)", IDENTIFY_BACKEND, ", ".join(IDENTIFY_PRELOAD_BACKENDS))
+elif IDENTIFY_ENABLED and IDENTIFY_PRELOAD:
+    try:
+        preloaded_classifier = load_classifier(IDENTIFY_MODEL_PATH)
+        # keep the garbage collector of the workers from writing to (and copying) the preloaded objects
+        gc.freeze()
+    except Exception:
+        logger.exception("Failed to preload the plant image classifier")
 
 
-@app.on_event("startup")
-async def startup_event():
+@asynccontextmanager
+async def lifespan(app: FastAPI):
     """
-    Startup event - called when the server starts
-    Adds existing elasticsearch indices to database (plant_idx table)
-
-    Raises
-    ------
-    - **ValueError**: If elasticsearch is offline
+    Application lifespan - creates the database tables and the shared
+    elasticsearch client on startup and closes the connection pools on shutdown. The plant index template is
+    installed on startup; the plant index registry is loaded, the plant_idx
+    table reconciled with the indices and the in-memory plant autocomplete built
+    (all periodically repeated) and the catalog facet counts precomputed in the
+    background. The plant image classifier is loaded once, off the event loop, and
+    fed by a micro-batching queue.
     """
-    es_client = ElasticSearchClient()
-
-    if not es_client.client.ping():
-        raise ValueError("elasticsearch is offline")
-
-    db = SessionLocal()
-    # add existing elasticsearch indices to database (plant_idx table)
-    indices = es_client.get_indices()
-    db_indices = db.query(PlantIndex).all()
-    idx_uuids = [index.idx_uuid for index in db_indices]
-    db_indices = [index.index_name for index in db_indices]
-
-    for index in indices:
-        if index not in db_indices:
-            try:
-                idx_uuid = es_client.get_index_uuid(index)
-                plant_idx = PlantIndex(idx_uuid=idx_uuid,
-                                       index_name=index,
-                                       description=f"Initialized '{index}'")
-                db.add(plant_idx)
-                db.commit()
-            except Exception as e:
-                print(e)
-        elif es_client.get_index_uuid(index) not in idx_uuids:
-            try:
-                idx_uuid = es_client.get_index_uuid(index)
-                plant_idx = db.query(PlantIndex).filter(
-                    PlantIndex.index_name == index).first()
-                plant_idx.idx_uuid = idx_uuid
-                db.commit()
-            except Exception as e:
-                print(e)
-    db.close()
-    es_client.client.close()
+    async with async_engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+
+    cache = TTLCache(maxsize=ES_CACHE_MAX_ENTRIES, ttl=ES_CACHE_TTL) if ES_CACHE_ENABLED else None
+    es_client = AsyncElasticSearchClient(cache=cache)
+    app.state.es_client = es_client
+    app.state.password_hasher = PasswordHasher()
+    app.state.user_cache = (
+        UserCache(maxsize=AUTH_USER_CACHE_MAX_ENTRIES, ttl=AUTH_USER_CACHE_TTL) if AUTH_USER_CACHE_ENABLED else None
+    )
+    app.state.plant_index_registry = PlantIndexRegistry()
+    app.state.plant_autocomplete = PlantAutocomplete()
+    app.state.plant_facets = PlantFacets()
+    app.state.identify_batcher = None
+    if IDENTIFY_ENABLED:
+        try:
+            classifier = preloaded_classifier or await run_in_threadpool(load_classifier, IDENTIFY_MODEL_PATH)
+            app.state.identify_batcher = MicroBatcher(classifier)
+        except Exception:
+            logger.exception("Failed to load the plant image classifier - identification disabled")
+    background_tasks = []
+    try:
+        await install_plants_index_template(es_client)
+        try:
+            await app.state.plant_index_registry.refresh()
+        except Exception as e:
+            # the plant routes do not need it - the index routes load it on first use
+            logger.warning("Plant index registry load failed: %s", e)
+        background_tasks.append(asyncio.create_task(app.state.plant_index_registry.run()))
+        background_tasks.append(
+            asyncio.create_task(run_plant_index_reconciliation(es_client, app.state.plant_index_registry))
+        )
+        background_tasks.append(asyncio.create_task(es_client.run_metadata_refresh()))
+        background_tasks.append(
+            asyncio.create_task(app.state.plant_autocomplete.run(es_client, PLANTS_INDEX))
+        )
+        background_tasks.append(asyncio.create_task(app.state.plant_facets.warm(es_client, PLANTS_INDEX)))
+        if app.state.identify_batcher is not None:
+            background_tasks.append(asyncio.create_task(app.state.identify_batcher.run()))
+        yield
+    finally:
+        for task in background_tasks:
+            task.cancel()
+        await asyncio.gather(*background_tasks, return_exceptions=True)
+        await cancel_reindex_jobs()
+        await es_client.close()
+        await async_engine.dispose()
+        app.state.password_hasher.shutdown()
+        if app.state.identify_batcher is not None:
+            app.state.identify_batcher.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
+
+app.include_router(index_router)
+app.include_router(auth_router)
+app.include_router(identify_router)
 
 
 @app.get("/")
@@ -81,13 +130,13 @@ async def perform_healthcheck(db=Depends(get_db)):
 
     Parameters
     ----------
-    - **db**: (Session) Database session
+    - **db**: (AsyncSession) Database session
 
     Returns
     -------
     - **JSONResponse**: JSON response with status of the database connection
     """
-    result = db.execute(text("SELECT 1"))
+    result = await db.execute(text("SELECT 1"))
     one = result.one()
     if not one[0] == 1:
         db_status = False
@@ -1 +1 @@
-from vision_transformer import VisionTransformer
+from .vision_transformer import VisionTransformer
@@ -0,0 +1,210 @@
+"""
+Inference backends of the vision transformer
+
+Every backend takes a batch of pixel values (N x 3 x 224 x 224, float32) and
+returns the logits (N x classes):
+
+- **torch** : fp32 HuggingFace model, run eagerly
+- **torch-int8** : dynamic int8 quantization of the linear layers (weights int8, activations quantized on the fly)
+- **torchscript** : traced, frozen and optimized TorchScript module
+- **onnx** : model exported to ONNX, run by ONNX Runtime
+- **onnx-int8** : ONNX model with int8 dynamic quantization, run by ONNX Runtime
+
+Exported models (`.pt` / `.onnx`) are written to `export_dir` and reused by the
+next loads - the fp32 checkpoint is then not loaded at all.
+
+With `mmap`, the fp32 weights are memory-mapped from the checkpoint instead of
+copied into the process: the pages are backed by the file and shared by all the
+processes serving the same checkpoint (through the page cache).
+"""
+import os
+from pathlib import Path
+from typing import Callable, Dict, Optional, Union
+
+import torch
+from transformers import ViTConfig, ViTForImageClassification
+
+IMAGE_SIZE = 224
+WEIGHTS_NAME = "pytorch_model.bin"
+
+
+ModelLoader = Callable[[], ViTForImageClassification]
+
+
+class _Logits(torch.nn.Module):
+    # traceable wrapper - HuggingFace models return a ModelOutput
+    def __init__(self, model: ViTForImageClassification):
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        return self.model(pixel_values=pixel_values).logits
+
+
+def _example_input(batch_size: int = 2) -> torch.Tensor:
+    return torch.zeros(batch_size, 3, IMAGE_SIZE, IMAGE_SIZE)
+
+
+class TorchBackend:
+    name = "torch"
+
+    def __init__(self, load_model: ModelLoader, export_dir: Path):
+        self.model = load_model()
+
+    def __call__(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        with torch.inference_mode():
+            return self.model(pixel_values=pixel_values).logits
+
+
+class QuantizedTorchBackend(TorchBackend):
+    name = "torch-int8"
+
+    def __init__(self, load_model: ModelLoader, export_dir: Path):
+        super().__init__(load_model, export_dir)
+        # the fp32 weights of the linear layers are replaced - ~4x smaller for ~97% of the parameters of a ViT
+        self.model = torch.ao.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8,
+                                                            inplace=True)
+
+
+class TorchScriptBackend:
+    name = "torchscript"
+
+    def __init__(self, load_model: ModelLoader, export_dir: Path):
+        path = export_dir / "model.torchscript.pt"
+        if path.exists():
+            module = torch.jit.load(str(path), map_location="cpu")
+        else:
+            with torch.no_grad():
+                module = torch.jit.trace(_Logits(load_model()), _example_input(), strict=False)
+            module = torch.jit.freeze(module.eval())
+            _save(lambda tmp: torch.jit.save(module, tmp), path)
+        self.module = torch.jit.optimize_for_inference(module)
+
+    def __call__(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        with torch.inference_mode():
+            return self.module(pixel_values)
+
+
+class OnnxBackend:
+    name = "onnx"
+    file_name = "model.onnx"
+
+    def __init__(self, load_model: ModelLoader, export_dir: Path):
+        try:
+            import onnxruntime
+        except ImportError as e:
+            raise ImportError(f"The '{self.name}' backend requires onnxruntime (pip install onnxruntime)") from e
+
+        path = export_dir / self.file_name
+        if not path.exists():
+            self.export(load_model(), export_dir)
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(str(path), options, providers=["CPUExecutionProvider"])
+
+    @staticmethod
+    def export(model: ViTForImageClassification, export_dir: Path) -> Path:
+        path = export_dir / OnnxBackend.file_name
+        if not path.exists():
+            _save(
+                lambda tmp: torch.onnx.export(
+                    _Logits(model), _example_input(), tmp, input_names=["pixel_values"],
+                    output_names=["logits"], dynamic_axes={"pixel_values": {0: "batch"}, "logits": {0: "batch"}},
+                    opset_version=17,
+                ),
+                path,
+            )
+        return path
+
+    def __call__(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        logits, = self.session.run(["logits"], {"pixel_values": pixel_values.numpy()})
+        return torch.from_numpy(logits)
+
+
+class QuantizedOnnxBackend(OnnxBackend):
+    name = "onnx-int8"
+    file_name = "model.int8.onnx"
+
+    @staticmethod
+    def export(model: ViTForImageClassification, export_dir: Path) -> Path:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        source = OnnxBackend.export(model, export_dir)
+        path = export_dir / QuantizedOnnxBackend.file_name
+        _save(lambda tmp: quantize_dynamic(source, tmp, weight_type=QuantType.QInt8), path)
+        return path
+
+
+def _save(write: Callable[[str], None], path: Path) -> None:
+    # written next to the target and renamed - concurrent loads never read a partial file
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        write(str(tmp))
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+BACKENDS: Dict[str, type] = {
+    backend.name: backend
+    for backend in (TorchBackend, QuantizedTorchBackend, TorchScriptBackend, OnnxBackend, QuantizedOnnxBackend)
+}
+
+
+def load_model(model_path: Union[str, Path], mmap: bool = False) -> ViTForImageClassification:
+    """
+    Load the fp32 model of a checkpoint, in inference mode
+
+    Parameters
+    ----------
+    **model_path** : (Union[str, Path]) Checkpoint directory of the model
+    **mmap** : (bool) Memory-map the weights instead of reading them into the process memory
+
+    Returns
+    -------
+    **model** : (ViTForImageClassification) fp32 model
+    """
+    weights = Path(model_path) / WEIGHTS_NAME
+    if not mmap or not weights.exists():
+        # inference only - disables dropout
+        return ViTForImageClassification.from_pretrained(model_path).eval()
+
+    # the model is built without allocating its parameters, which are then bound to the mapped tensors
+    with torch.device("meta"):
+        model = ViTForImageClassification(ViTConfig.from_pretrained(model_path))
+    state_dict = torch.load(weights, map_location="cpu", mmap=True, weights_only=True)
+    model.load_state_dict(state_dict, assign=True)
+    tensors = list(model.named_parameters()) + list(model.named_buffers())
+    missing = [name for name, tensor in tensors if tensor.is_meta]
+    if missing:
+        raise ValueError(f"Weights missing from {weights}: {', '.join(missing)}")
+    return model.eval()
+
+
+def load_backend(name: str, model_path: Union[str, Path], export_dir: Optional[Union[str, Path]] = None,
+                 mmap: bool = False):
+    """
+    Build an inference backend of a checkpoint
+
+    Parameters
+    ----------
+    **name** : (str) Name of the backend - one of `BACKENDS`
+    **model_path** : (Union[str, Path]) Checkpoint directory of the model
+    **export_dir** : (Union[str, Path]) Directory of the exported models (default: `<model_path>/exports`)
+    **mmap** : (bool) Memory-map the fp32 weights (shared by the processes, see `load_model`)
+
+    Returns
+    -------
+    **backend** : Callable mapping pixel values to logits
+
+    Raises
+    ------
+    **ValueError** : If the backend is unknown
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend '{name}' - expected one of {', '.join(BACKENDS)}")
+    export_dir = Path(export_dir) if export_dir else Path(model_path) / "exports"
+
+    return BACKENDS[name](lambda: load_model(model_path, mmap=mmap), export_dir)
@@ -0,0 +1,134 @@
+"""
+Accuracy parity and latency check of an inference backend against the fp32 model
+
+Usage: python -m arcane.image_classifier.parity <images dir> [--backend torch-int8] [--k 5] [--batch-size 8]
+                                                 [--limit 200] [--min-top1-agreement 0.98]
+
+Classifies the sample images with the fp32 `torch` backend and with `--backend`,
+and reports the top-1 agreement, the top-k overlap, the largest probability
+difference, the latency per image and the resident memory added by loading each
+backend. Exits with 1 if the top-1 agreement is below `--min-top1-agreement`.
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+from PIL import Image
+
+from .backends import BACKENDS
+from .vision_transformer import MODEL_PATH, VisionTransformer
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+def _rss_bytes() -> int:
+    # resident set size of the process (linux)
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def sample_images(directory: str, limit: int) -> List[Image.Image]:
+    paths = sorted(path for path in Path(directory).rglob("*") if path.suffix.lower() in IMAGE_EXTENSIONS)
+    return [Image.open(path).convert("RGB") for path in paths[:limit]]
+
+
+def run_backend(backend: str, images: List[Image.Image], k: int, batch_size: int, model_path: str,
+                export_dir: str = None) -> dict:
+    """
+    Classify the images with a backend
+
+    Parameters
+    ----------
+    **backend** : (str) Name of the backend
+    **images** : (List[Image.Image]) Sample images
+    **k** : (int) Number of predictions per image
+    **batch_size** : (int) Number of images per forward pass
+    **model_path** : (str) Checkpoint directory of the model
+    **export_dir** : (str) Directory of the exported models
+
+    Returns
+    -------
+    **result** : (dict) Top `k` predictions of every image, milliseconds per image and resident memory added by
+        the backend (MB)
+    """
+    gc.collect()
+    rss = _rss_bytes()
+    classifier = VisionTransformer(model_path, backend=backend, export_dir=export_dir)
+    memory_mb = (_rss_bytes() - rss) / 2 ** 20
+    # warm up
+    classifier.predict_batch(images[:batch_size], k)
+
+    predictions = []
+    started = time.perf_counter()
+    for start in range(0, len(images), batch_size):
+        predictions.extend(classifier.predict_batch(images[start:start + batch_size], k))
+    elapsed = time.perf_counter() - started
+    return {"predictions": predictions, "ms_per_image": 1000 * elapsed / len(images), "memory_mb": memory_mb}
+
+
+def compare(reference: List[List[dict]], candidate: List[List[dict]]) -> dict:
+    """
+    Compare the top k predictions of a backend with the reference ones
+
+    Parameters
+    ----------
+    **reference** : (List[List[dict]]) Top k predictions of the fp32 model
+    **candidate** : (List[List[dict]]) Top k predictions of the backend
+
+    Returns
+    -------
+    **parity** : (dict) Top-1 agreement, mean top-k overlap and largest difference of the probability of the
+        reference top-1 class
+    """
+    top1, overlap, max_difference = 0, 0.0, 0.0
+    for expected, actual in zip(reference, candidate):
+        top1 += expected[0]["name"] == actual[0]["name"]
+        expected_names = {prediction["name"] for prediction in expected}
+        actual_probabilities = {prediction["name"]: prediction["probability"] for prediction in actual}
+        overlap += len(expected_names & actual_probabilities.keys()) / len(expected)
+        difference = abs(expected[0]["probability"] - actual_probabilities.get(expected[0]["name"], 0.0))
+        max_difference = max(max_difference, difference)
+    return {
+        "top1_agreement": top1 / len(reference),
+        "topk_overlap": overlap / len(reference),
+        "max_top1_probability_difference": max_difference,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the accuracy parity of a backend with the fp32 model")
+    parser.add_argument("images", help="directory of sample images (searched recursively)")
+    parser.add_argument("--backend", default="torch-int8", choices=list(BACKENDS), help="backend to check")
+    parser.add_argument("--k", type=int, default=5, help="predictions per image")
+    parser.add_argument("--batch-size", type=int, default=8, help="images per forward pass")
+    parser.add_argument("--limit", type=int, default=200, help="maximum number of sample images")
+    parser.add_argument("--min-top1-agreement", type=float, default=0.98, help="failure threshold")
+    parser.add_argument("--model-path", default=str(MODEL_PATH), help="checkpoint directory of the model")
+    parser.add_argument("--export-dir", default=None, help="directory of the exported models")
+    args = parser.parse_args()
+
+    images = sample_images(args.images, args.limit)
+    if not images:
+        parser.error(f"no images found in {args.images}")
+
+    reference = run_backend("torch", images, args.k, args.batch_size, args.model_path)
+    candidate = run_backend(args.backend, images, args.k, args.batch_size, args.model_path, args.export_dir)
+    parity = compare(reference["predictions"], candidate["predictions"])
+
+    print(f"{len(images)} images, k={args.k}, batch size {args.batch_size}")
+    for name, result in (("torch", reference), (args.backend, candidate)):
+        print(f"  {name:<12} {result['ms_per_image']:8.1f} ms/image {result['memory_mb']:8.0f} MB")
+    print(f"  speedup {reference['ms_per_image'] / candidate['ms_per_image']:.2f}x, "
+          f"top-1 agreement {parity['top1_agreement']:.2%}, top-{args.k} overlap {parity['topk_overlap']:.2%}, "
+          f"max top-1 probability difference {parity['max_top1_probability_difference']:.4f}")
+    if parity["top1_agreement"] < args.min_top1_agreement:
+        print(f"top-1 agreement below {args.min_top1_agreement:.2%}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
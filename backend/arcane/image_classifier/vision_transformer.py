@@ -1,17 +1,40 @@
 import os
 from pathlib import Path
-from typing import List
+from typing import List, Optional, Sequence, Union
 
 import torch
 from PIL import Image
-from transformers import ViTForImageClassification, ViTImageProcessor
+from transformers import ViTImageProcessor
+
+from .backends import load_backend
+from .preprocessing import FastPreprocessor, open_image
+
+MODEL_PATH = Path(__file__).parent / "model_checkpoints" / "checkpoint-1900"
 
 
 class VisionTransformer:
-    def __init__(self, model_path: str = "model_checkpoints/checkpoint-1900"):
+    """
+    Plant image classifier - a ViT fine-tuned on the ayurvedic plant dataset
+
+    Parameters
+    ----------
+    **model_path** : (Union[str, Path]) Checkpoint directory of the model
+    **backend** : (str) Inference backend - `torch` (fp32, eager), `torch-int8`, `torchscript`, `onnx` or
+        `onnx-int8` (see `backends`)
+    **export_dir** : (Union[str, Path]) Directory of the exported models (default: `<model_path>/exports`)
+    **mmap_weights** : (bool) Memory-map the fp32 weights - shared by all the processes loading the checkpoint
+    **fast_preprocessing** : (bool) Preprocess with `FastPreprocessor` (draft mode decoding, single resize,
+        vectorized normalization) instead of `ViTImageProcessor`
+    """
+
+    def __init__(self, model_path: Union[str, Path] = MODEL_PATH, backend: str = "torch",
+                 export_dir: Optional[Union[str, Path]] = None, mmap_weights: bool = False,
+                 fast_preprocessing: bool = True):
         self.model_path = model_path
-        self.model = ViTForImageClassification.from_pretrained(model_path)
+        self.backend_name = backend
+        self.backend = load_backend(backend, model_path, export_dir, mmap=mmap_weights)
         self.feature_extractor = ViTImageProcessor.from_pretrained(model_path)
+        self.preprocessor = FastPreprocessor.from_processor(self.feature_extractor) if fast_preprocessing else None
         self.actual_names = [
             "Asthma Plant.zip",
             "Avaram.zip",
@@ -65,47 +88,69 @@ class VisionTransformer:
             "heart-leaved moonseed.zip",
         ]
 
-    def predict_top_k(self, image_path: Path, k: int = 5) -> List:
+    def _load_image(self, image: Union[Image.Image, Path, str]) -> Image.Image:
+        if not isinstance(image, Image.Image):
+            if not os.path.exists(image):
+                raise FileNotFoundError(f"Image not found at {image}")
+            image = open_image(image, (self.feature_extractor.size["width"], self.feature_extractor.size["height"]))
+        return image
+
+    def predict_batch(self, images: Sequence[Union[Image.Image, Path, str]], k: int = 5) -> List[List]:
         """
-        Predict top k classes for an image
+        Predict top k classes for a batch of images, in a single forward pass
 
         Parameters
         ----------
-        **image_path** : (Path) Path to the image to be predicted
-        **k** : (int) Number of classes to be predicted
+        **images** : (Sequence[Union[Image.Image, Path, str]]) Images to be predicted, already decoded or paths
+        **k** : (int) Number of classes to be predicted per image
 
         Returns
         -------
-        **top_k_results** : (List) List of top k predictions with class name and probability
+        **top_k_results** : (List[List]) Top k predictions of every image (class name and probability), in order
 
         Raises
         ------
-        **FileNotFoundError** : If image is not found at the given path
+        **FileNotFoundError** : If an image is not found at the given path
         """
-        if not os.path.exists(image_path):
-            raise FileNotFoundError(f"Image not found at {image_path}")
+        if not images:
+            return []
+        images = [self._load_image(image) for image in images]
 
-        search_image = Image.open(image_path)
-        search_image = self.feature_extractor(images=search_image, return_tensors="pt")
-        input_ids = search_image["pixel_values"]
+        if self.preprocessor is not None:
+            pixel_values = self.preprocessor(images)
+        else:
+            images = [image if image.mode == "RGB" else image.convert("RGB") for image in images]
+            pixel_values = self.feature_extractor(images=images, return_tensors="pt")["pixel_values"]
 
         # Run inference
-        with torch.no_grad():
-            outputs = self.model(input_ids)
+        logits = self.backend(pixel_values)
 
-        predicted_class_indices = torch.topk(outputs.logits, k=k, dim=1).indices[0]
-        predicted_class_probabilities = torch.topk(outputs.logits, k=k, dim=1).values[0]
+        probabilities = torch.softmax(logits, dim=1)
+        top_k = torch.topk(probabilities, k=min(k, probabilities.shape[1]), dim=1)
 
-        top_k_class_names = [
-            self.actual_names[index][:-4] for index in predicted_class_indices
+        return [
+            [
+                {"name": self.actual_names[index][:-4], "probability": probability}
+                for index, probability in zip(indices, values)
+            ]
+            for indices, values in zip(top_k.indices.tolist(), top_k.values.tolist())
         ]
 
-        top_k_class_probabilities = [
-            probability.item() for probability in predicted_class_probabilities
-        ]
-        top_k_results = [
-            {"name": name, "probability": probability}
-            for name, probability in zip(top_k_class_names, top_k_class_probabilities)
-        ]
+    def predict_top_k(self, image: Union[Image.Image, Path, str], k: int = 5) -> List:
+        """
+        Predict top k classes for an image
 
-        return top_k_results
+        Parameters
+        ----------
+        **image** : (Union[Image.Image, Path, str]) Image to be predicted, already decoded or path to the image
+        **k** : (int) Number of classes to be predicted
+
+        Returns
+        -------
+        **top_k_results** : (List) List of top k predictions with class name and probability (softmax)
+
+        Raises
+        ------
+        **FileNotFoundError** : If image is not found at the given path
+        """
+        return self.predict_batch([image], k)[0]
@@ -1 +1,2 @@
-gunicorn app.main:app --workers 4 --worker-class uvicorn.workers.UvicornWorker --bind 0.0.0.0:8000
\ No newline at end of file
+# the classifier is loaded once before the workers are forked (--preload) - its weights are shared by the workers
+IDENTIFY_PRELOAD=true gunicorn app.main:app --preload --workers 4 --worker-class uvicorn.workers.UvicornWorker --bind 0.0.0.0:8000
@@ -0,0 +1,8 @@
+import os
+
+# app.index.constants reads the elasticsearch hosts on import - no connection is made by the tests
+os.environ.setdefault("ELASTICSEARCH_HOST", "http://localhost:9200")
+# app.database builds its (lazy) engine on import - no connection is made by the tests
+for name, value in (("DB_NAME", "ayush"), ("DB_USER", "ayush"), ("DB_PASS", "ayush"), ("DB_HOST", "localhost"),
+                    ("DB_PORT", "5432")):
+    os.environ.setdefault(name, value)
@@ -0,0 +1,175 @@
+"""
+In-memory stand-in for `elasticsearch.AsyncElasticsearch` - only the calls made by `AsyncElasticSearchClient`
+in the tested paths, with the response shapes of elasticsearch
+"""
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+from elasticsearch import NotFoundError
+
+from app.index.utils import es as es_module
+
+
+class FakeResponse(dict):
+    @property
+    def body(self) -> dict:
+        return self
+
+
+def api_error(error_class, status: int, message: str = "error"):
+    return error_class(message, meta=SimpleNamespace(status=status), body={"error": message})
+
+
+class FakeElasticsearch:
+    """
+    Cluster of indices (with their flat settings and aliases), tasks and points in time
+
+    Parameters
+    ----------
+    - **indices**: (Dict[str, dict]) Flat settings by index name (e.g. `{"refresh_interval": "30s"}`)
+    - **aliases**: (Dict[str, List[str]]) Indices by alias
+    - **mappings**: (Dict[str, dict]) Mappings by index name
+    """
+
+    def __init__(self, indices: Dict[str, dict] = None, aliases: Dict[str, List[str]] = None,
+                 mappings: Dict[str, dict] = None):
+        self.settings = {name: dict(settings) for name, settings in (indices or {}).items()}
+        self.aliases = {alias: set(names) for alias, names in (aliases or {}).items()}
+        self.mappings = dict(mappings or {})
+        # statuses answered by successive `tasks.get` calls, by task id - the last one is repeated
+        self.task_statuses: Dict[str, List[dict]] = {}
+        self.open_pits: List[str] = []
+        # exceptions raised by the next calls, by api name (e.g. "search", "bulk")
+        self.failures: Dict[str, Exception] = {}
+        self.calls: List[tuple] = []
+        self.bulk_items: Optional[List[dict]] = None
+        self.indices = SimpleNamespace(get_settings=self._get_settings, get_alias=self._get_alias,
+                                       get_mapping=self._get_mapping, put_settings=self._put_settings,
+                                       refresh=self._refresh, update_aliases=self._update_aliases)
+        self.tasks = SimpleNamespace(get=self._get_task)
+
+    def _call(self, api: str, **params) -> None:
+        self.calls.append((api, params))
+        if api in self.failures:
+            raise self.failures.pop(api)
+
+    def calls_of(self, api: str) -> List[dict]:
+        return [params for name, params in self.calls if name == api]
+
+    def _resolve(self, name: str) -> List[str]:
+        names = []
+        for part in name.split(","):
+            if part == "*":
+                names += sorted(self.settings)
+            elif part in self.settings:
+                names.append(part)
+            elif part in self.aliases:
+                names += sorted(self.aliases[part])
+            else:
+                raise api_error(NotFoundError, 404, f"no such index [{part}]")
+        return names
+
+    def alias_of(self, alias: str) -> List[str]:
+        return sorted(self.aliases.get(alias, ()))
+
+    async def _get_settings(self, index: str, flat_settings: bool = False, filter_path: str = None) -> FakeResponse:
+        self._call("indices.get_settings", index=index)
+        if not flat_settings:
+            return FakeResponse({name: {"settings": {"index": {"uuid": f"uuid-{name}"}}}
+                                 for name in self._resolve(index)})
+        return FakeResponse({
+            name: {"settings": {f"index.{key}": value for key, value in self.settings[name].items()}}
+            for name in self._resolve(index)
+        })
+
+    async def _get_alias(self, index: str) -> FakeResponse:
+        self._call("indices.get_alias", index=index)
+        return FakeResponse({
+            name: {"aliases": {alias: {} for alias, names in self.aliases.items() if name in names}}
+            for name in self._resolve(index)
+        })
+
+    async def _get_mapping(self, index: str) -> FakeResponse:
+        self._call("indices.get_mapping", index=index)
+        return FakeResponse({name: {"mappings": self.mappings.get(name, {})} for name in self._resolve(index)})
+
+    async def _put_settings(self, index: str, settings: dict) -> FakeResponse:
+        self._call("indices.put_settings", index=index, settings=settings)
+        for name in self._resolve(index):
+            for key, value in settings.items():
+                if value is None:
+                    self.settings[name].pop(key, None)
+                else:
+                    self.settings[name][key] = value
+        return FakeResponse({"acknowledged": True})
+
+    async def _refresh(self, index: str) -> FakeResponse:
+        self._call("indices.refresh", index=index)
+        return FakeResponse({})
+
+    async def _update_aliases(self, actions: List[dict]) -> FakeResponse:
+        self._call("indices.update_aliases", actions=actions)
+        # applied atomically - validated first
+        for action in actions:
+            (operation, target), = action.items()
+            if target["index"] not in self.settings:
+                raise api_error(NotFoundError, 404, f"no such index [{target['index']}]")
+        for action in actions:
+            (operation, target), = action.items()
+            if operation == "add":
+                self.aliases.setdefault(target["alias"], set()).add(target["index"])
+            elif operation == "remove":
+                self.aliases.get(target["alias"], set()).discard(target["index"])
+            elif operation == "remove_index":
+                del self.settings[target["index"]]
+                for names in self.aliases.values():
+                    names.discard(target["index"])
+        self.aliases = {alias: names for alias, names in self.aliases.items() if names}
+        return FakeResponse({"acknowledged": True})
+
+    async def _get_task(self, task_id: str) -> FakeResponse:
+        self._call("tasks.get", task_id=task_id)
+        statuses = self.task_statuses.get(task_id)
+        if not statuses:
+            raise api_error(NotFoundError, 404, f"task [{task_id}] isn't running and hasn't stored its results")
+        return FakeResponse(statuses.pop(0) if len(statuses) > 1 else statuses[0])
+
+    async def open_point_in_time(self, index: str, keep_alive: str) -> FakeResponse:
+        self._call("open_point_in_time", index=index)
+        pit_id = f"pit-{len(self.calls)}"
+        self.open_pits.append(pit_id)
+        return FakeResponse({"id": pit_id})
+
+    async def close_point_in_time(self, id: str) -> FakeResponse:
+        self._call("close_point_in_time", id=id)
+        if id not in self.open_pits:
+            raise api_error(NotFoundError, 404, "point in time not found")
+        self.open_pits.remove(id)
+        return FakeResponse({"succeeded": True})
+
+    async def search(self, **params) -> FakeResponse:
+        self._call("search", **params)
+        return FakeResponse({"hits": {"total": {"value": 0, "relation": "eq"}, "hits": []}})
+
+    async def bulk(self, operations: List[dict], refresh: bool = False) -> FakeResponse:
+        self._call("bulk", operations=operations, refresh=refresh)
+        # action lines - the others are the partial documents of the updates
+        actions = [line for line in operations if "doc" not in line]
+        items = [{next(iter(action)): item} for action, item in zip(actions, self.bulk_items)]
+        return FakeResponse({"errors": any(item.get("status", 200) >= 300 for item in self.bulk_items),
+                             "items": items})
+
+    async def update_by_query(self, **params) -> FakeResponse:
+        self._call("update_by_query", **params)
+        return FakeResponse({"task": "node:1"})
+
+    async def close(self) -> None:
+        pass
+
+
+def fake_client(monkeypatch, cluster: FakeElasticsearch) -> es_module.AsyncElasticSearchClient:
+    """
+    Build an `AsyncElasticSearchClient` talking to a fake cluster
+    """
+    monkeypatch.setattr(es_module, "AsyncElasticsearch", lambda *args, **kwargs: cluster)
+    return es_module.AsyncElasticSearchClient(hosts=["http://elasticsearch:9200"])
@@ -0,0 +1,143 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi.exceptions import HTTPException
+
+from app.identify.services import MicroBatcher
+
+
+class FakeClassifier:
+    """
+    Stands in for `VisionTransformer` - `predict_batch` records its batches and answers `k` predictions per image
+    """
+
+    def __init__(self, error: Exception = None):
+        self.error = error
+        self.batches = []
+        # holds the forward pass until set
+        self.release = threading.Event()
+        self.release.set()
+
+    def predict_batch(self, images: list, k: int) -> list:
+        self.release.wait(5)
+        self.batches.append((list(images), k))
+        if self.error is not None:
+            raise self.error
+        return [[{"name": f"{image}-{rank}", "probability": 1 / (rank + 1)} for rank in range(k)]
+                for image in images]
+
+
+async def _batched(classifier: FakeClassifier, requests, **options):
+    """
+    Run the `(image, k, cancelled)` requests through a batcher - results (or exceptions) by request
+    """
+    batcher = MicroBatcher(classifier, **options)
+    runner = asyncio.ensure_future(batcher.run())
+    try:
+        calls = []
+        for image, k, cancelled in requests:
+            calls.append(asyncio.ensure_future(batcher.predict(image, k)))
+            # let the request reach the queue
+            await asyncio.sleep(0)
+            if cancelled:
+                calls[-1].cancel()
+        results = await asyncio.wait_for(asyncio.gather(*calls, return_exceptions=True), 5)
+        return results, batcher.stats()
+    finally:
+        runner.cancel()
+        batcher.shutdown()
+
+
+def test_flushed_once_the_batch_is_full():
+    classifier = FakeClassifier()
+    results, stats = asyncio.run(_batched(classifier, [(image, 1, False) for image in "abc"],
+                                          max_batch_size=3, max_wait_ms=60000))
+
+    assert classifier.batches == [(["a", "b", "c"], 1)]
+    assert [result[0]["name"] for result in results] == ["a-0", "b-0", "c-0"]
+    assert stats["batch_sizes"] == {"3": 1}
+
+
+def test_flushed_after_max_wait():
+    classifier = FakeClassifier()
+    results, stats = asyncio.run(_batched(classifier, [("a", 1, False), ("b", 1, False)],
+                                          max_batch_size=10, max_wait_ms=20))
+
+    assert classifier.batches == [(["a", "b"], 1)]
+    assert stats["batch_sizes"] == {"2": 1}
+    # the first request waited for the second one
+    assert stats["max_queue_wait_ms"] >= 15
+
+
+def test_larger_load_split_into_full_batches():
+    classifier = FakeClassifier()
+    results, stats = asyncio.run(_batched(classifier, [(image, 1, False) for image in "abcde"],
+                                          max_batch_size=2, max_wait_ms=20))
+
+    assert [images for images, _ in classifier.batches] == [["a", "b"], ["c", "d"], ["e"]]
+    assert stats["requests"] == 5
+    assert stats["batch_sizes"] == {"1": 1, "2": 2}
+
+
+def test_results_returned_to_their_callers():
+    classifier = FakeClassifier()
+    results, _ = asyncio.run(_batched(classifier, [("a", 1, False), ("b", 3, False), ("c", 2, False)],
+                                      max_batch_size=3, max_wait_ms=60000))
+
+    # one forward pass for the largest k, truncated to the k of each request
+    assert classifier.batches == [(["a", "b", "c"], 3)]
+    assert [[prediction["name"] for prediction in result] for result in results] == [
+        ["a-0"], ["b-0", "b-1", "b-2"], ["c-0", "c-1"],
+    ]
+
+
+def test_failed_batch_raised_to_every_caller():
+    error = RuntimeError("CUDA out of memory")
+    classifier = FakeClassifier(error=error)
+    results, stats = asyncio.run(_batched(classifier, [("a", 1, False), ("b", 1, False)],
+                                          max_batch_size=2, max_wait_ms=60000))
+
+    assert results == [error, error]
+    assert stats["failed"] == 2
+    assert stats["batches"] == 0
+
+
+def test_cancelled_requests_dropped_from_the_batch():
+    classifier = FakeClassifier()
+    results, stats = asyncio.run(_batched(classifier, [("a", 1, True), ("b", 1, False), ("c", 1, True)],
+                                          max_batch_size=10, max_wait_ms=20))
+
+    assert classifier.batches == [(["b"], 1)]
+    assert isinstance(results[0], asyncio.CancelledError)
+    assert results[1][0]["name"] == "b-0"
+    assert stats["requests"] == 1
+
+
+def test_rejected_with_503_once_the_queue_is_full():
+    classifier = FakeClassifier()
+    classifier.release.clear()
+
+    async def run():
+        batcher = MicroBatcher(classifier, max_batch_size=1, max_wait_ms=0, max_queue=1)
+        runner = asyncio.ensure_future(batcher.run())
+        try:
+            # the first request is taken into a (held) batch, the second one waits for the next
+            running = asyncio.ensure_future(batcher.predict("a", 1))
+            await asyncio.sleep(0)
+            while batcher.stats()["queued"]:
+                await asyncio.sleep(0.001)
+            queued = asyncio.ensure_future(batcher.predict("b", 1))
+            await asyncio.sleep(0)
+            with pytest.raises(HTTPException) as error:
+                await batcher.predict("c", 1)
+            assert error.value.status_code == 503
+            classifier.release.set()
+            return await asyncio.wait_for(asyncio.gather(running, queued), 5), batcher.stats()
+        finally:
+            runner.cancel()
+            batcher.shutdown()
+
+    results, stats = asyncio.run(run())
+    assert [result[0]["name"] for result in results] == ["a-0", "b-0"]
+    assert (stats["requests"], stats["rejected"]) == (2, 1)
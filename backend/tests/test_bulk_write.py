@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+from elasticsearch import ApiError, ConnectionError, ConnectionTimeout
+from fastapi.exceptions import HTTPException
+
+from app.index.plants import services as plants_services
+from app.index.plants.schemas import PlantBulkOperation, PlantUpdateByQuery
+from tests.fake_elasticsearch import FakeElasticsearch, api_error, fake_client
+
+CONFLICT = {"type": "version_conflict_engine_exception",
+            "reason": "[4]: version conflict, required seqNo [3], primary term [1]. current document has seqNo [5] "
+                      "and primary term [1]"}
+
+
+class FakeAutocomplete:
+    """
+    Stands in for `PlantAutocomplete` - records the changes it is kept in sync with
+    """
+
+    def __init__(self):
+        self.updated = []
+        self.removed = []
+        self.built = []
+
+    def update_document(self, document_id: str, partial: dict) -> None:
+        self.updated.append((document_id, partial))
+
+    def remove_document(self, document_id: str) -> None:
+        self.removed.append(document_id)
+
+    async def build(self, es_client, index: str) -> None:
+        self.built.append(index)
+
+
+def test_bulk_write_results_in_request_order(monkeypatch):
+    cluster = FakeElasticsearch(indices={"plants": {}})
+    cluster.bulk_items = [
+        {"_id": "1", "status": 200, "result": "updated", "_seq_no": 4, "_primary_term": 1},
+        {"_id": "2", "status": 201, "result": "created", "_seq_no": 0, "_primary_term": 1},
+        {"_id": "3", "status": 200, "result": "deleted", "_seq_no": 7, "_primary_term": 1},
+        {"_id": "4", "status": 409, "error": CONFLICT},
+    ]
+    es_client = fake_client(monkeypatch, cluster)
+    autocomplete = FakeAutocomplete()
+    operations = [
+        PlantBulkOperation(action="update", id="1", doc={"family": "Fabaceae"}, if_seq_no=3, if_primary_term=1),
+        PlantBulkOperation(action="upsert", id="2", doc={"family": "Pinaceae"}),
+        PlantBulkOperation(action="delete", id="3"),
+        PlantBulkOperation(action="update", id="4", doc={"family": "Rosaceae"}, if_seq_no=3, if_primary_term=1),
+    ]
+
+    results = asyncio.run(plants_services.bulk_write_plants(es_client, "plants", operations, autocomplete))
+
+    assert cluster.calls_of("bulk")[0]["operations"] == [
+        {"update": {"_index": "plants", "_id": "1", "if_seq_no": 3, "if_primary_term": 1}},
+        {"doc": {"family": "Fabaceae"}, "doc_as_upsert": False},
+        {"update": {"_index": "plants", "_id": "2"}},
+        {"doc": {"family": "Pinaceae"}, "doc_as_upsert": True},
+        {"delete": {"_index": "plants", "_id": "3"}},
+        {"update": {"_index": "plants", "_id": "4", "if_seq_no": 3, "if_primary_term": 1}},
+        {"doc": {"family": "Rosaceae"}, "doc_as_upsert": False},
+    ]
+    assert results == [
+        {"id": "1", "status": 200, "result": "updated", "_seq_no": 4, "_primary_term": 1},
+        {"id": "2", "status": 201, "result": "created", "_seq_no": 0, "_primary_term": 1},
+        {"id": "3", "status": 200, "result": "deleted", "_seq_no": 7, "_primary_term": 1},
+        # the plant changed since it was read - nothing applied
+        {"id": "4", "status": 409, "error": CONFLICT["reason"]},
+    ]
+    assert autocomplete.updated == [("1", {"family": "Fabaceae"}), ("2", {"family": "Pinaceae"})]
+    assert autocomplete.removed == ["3"]
+    assert es_client.generation == 1
+
+
+def test_bulk_write_all_conflicting_leaves_the_cache(monkeypatch):
+    cluster = FakeElasticsearch(indices={"plants": {}})
+    cluster.bulk_items = [{"_id": "4", "status": 409, "error": CONFLICT}]
+    es_client = fake_client(monkeypatch, cluster)
+    autocomplete = FakeAutocomplete()
+    operations = [PlantBulkOperation(action="delete", id="4", if_seq_no=3, if_primary_term=1)]
+
+    results = asyncio.run(plants_services.bulk_write_plants(es_client, "plants", operations, autocomplete))
+
+    assert results == [{"id": "4", "status": 409, "error": CONFLICT["reason"]}]
+    assert autocomplete.removed == []
+    assert es_client.generation == 0
+
+
+@pytest.mark.parametrize("failure, status_code", [
+    (api_error(ApiError, 400, "action_request_validation_exception"), 400),
+    (api_error(ApiError, 503, "cluster_block_exception"), 502),
+    (ConnectionError("Connection refused"), 502),
+    (ConnectionTimeout("Connection timed out"), 504),
+])
+def test_bulk_write_request_failure(monkeypatch, failure, status_code):
+    cluster = FakeElasticsearch(indices={"plants": {}})
+    cluster.failures["bulk"] = failure
+    es_client = fake_client(monkeypatch, cluster)
+    autocomplete = FakeAutocomplete()
+    operations = [PlantBulkOperation(action="delete", id="1")]
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(plants_services.bulk_write_plants(es_client, "plants", operations, autocomplete))
+    assert error.value.status_code == status_code
+    assert autocomplete.removed == []
+
+
+def test_start_plant_update_by_query(monkeypatch):
+    # mapped dynamically - the facet is filtered on its keyword sub-field
+    mappings = {"properties": {"family": {"type": "text", "fields": {"keyword": {"type": "keyword"}}}}}
+    cluster = FakeElasticsearch(indices={"plants-v1": {}}, aliases={"plants": ["plants-v1"]},
+                                mappings={"plants-v1": mappings})
+    cluster.task_statuses["node:1"] = [{"completed": False}, {"completed": True, "response": {"failures": []}}]
+    es_client = fake_client(monkeypatch, cluster)
+    monkeypatch.setattr(plants_services, "ES_TASK_POLL_INTERVAL", 0)
+    autocomplete = FakeAutocomplete()
+    update = PlantUpdateByQuery(doc={"status": "verified"}, filters={"family": ["Fabaceae"]}, requests_per_second=50)
+
+    async def run() -> str:
+        task_id = await plants_services.start_plant_update_by_query(es_client, "plants", update, autocomplete)
+        # completed in the background
+        assert autocomplete.built == []
+        await asyncio.gather(*plants_services._jobs)
+        return task_id
+
+    assert asyncio.run(run()) == "node:1"
+    call, = cluster.calls_of("update_by_query")
+    assert call["index"] == "plants"
+    assert call["query"]["bool"]["filter"] == [{"terms": {"family.keyword": ["Fabaceae"]}}]
+    assert call["script"]["params"] == {"doc": {"status": "verified"}}
+    assert (call["conflicts"], call["slices"], call["requests_per_second"], call["wait_for_completion"]) == (
+        "proceed", "auto", 50, False)
+    assert len(cluster.calls_of("tasks.get")) == 2
+    # cache dropped when the task starts and once it completed, autocomplete rebuilt
+    assert es_client.generation == 2
+    assert autocomplete.built == ["plants"]
@@ -0,0 +1,96 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.index.utils import cache as cache_module
+from app.index.utils.cache import ResultCache, TTLCache, make_cache_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    clock = FakeClock()
+    monkeypatch.setattr(cache_module, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+def test_cache_key_ignores_dict_order():
+    assert make_cache_key("plants", {"a": 1, "b": [1, 2]}) == make_cache_key("plants", {"b": [1, 2], "a": 1})
+    assert make_cache_key("plants", 1, 20) != make_cache_key("plants", 2, 20)
+
+
+def test_result_cache_is_abstract():
+    with pytest.raises(TypeError):
+        ResultCache()
+
+
+def test_get_and_set(clock):
+    cache = TTLCache(maxsize=10, ttl=60)
+    assert cache.get("key") is None
+    cache.set("key", {"hits": []})
+    assert cache.get("key") == {"hits": []}
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire(clock):
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=5)
+    clock.now += 10
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    clock.now += 60
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_invalidate_by_tag(clock):
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("a", 1, tags=("plants", "plants-v1"))
+    cache.set("b", 2, tags=("plants",))
+    cache.set("c", 3, tags=("users",))
+    cache.invalidate("plants-v1")
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    cache.invalidate("plants")
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    # unknown tags are ignored
+    cache.invalidate("unknown")
+
+
+def test_overwrite_replaces_tags(clock):
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("a", 1, tags=("plants",))
+    cache.set("a", 2, tags=("users",))
+    cache.invalidate("plants")
+    assert cache.get("a") == 2
+
+
+def test_clear(clock):
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("a", 1, tags=("plants",))
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.get("a") is None
@@ -0,0 +1,64 @@
+import asyncio
+import base64
+
+import pytest
+from elasticsearch import ApiError, ConnectionTimeout, NotFoundError
+from fastapi.exceptions import HTTPException
+
+from app.index.utils.cursor import decode_cursor, encode_cursor
+from tests.fake_elasticsearch import FakeElasticsearch, api_error, fake_client
+
+
+def test_round_trip():
+    search_after = [1.5, "Acacia", 42]
+    cursor = encode_cursor("pit-id==", search_after)
+    assert decode_cursor(cursor) == ("pit-id==", search_after)
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_cursor("a+b/c?" * 20, ["~" * 50])
+    assert cursor.isascii()
+    assert not set(cursor) & set("+/=?&")
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor!",
+    base64.urlsafe_b64encode(b"not json").decode(),
+    base64.urlsafe_b64encode(b'{"pit": "x"}').decode(),
+    base64.urlsafe_b64encode(b'{"pit": 1, "after": []}').decode(),
+    base64.urlsafe_b64encode(b'{"pit": "x", "after": "y"}').decode(),
+    base64.urlsafe_b64encode(b"[1, 2]").decode(),
+])
+def test_invalid_cursor(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+@pytest.mark.parametrize("failure, expected", [
+    (api_error(NotFoundError, 404, "no such index [plants]"), HTTPException),
+    (api_error(ApiError, 500, "search_phase_execution_exception"), ApiError),
+    (ConnectionTimeout("timed out"), ConnectionTimeout),
+])
+def test_point_in_time_closed_when_the_first_page_fails(monkeypatch, failure, expected):
+    cluster = FakeElasticsearch(indices={"plants": {}})
+    cluster.failures["search"] = failure
+    es_client = fake_client(monkeypatch, cluster)
+
+    with pytest.raises(expected):
+        asyncio.run(es_client.paginated_search("plants", size=10, use_cursor=True))
+    assert cluster.open_pits == []
+    assert len(cluster.calls_of("close_point_in_time")) == 1
+
+
+def test_point_in_time_of_a_cursor_left_open_when_a_page_fails(monkeypatch):
+    cluster = FakeElasticsearch(indices={"plants": {}})
+    cluster.open_pits.append("pit-0")
+    cluster.failures["search"] = api_error(ApiError, 500, "search_phase_execution_exception")
+    es_client = fake_client(monkeypatch, cluster)
+
+    with pytest.raises(ApiError):
+        asyncio.run(es_client.paginated_search("plants", size=10, cursor=encode_cursor("pit-0", [1.0, 2])))
+    # closed by the caller holding the cursor, or expired by elasticsearch
+    assert cluster.open_pits == ["pit-0"]
+    assert cluster.calls_of("close_point_in_time") == []
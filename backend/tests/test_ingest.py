@@ -0,0 +1,100 @@
+import asyncio
+import csv
+from types import SimpleNamespace
+
+import pytest
+
+from app.index.constants import ES_BULK_LOAD_SETTINGS
+from app.index.plants import ingest as ingest_module
+from app.index.plants.constants import PLANT_FIELDS
+
+
+class FakeElasticSearchClient:
+    """
+    Stands in for `AsyncElasticSearchClient` - `plants` is an alias of `plants-v1`, as after a blue-green reindex
+    """
+
+    def __init__(self):
+        self.indices = {"plants-v1": {"refresh_interval": "30s", "number_of_replicas": "1"}}
+        self.aliases = {"plants": ["plants-v1"]}
+        self.created = []
+        self.refreshed = []
+        self.bulk = None
+        self.closed = False
+        self.client = SimpleNamespace(indices=SimpleNamespace(refresh=self._refresh))
+
+    async def index_or_alias_exists(self, name: str) -> bool:
+        return name in self.indices or name in self.aliases
+
+    async def create_index(self, index: str, mappings: dict = None, settings: dict = None) -> bool:
+        if index in self.aliases:
+            raise AssertionError(f"an alias is already named '{index}'")
+        self.created.append(index)
+        self.indices[index] = {}
+        return True
+
+    async def resolve_alias(self, name: str) -> list:
+        return [name] if name in self.indices else sorted(self.aliases.get(name, ()))
+
+    async def put_index_settings(self, index: str, settings: dict) -> dict:
+        previous = {key: self.indices[index].get(key) for key in settings}
+        self.indices[index].update(settings)
+        return {index: previous}
+
+    async def bulk_index_documents(self, index: str, documents, **options) -> dict:
+        self.bulk = {
+            "index": index,
+            "documents": [document async for document in documents],
+            "settings": {name: dict(settings) for name, settings in self.indices.items()},
+        }
+        return {"indexed": len(self.bulk["documents"]), "failed": 0, "errors": []}
+
+    async def _refresh(self, index: str) -> None:
+        self.refreshed.append(index)
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+@pytest.fixture
+def es_client(monkeypatch) -> FakeElasticSearchClient:
+    client = FakeElasticSearchClient()
+    monkeypatch.setattr(ingest_module, "AsyncElasticSearchClient", lambda: client)
+    return client
+
+
+@pytest.fixture
+def dataset(tmp_path) -> str:
+    path = tmp_path / "plants.csv"
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.DictWriter(file, fieldnames=PLANT_FIELDS)
+        writer.writeheader()
+        writer.writerow({"key": "1", "scientific_name": "Acacia nilotica", "decimal_latitude": "12.5",
+                         "decimal_longitude": "77.1"})
+        writer.writerow({"key": "2", "scientific_name": "Abies alba", "locality": "first line\nsecond line"})
+    return str(path)
+
+
+def test_ingest_into_an_alias(es_client, dataset):
+    report = asyncio.run(ingest_module.ingest(dataset, index="plants", workers=1, chunk_rows=1))
+
+    assert es_client.created == []
+    assert es_client.bulk["index"] == "plants"
+    assert [document["key"] for document in es_client.bulk["documents"]] == ["1", "2"]
+    assert es_client.bulk["documents"][0]["location"] == {"lat": 12.5, "lon": 77.1}
+    assert es_client.bulk["documents"][1]["locality"] == "first line\nsecond line"
+    # bulk-load settings on the index behind the alias during the load, restored afterwards
+    assert es_client.bulk["settings"]["plants-v1"] == ES_BULK_LOAD_SETTINGS
+    assert es_client.indices["plants-v1"] == {"refresh_interval": "30s", "number_of_replicas": "1"}
+    assert es_client.refreshed == ["plants"]
+    assert es_client.closed
+    assert report["indexed"] == 2
+
+
+def test_ingest_creates_a_missing_index(es_client, dataset):
+    asyncio.run(ingest_module.ingest(dataset, index="plants-new", workers=1))
+
+    assert es_client.created == ["plants-new"]
+    assert es_client.bulk["settings"]["plants-new"] == ES_BULK_LOAD_SETTINGS
+    assert es_client.indices["plants-new"] == {"refresh_interval": None, "number_of_replicas": None}
+    assert es_client.indices["plants-v1"] == {"refresh_interval": "30s", "number_of_replicas": "1"}
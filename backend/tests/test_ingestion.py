@@ -0,0 +1,69 @@
+import asyncio
+
+from app.index.plants.services import iter_lines, parse_csv, parse_ndjson
+
+
+async def _stream(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def _collect(iterator) -> list:
+    async def collect():
+        return [item async for item in iterator]
+
+    return asyncio.run(collect())
+
+
+def _report() -> dict:
+    return {"failed": 0, "errors": []}
+
+
+def test_iter_lines_splits_across_chunks():
+    lines = _collect(iter_lines(_stream(b'{"a": 1}\r\n{"b"', b": 2}\n", b"last")))
+    assert lines == ['{"a": 1}', '{"b": 2}', "last"]
+
+
+def test_iter_lines_decodes_characters_split_across_chunks():
+    encoded = "Acácia\n".encode()
+    split = encoded.index(b"\xa1")
+    assert _collect(iter_lines(_stream(encoded[:split], encoded[split:]))) == ["Acácia"]
+
+
+def test_iter_lines_skips_trailing_blank_line():
+    assert _collect(iter_lines(_stream(b"a\n", b"  "))) == ["a"]
+
+
+def test_parse_ndjson_reports_invalid_lines():
+    report = _report()
+    lines = iter_lines(_stream(b'{"key": "1"}\n\nnot json\n[1, 2]\n{"key": "2"}\n'))
+    documents = _collect(parse_ndjson(lines, report))
+    assert documents == [{"key": "1"}, {"key": "2"}]
+    assert report["failed"] == 2
+    assert [error["line"] for error in report["errors"]] == [3, 4]
+    assert report["errors"][1]["error"] == "Document must be a JSON object"
+
+
+def test_parse_csv_uses_header_and_drops_empty_values():
+    report = _report()
+    lines = iter_lines(_stream(b"key,family,genus\n1,Fabaceae,\n2,,Acacia\n"))
+    documents = _collect(parse_csv(lines, report))
+    assert documents == [{"key": "1", "family": "Fabaceae"}, {"key": "2", "genus": "Acacia"}]
+    assert report["failed"] == 0
+
+
+def test_parse_csv_joins_quoted_fields_spanning_lines():
+    report = _report()
+    lines = iter_lines(_stream(b'key,locality\n1,"first line\nsecond line"\n2,plain\n'))
+    documents = _collect(parse_csv(lines, report))
+    assert documents == [{"key": "1", "locality": "first line\nsecond line"}, {"key": "2", "locality": "plain"}]
+
+
+def test_parse_csv_reports_bad_records():
+    report = _report()
+    lines = iter_lines(_stream(b'key,family\n1,Fabaceae,extra\n2,Rosaceae\n3,"unterminated\n'))
+    documents = _collect(parse_csv(lines, report))
+    assert documents == [{"key": "2", "family": "Rosaceae"}]
+    assert report["failed"] == 2
+    assert report["errors"][0] == {"line": 2, "error": "Expected 2 columns, got 3"}
+    assert report["errors"][1] == {"line": 4, "error": "Unterminated quoted field"}
@@ -0,0 +1,103 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi.exceptions import HTTPException
+
+from app.auth.services import PasswordHasher
+
+
+def _blocking(release: threading.Event):
+    def function(value):
+        release.wait(5)
+        return value
+    return function
+
+
+async def _until(condition, timeout: float = 5) -> None:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        assert loop.time() < deadline
+        await asyncio.sleep(0.001)
+
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher(workers=1, max_queue=1, rounds=4)
+    yield hasher
+    hasher.shutdown()
+
+
+def test_rejected_with_503_once_the_queue_is_full(hasher):
+    release = threading.Event()
+
+    async def run():
+        calls = [asyncio.ensure_future(hasher._run(_blocking(release), value)) for value in ("a", "b")]
+        await _until(lambda: hasher.pending == 2)
+        with pytest.raises(HTTPException) as error:
+            await hasher._run(_blocking(release), "c")
+        assert error.value.status_code == 503
+        assert error.value.headers == {"Retry-After": "1"}
+        assert hasher.stats()["running"] == 1
+        assert hasher.stats()["queued"] == 1
+        release.set()
+        return await asyncio.gather(*calls)
+
+    assert asyncio.run(run()) == ["a", "b"]
+    stats = hasher.stats()
+    assert (stats["running"], stats["queued"], stats["completed"], stats["rejected"]) == (0, 0, 2, 1)
+    assert stats["average_seconds"] > 0
+
+
+def test_cancelled_call_keeps_its_slot_until_the_thread_is_done(hasher):
+    release = threading.Event()
+
+    async def run():
+        running = asyncio.ensure_future(hasher._run(_blocking(release), "a"))
+        queued = asyncio.ensure_future(hasher._run(_blocking(release), "b"))
+        await _until(lambda: hasher.pending == 2)
+        running.cancel()
+        await asyncio.gather(running, return_exceptions=True)
+        # the thread still runs the cancelled call
+        assert hasher.pending == 2
+        with pytest.raises(HTTPException):
+            await hasher._run(_blocking(release), "c")
+        release.set()
+        assert await queued == "b"
+        await _until(lambda: hasher.pending == 0)
+        return await hasher._run(_blocking(release), "d")
+
+    assert asyncio.run(run()) == "d"
+    stats = hasher.stats()
+    # the cancelled call was run to the end by its thread
+    assert (stats["completed"], stats["rejected"]) == (3, 1)
+
+
+def test_cancelled_call_waiting_for_a_thread_frees_its_slot(hasher):
+    release = threading.Event()
+
+    async def run():
+        running = asyncio.ensure_future(hasher._run(_blocking(release), "a"))
+        queued = asyncio.ensure_future(hasher._run(_blocking(release), "b"))
+        await _until(lambda: hasher.pending == 2)
+        queued.cancel()
+        await asyncio.gather(queued, return_exceptions=True)
+        # never started - nothing left to wait for
+        assert hasher.pending == 1
+        release.set()
+        return await running
+
+    assert asyncio.run(run()) == "a"
+    assert hasher.stats()["completed"] == 1
+
+
+def test_failed_call_not_counted_as_completed(hasher):
+    def failing():
+        raise ValueError("Invalid salt")
+
+    with pytest.raises(ValueError):
+        asyncio.run(hasher._run(failing))
+    stats = hasher.stats()
+    assert (stats["running"], stats["queued"], stats["completed"], stats["rejected"]) == (0, 0, 0, 0)
+    assert stats["average_seconds"] == 0.0
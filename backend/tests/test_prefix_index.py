@@ -0,0 +1,53 @@
+from app.index.utils.prefix_index import PrefixIndex
+
+
+def _texts(suggestions) -> list:
+    return [suggestion["text"] for suggestion in suggestions]
+
+
+def test_prefix_match_is_case_insensitive_and_alphabetical():
+    index = PrefixIndex([("Acer rubrum", "1"), ("acacia nilotica", "2"), ("Abies alba", "3"), ("Betula", "4")])
+    assert _texts(index.search("A")) == ["Abies alba", "acacia nilotica", "Acer rubrum"]
+    assert _texts(index.search("ac")) == ["acacia nilotica", "Acer rubrum"]
+    assert index.search("z") == []
+
+
+def test_names_are_deduplicated():
+    index = PrefixIndex([("Acacia", "1"), ("acacia ", "2")])
+    assert len(index) == 1
+    assert index.search("acacia") == [{"text": "Acacia", "_id": "1", "_score": 1.0}]
+
+
+def test_size_and_offset():
+    index = PrefixIndex([(f"Name {number:02}", str(number)) for number in range(10)])
+    assert _texts(index.search("name", size=3, offset=2)) == ["Name 02", "Name 03", "Name 04"]
+    assert _texts(index.search("name", size=5, offset=8)) == ["Name 08", "Name 09"]
+
+
+def test_ranked_by_weight_then_name():
+    index = PrefixIndex([("Acacia", "1"), ("Acer", "2", 3), ("Abies", "3"), ("Aloe", "4", 2)])
+    assert _texts(index.search("a")) == ["Acer", "Aloe", "Abies", "Acacia"]
+    assert index.search("a", size=1, offset=1) == [{"text": "Aloe", "_id": "4", "_score": 2.0}]
+
+
+def test_weight_of_a_name_is_the_highest_of_its_documents():
+    index = PrefixIndex([("Acer", "1"), ("Abies", "2")])
+    index.add("acer", "3", weight=5)
+    assert index.search("a", size=1) == [{"text": "Acer", "_id": "3", "_score": 5.0}]
+    index.remove("Acer", "3")
+    assert _texts(index.search("a")) == ["Abies", "Acer"]
+
+
+def test_name_removed_with_its_last_document():
+    index = PrefixIndex()
+    index.add("Acacia", "1")
+    index.add("Acacia", "2")
+    index.remove("Acacia", "1")
+    assert _texts(index.search("aca")) == ["Acacia"]
+    index.remove("Acacia", "2")
+    assert index.search("aca") == []
+    assert len(index) == 0
+    # unknown names and documents are ignored
+    index.remove("Acacia", "2")
+    index.add("   ", "3")
+    assert len(index) == 0
@@ -0,0 +1,69 @@
+from io import BytesIO
+
+import pytest
+
+np = pytest.importorskip("numpy")
+torch = pytest.importorskip("torch")
+Image = pytest.importorskip("PIL.Image")
+transformers = pytest.importorskip("transformers")
+
+from arcane.image_classifier.preprocessing import FastPreprocessor, open_image  # noqa: E402
+from arcane.image_classifier.vision_transformer import MODEL_PATH  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def processor():
+    return transformers.ViTImageProcessor.from_pretrained(str(MODEL_PATH))
+
+
+@pytest.fixture(scope="module")
+def fast(processor) -> FastPreprocessor:
+    return FastPreprocessor.from_processor(processor)
+
+
+def _image(size, mode="RGB", seed=0) -> Image.Image:
+    pixels = np.random.default_rng(seed).integers(0, 256, size=(size[1], size[0], len(mode)), dtype=np.uint8)
+    return Image.fromarray(pixels[..., 0] if mode == "L" else pixels, mode=mode)
+
+
+def _reference(processor, images) -> torch.Tensor:
+    return processor(images=[image.convert("RGB") for image in images], return_tensors="pt")["pixel_values"]
+
+
+def test_matches_processor(processor, fast):
+    images = [_image((640, 480), seed=1), _image((224, 224), seed=2), _image((100, 300), seed=3)]
+    expected = _reference(processor, images)
+    actual = fast(images)
+    assert actual.shape == expected.shape
+    assert actual.dtype == torch.float32
+    assert actual.is_contiguous()
+    assert (actual - expected).abs().max().item() < 1e-3
+
+
+@pytest.mark.parametrize("mode", ["L", "RGBA"])
+def test_converts_to_rgb(processor, fast, mode):
+    image = _image((320, 240), mode=mode, seed=4)
+    assert (fast([image]) - _reference(processor, [image])).abs().max().item() < 1e-3
+
+
+def test_draft_mode_jpeg_stays_close(processor, fast):
+    encoded = BytesIO()
+    _image((64, 48), seed=5).resize((2048, 1536), resample=Image.BILINEAR).save(encoded, format="JPEG", quality=95)
+    expected = _reference(processor, [Image.open(BytesIO(encoded.getvalue()))])
+    image = open_image(BytesIO(encoded.getvalue()), fast.size[::-1])
+    assert (fast([image]) - expected).abs().mean().item() < 0.05
+
+
+def test_buffer_grows_with_the_batch(fast):
+    assert fast([_image((50, 50))]).shape[0] == 1
+    batch = [_image((50, 50), seed=seed) for seed in range(3)]
+    first = fast(batch).clone()
+    assert first.shape[0] == 3
+    assert torch.equal(fast(batch), first)
+
+
+def test_from_processor_without_normalization():
+    processor = transformers.ViTImageProcessor(do_normalize=False, do_rescale=False)
+    fast = FastPreprocessor.from_processor(processor)
+    image = _image((224, 224), seed=6)
+    assert torch.equal(fast([image])[0], torch.from_numpy(np.asarray(image).transpose(2, 0, 1).astype(np.float32)))
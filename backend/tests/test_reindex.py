@@ -0,0 +1,172 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.index import services
+from app.index.constants import ES_BULK_LOAD_SETTINGS
+from tests.fake_elasticsearch import FakeElasticsearch, fake_client
+
+RESTORE_SETTINGS = {"refresh_interval": "30s", "number_of_replicas": 1}
+RUNNING = {"completed": False, "task": {"status": {"created": 10, "total": 100}}}
+SUCCEEDED = {"completed": True, "task": {"status": {"created": 100, "total": 100}}, "response": {"failures": []}}
+FAILED = {"completed": True, "task": {"status": {"created": 40, "total": 100}},
+          "response": {"failures": [{"cause": {"type": "mapper_parsing_exception"}}]}}
+
+
+class FakeJobStore:
+    """
+    The `plant_reindex_job` / `plant_idx` rows of the reindex jobs - same claim semantics as the SQL statements:
+    a running job is claimed when it has no claim or its claim is older than the lease
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self.jobs = {}
+        self.swaps = []
+
+    def add(self, **values) -> SimpleNamespace:
+        job = SimpleNamespace(id=len(self.jobs) + 1, task_id="node:1", source="plants", source_indices=["plants-v1"],
+                              target="plants-v2", alias="plants", restore_settings=RESTORE_SETTINGS,
+                              status="running", claimed_at=self.now)
+        job.__dict__.update(values)
+        self.jobs[job.id] = job
+        return job
+
+    async def running(self) -> list:
+        return [job for job in self.jobs.values() if job.status == "running"]
+
+    async def claim(self, job_id: int, lease: float = services.PLANT_REINDEX_JOB_LEASE) -> bool:
+        job = self.jobs[job_id]
+        if job.status != "running" or (job.claimed_at is not None and job.claimed_at >= self.now - lease):
+            return False
+        job.claimed_at = self.now
+        return True
+
+    async def renew(self, job_id: int, claimed_at) -> None:
+        self.jobs[job_id].claimed_at = None if claimed_at is None else self.now
+
+    async def finish(self, job_id: int, status: str) -> None:
+        self.jobs[job_id].status, self.jobs[job_id].claimed_at = status, None
+
+    async def record(self, index: str, idx_uuid: str, alias: str, removed_indices: list, source: str) -> None:
+        self.swaps.append({"index": index, "alias": alias, "removed_indices": removed_indices})
+
+
+@pytest.fixture
+def store(monkeypatch) -> FakeJobStore:
+    store = FakeJobStore()
+    monkeypatch.setattr(services, "_running_reindex_jobs", store.running)
+    monkeypatch.setattr(services, "_claim_reindex_job", store.claim)
+    monkeypatch.setattr(services, "_renew_reindex_job", store.renew)
+    monkeypatch.setattr(services, "_finish_reindex_job", store.finish)
+    monkeypatch.setattr(services, "_record_alias_swap", store.record)
+    monkeypatch.setattr(services, "ES_TASK_POLL_INTERVAL", 0)
+    monkeypatch.setattr(services, "_watched_jobs", set())
+    monkeypatch.setattr(services, "_jobs", set())
+    return store
+
+
+def _cluster(**indices) -> FakeElasticsearch:
+    # plants-v2 is being filled by the reindex task, with the bulk-load settings
+    return FakeElasticsearch(
+        indices={"plants-v2": {key: str(value) for key, value in ES_BULK_LOAD_SETTINGS.items()}, **indices},
+        aliases={"plants": [name for name in indices if name != "plants"]},
+    )
+
+
+def test_alias_swapped_once_the_task_succeeds(monkeypatch, store):
+    cluster = _cluster(**{"plants-v1": {"refresh_interval": "30s"}})
+    cluster.task_statuses["node:1"] = [RUNNING, RUNNING, SUCCEEDED]
+    es_client = fake_client(monkeypatch, cluster)
+    job = store.add()
+
+    asyncio.run(services._complete_reindex(es_client, job, None))
+
+    assert cluster.alias_of("plants") == ["plants-v2"]
+    assert cluster.calls_of("indices.update_aliases") == [{"actions": [
+        {"remove": {"index": "plants-v1", "alias": "plants"}},
+        {"add": {"index": "plants-v2", "alias": "plants"}},
+    ]}]
+    assert cluster.settings["plants-v2"] == {"refresh_interval": "30s", "number_of_replicas": 1}
+    assert cluster.calls_of("indices.refresh") == [{"index": "plants-v2"}]
+    assert store.swaps == [{"index": "plants-v2", "alias": "plants", "removed_indices": []}]
+    assert job.status == "completed"
+    assert job.claimed_at is None
+
+
+def test_alias_and_settings_unchanged_when_the_task_fails(monkeypatch, store):
+    cluster = _cluster(**{"plants-v1": {"refresh_interval": "30s"}})
+    cluster.task_statuses["node:1"] = [RUNNING, FAILED]
+    es_client = fake_client(monkeypatch, cluster)
+    job = store.add()
+
+    asyncio.run(services._complete_reindex(es_client, job, None))
+
+    assert cluster.alias_of("plants") == ["plants-v1"]
+    assert cluster.calls_of("indices.update_aliases") == []
+    assert cluster.calls_of("indices.put_settings") == []
+    assert cluster.settings["plants-v2"] == {"refresh_interval": "-1", "number_of_replicas": "0"}
+    assert store.swaps == []
+    assert job.status == "failed"
+
+
+def test_concrete_index_named_like_the_alias_removed_by_the_swap(monkeypatch, store):
+    cluster = _cluster(plants={"refresh_interval": "1s"})
+    cluster.task_statuses["node:1"] = [SUCCEEDED]
+    es_client = fake_client(monkeypatch, cluster)
+    job = store.add(source_indices=["plants"])
+
+    asyncio.run(services._complete_reindex(es_client, job, None))
+
+    # one atomic call - the alias never points at nothing
+    assert cluster.calls_of("indices.update_aliases") == [{"actions": [
+        {"add": {"index": "plants-v2", "alias": "plants"}},
+        {"remove_index": {"index": "plants"}},
+    ]}]
+    assert "plants" not in cluster.settings
+    assert cluster.alias_of("plants") == ["plants-v2"]
+    assert store.swaps == [{"index": "plants-v2", "alias": "plants", "removed_indices": ["plants"]}]
+
+
+def test_expired_lease_taken_over_by_another_worker(monkeypatch, store):
+    cluster = _cluster(**{"plants-v1": {"refresh_interval": "30s"}})
+    cluster.task_statuses["node:1"] = [SUCCEEDED]
+    es_client = fake_client(monkeypatch, cluster)
+    # claimed by a worker that stopped without swapping the alias
+    job = store.add(claimed_at=store.now)
+
+    async def resume_after(seconds: float) -> int:
+        store.now += seconds
+        resumed = await services.resume_reindex_jobs(es_client)
+        await asyncio.gather(*services._jobs)
+        return resumed
+
+    assert asyncio.run(resume_after(services.PLANT_REINDEX_JOB_LEASE / 2)) == 0
+    assert cluster.alias_of("plants") == ["plants-v1"]
+
+    assert asyncio.run(resume_after(services.PLANT_REINDEX_JOB_LEASE)) == 1
+    assert cluster.alias_of("plants") == ["plants-v2"]
+    assert job.status == "completed"
+    # finished jobs are not resumed again
+    assert asyncio.run(resume_after(services.PLANT_REINDEX_JOB_LEASE * 2)) == 0
+
+
+def test_cancelled_job_released_for_another_worker(monkeypatch, store):
+    cluster = _cluster(**{"plants-v1": {"refresh_interval": "30s"}})
+    cluster.task_statuses["node:1"] = [RUNNING]
+    es_client = fake_client(monkeypatch, cluster)
+    job = store.add(claimed_at=None)
+
+    async def resume_then_shutdown() -> int:
+        resumed = await services.resume_reindex_jobs(es_client)
+        # a job watched by this worker is not claimed twice
+        assert await services.resume_reindex_jobs(es_client) == 0
+        await asyncio.sleep(0.01)
+        await services.cancel_reindex_jobs()
+        return resumed
+
+    assert asyncio.run(resume_then_shutdown()) == 1
+    assert job.status == "running"
+    assert job.claimed_at is None
+    assert cluster.alias_of("plants") == ["plants-v1"]
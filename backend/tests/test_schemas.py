@@ -0,0 +1,52 @@
+import pytest
+from pydantic import ValidationError
+
+from app.index.plants.constants import PLANTS_BULK_WRITE_MAX_OPERATIONS
+from app.index.plants.schemas import PlantBulkOperation, PlantBulkWrite, PlantUpdateByQuery
+
+
+@pytest.mark.parametrize("operation", [
+    {"action": "update", "id": "1", "doc": {"family": "Fabaceae"}},
+    {"action": "update", "id": "1", "doc": {"family": "Fabaceae"}, "if_seq_no": 0, "if_primary_term": 1},
+    {"action": "upsert", "id": "1", "doc": {"family": "Fabaceae"}},
+    {"action": "delete", "id": "1"},
+    {"action": "delete", "id": "1", "if_seq_no": 3, "if_primary_term": 2},
+])
+def test_valid_operation(operation):
+    assert PlantBulkOperation(**operation).id == "1"
+
+
+@pytest.mark.parametrize("operation", [
+    # doc required but for deletes
+    {"action": "update", "id": "1"},
+    {"action": "upsert", "id": "1", "doc": {}},
+    # if_seq_no and if_primary_term go together
+    {"action": "update", "id": "1", "doc": {"a": 1}, "if_seq_no": 0},
+    {"action": "delete", "id": "1", "if_primary_term": 1},
+    # rejected by elasticsearch along with doc_as_upsert
+    {"action": "upsert", "id": "1", "doc": {"a": 1}, "if_seq_no": 0, "if_primary_term": 1},
+    # out of range
+    {"action": "delete", "id": "1", "if_seq_no": -1, "if_primary_term": 1},
+    {"action": "delete", "id": "1", "if_seq_no": 0, "if_primary_term": 0},
+    {"action": "index", "id": "1", "doc": {"a": 1}},
+])
+def test_invalid_operation(operation):
+    with pytest.raises(ValidationError):
+        PlantBulkOperation(**operation)
+
+
+def test_bulk_write_size_is_bounded():
+    operation = {"action": "delete", "id": "1"}
+    with pytest.raises(ValidationError):
+        PlantBulkWrite(operations=[])
+    with pytest.raises(ValidationError):
+        PlantBulkWrite(operations=[operation] * (PLANTS_BULK_WRITE_MAX_OPERATIONS + 1))
+    assert len(PlantBulkWrite(operations=[operation]).operations) == 1
+
+
+def test_update_by_query_needs_a_selection():
+    with pytest.raises(ValidationError):
+        PlantUpdateByQuery(doc={"a": 1})
+    with pytest.raises(ValidationError):
+        PlantUpdateByQuery(doc={"a": 1}, filters={"genus": []})
+    assert PlantUpdateByQuery(doc={"a": 1}, filters={"genus": ["Acacia"]}).query is None
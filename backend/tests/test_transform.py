@@ -0,0 +1,39 @@
+import pytest
+
+from app.index.plants.services import transform_plant_row
+
+
+def test_media_single_quoted_json_is_parsed():
+    document = transform_plant_row({"key": "1", "media": "[{'type': 'StillImage', 'identifier': 'a.jpg'}]"})
+    assert document["media"] == [{"type": "StillImage", "identifier": "a.jpg"}]
+
+
+def test_invalid_media_is_kept_as_is():
+    assert transform_plant_row({"media": "not json"})["media"] == "not json"
+
+
+def test_coordinates_build_the_location():
+    document = transform_plant_row({"decimal_latitude": "12.5", "decimal_longitude": "-77.25"})
+    assert document["decimal_latitude"] == 12.5
+    assert document["decimal_longitude"] == -77.25
+    assert document["location"] == {"lat": 12.5, "lon": -77.25}
+
+
+@pytest.mark.parametrize("latitude", ["", "north", None, "nan", "inf", "-Infinity"])
+def test_invalid_latitude_is_dropped(latitude):
+    document = transform_plant_row({"decimal_latitude": latitude, "decimal_longitude": "10"})
+    assert "decimal_latitude" not in document
+    assert document["decimal_longitude"] == 10.0
+    assert "location" not in document
+
+
+def test_out_of_range_coordinates_have_no_location():
+    document = transform_plant_row({"decimal_latitude": "95", "decimal_longitude": "10"})
+    assert document["decimal_latitude"] == 95.0
+    assert "location" not in document
+
+
+def test_row_is_not_modified():
+    row = {"decimal_latitude": "1", "decimal_longitude": "2", "media": "[]"}
+    transform_plant_row(row)
+    assert row == {"decimal_latitude": "1", "decimal_longitude": "2", "media": "[]"}